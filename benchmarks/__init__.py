@@ -0,0 +1,16 @@
+"""
+Benchmarks of the cost of capital calculations, on the shipped data.
+
+Benchmarks are written in the style of asv (airspeed velocity): each module
+bench_*.py has classes with an optional setup(*params) method, optional
+params (a list of lists of parameter values, one list for each parameter)
+and param_names, and time_* methods to measure. run.py runs them from the
+top folder of the repository, records the runtime and the peak memory
+allocated (using tracemalloc) of each, and compares these against the
+baselines stored in baseline.json:
+    python -m benchmarks.run              run all benchmarks and compare
+    python -m benchmarks.run calc         only benchmarks with 'calc' in
+                                          their names
+    python -m benchmarks.run --save       run and store the results as the
+                                          new baselines
+"""
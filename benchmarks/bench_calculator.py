@@ -0,0 +1,40 @@
+"""
+Benchmarks of the Calculator, with basic and forward-looking equations,
+under policy_baseline.csv.
+"""
+from parameter import Parameter
+from policy import Policy
+from calculator import Calculator
+
+
+class CalcAll():
+    """
+    Calculator.calc_all for one year, with each engine.
+    """
+    params = [['basic', 'forward'], ['array', 'jit', 'loop']]
+    param_names = ['mode', 'engine']
+
+    def setup(self, mode, engine):
+        self.parm = Parameter({'forwardLooking': mode == 'forward'})
+        self.pol = Policy('policy_baseline.csv')
+        self.engine = engine
+
+    def time_calc_all(self, mode, engine):
+        calc = Calculator(self.parm, self.pol, self.engine, verbose=False)
+        calc.calc_all(2022)
+
+
+class CalcYears():
+    """
+    Calculator.calc_years for 2020 to 2029, with the array engine.
+    """
+    params = [['basic', 'forward']]
+    param_names = ['mode']
+
+    def setup(self, mode):
+        self.parm = Parameter({'forwardLooking': mode == 'forward'})
+        self.pol = Policy('policy_baseline.csv')
+
+    def time_calc_years(self, mode):
+        calc = Calculator(self.parm, self.pol, verbose=False)
+        calc.calc_years([*range(2020, 2030)])
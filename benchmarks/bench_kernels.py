@@ -0,0 +1,284 @@
+"""
+Benchmarks of the functions in functions.py, for policy in 2022 under
+policy_baseline.csv. The scalar functions are evaluated for every asset type
+(C corporations in the first industry), as in the loop engine, and the array
+functions for every asset type, industry and firm type at once, as in the
+array engine.
+"""
+from parameter import Parameter
+from policy import Policy
+from calculator import Calculator
+from config import ccr_methods
+from functions import (_calcD_list, _calcZ1, _calcZ2, _calcF1, _calcF2,
+                       _calcT, calcCOC1, calcCOC2, calcEATRd1, calcEATRd2,
+                       calcEATRf1, calcEATRf2, calcSc, calcSnc, make_lists,
+                       make_lists_window, forward_length, _calcD_vec,
+                       _calcZ1_vec, _calcZ2_vec, _calcF2_vec, _calcT_vec,
+                       _calcD_list_vec, calcCOC1_vec, calcCOC2_vec,
+                       calcEATRd1_vec, calcEATRd2_vec, calcEATRf1_vec,
+                       calcEATRf2_vec, calcD_dedup, calcDlist_dedup)
+
+YEAR = 2022
+
+
+class ScalarKernels():
+    """
+    Scalar functions, evaluated for every asset type.
+    """
+
+    def setup(self):
+        self.parm = Parameter()
+        self.pol = Policy('policy_baseline.csv')
+        parm = self.parm
+        self.rules = self.pol.read_ccr_array(YEAR)
+        self.Delta = parm.Delta_c_arr[0]
+        self.r = parm.rd * self.Delta + parm.re * (1 - self.Delta)
+        self.tau = self.pol.fetch('taxrt_ccorp', YEAR)
+        self.phi = self.pol.fetch('intded_c', YEAR)
+        self.tau_prop = parm.sltaxes['property'] * (1 - self.tau)
+        self.length = forward_length(YEAR, parm.horizon)
+        self.taulist = make_lists(self.pol.policies, 'taxrt_ccorp', YEAR,
+                                  self.length)
+        self.philist = make_lists(self.pol.policies, 'intded_c', YEAR,
+                                  self.length)
+        self.taulist_prop = parm.sltaxes['property'] * (1 - self.taulist)
+
+    def assets(self):
+        """
+        Yields the depreciation method, rules and parameters for each asset
+        type.
+        """
+        for i in range(len(self.rules)):
+            yield (ccr_methods[self.rules['method'][i]], self.rules[i],
+                   self.parm.delta_arr[i], self.parm.s179_c_arr[i],
+                   self.parm.tang[i])
+
+    def time_calcD_list(self):
+        for (method, rule, delta, s179, tang) in self.assets():
+            exprt = s179 + (1 - s179) * rule['bonus']
+            _calcD_list(method, self.r, self.parm.pi, delta, rule['life'],
+                        rule['acclrt'], exprt, self.length)
+
+    def time_calcZ1(self):
+        for (method, rule, delta, s179, tang) in self.assets():
+            _calcZ1(method, self.r, self.tau, rule['itcrt'],
+                    rule['itc_base'], rule['itc_life'], s179, rule['bonus'],
+                    self.parm.pi, delta, rule['life'], rule['acclrt'])
+
+    def time_calcZ2(self):
+        for (method, rule, delta, s179, tang) in self.assets():
+            _calcZ2(method, self.r, self.taulist, rule['itcrt'],
+                    rule['itc_base'], rule['itc_life'], s179, rule['bonus'],
+                    self.parm.pi, delta, rule['life'], rule['acclrt'])
+
+    def time_calcF1(self):
+        for (method, rule, delta, s179, tang) in self.assets():
+            _calcF1(self.r, self.parm.rd, self.parm.pi, delta, self.Delta,
+                    self.tau, self.phi)
+
+    def time_calcF2(self):
+        for (method, rule, delta, s179, tang) in self.assets():
+            _calcF2(self.r, self.parm.rd, self.parm.pi, delta, self.Delta,
+                    self.taulist, self.philist)
+
+    def time_calcT(self):
+        for (method, rule, delta, s179, tang) in self.assets():
+            _calcT(self.r, self.parm.pi, delta, self.taulist)
+
+    def time_calcCOC1(self):
+        for (method, rule, delta, s179, tang) in self.assets():
+            calcCOC1(self.r, self.parm.pi, self.parm.rd, delta, self.Delta,
+                     self.tau, self.phi, method, rule['itcrt'],
+                     rule['itc_base'], rule['itc_life'], s179, rule['bonus'],
+                     rule['life'], rule['acclrt'], self.tau_prop)
+
+    def time_calcCOC2(self):
+        for (method, rule, delta, s179, tang) in self.assets():
+            calcCOC2(self.r, self.parm.pi, self.parm.rd, delta, self.Delta,
+                     self.taulist, self.philist, method, rule['itcrt'],
+                     rule['itc_base'], rule['itc_life'], s179, rule['bonus'],
+                     rule['life'], rule['acclrt'], self.taulist_prop)
+
+    def time_calcEATRd1(self):
+        for (method, rule, delta, s179, tang) in self.assets():
+            calcEATRd1(self.r, self.parm.pi, self.parm.rd, delta,
+                       self.Delta, self.tau, self.phi, 0.0, tang,
+                       self.parm.p, method, rule['itcrt'], rule['itc_base'],
+                       rule['itc_life'], 0.0, rule['bonus'], rule['life'],
+                       rule['acclrt'], self.tau_prop)
+
+    def time_calcEATRd2(self):
+        for (method, rule, delta, s179, tang) in self.assets():
+            calcEATRd2(self.r, self.parm.pi, self.parm.rd, delta,
+                       self.Delta, self.taulist, self.philist, 0.0, tang,
+                       self.parm.p, method, rule['itcrt'], rule['itc_base'],
+                       rule['itc_life'], 0.0, rule['bonus'], rule['life'],
+                       rule['acclrt'], self.taulist_prop)
+
+    def time_calcEATRf1(self):
+        tauf = self.parm.tauf_arr[0]
+        for (method, rule, delta, s179, tang) in self.assets():
+            calcEATRf1(self.r, self.parm.pi, self.parm.rd, delta,
+                       self.Delta, self.tau, 0.5, tang, self.parm.p, tauf,
+                       method, rule['itcrt'], rule['itc_base'],
+                       rule['itc_life'], 0.0, rule['bonus'], rule['life'],
+                       rule['acclrt'], self.tau_prop)
+
+    def time_calcEATRf2(self):
+        tauf = self.parm.tauf_arr[0]
+        for (method, rule, delta, s179, tang) in self.assets():
+            calcEATRf2(self.r, self.parm.pi, self.parm.rd, delta,
+                       self.Delta, self.taulist, 0.5, tang, self.parm.p,
+                       tauf, method, rule['itcrt'], rule['itc_base'],
+                       rule['itc_life'], 0.0, rule['bonus'], rule['life'],
+                       rule['acclrt'], self.taulist_prop)
+
+    def time_calcSc(self):
+        for Delta in self.parm.Delta_c_arr:
+            calcSc(self.parm.rd, self.parm.re, self.parm.pi, Delta,
+                   self.parm.shares, 0.3, 0.2, 0.3, 0.2, 1)
+
+    def time_calcSnc(self):
+        for Delta in self.parm.Delta_nc_arr:
+            calcSnc(self.parm.rd, self.parm.re, self.parm.pi, Delta,
+                    self.parm.shares, 0.3)
+
+    def time_make_lists(self):
+        for ptype in ['taxrt_ccorp', 'taxrt_scorp', 'taxrt_soleprop',
+                      'taxrt_partner', 'sub_slti', 'intded_c', 'intded_nc']:
+            make_lists(self.pol.policies, ptype, YEAR, self.length)
+
+    def time_make_lists_window(self):
+        for ptype in ['taxrt_ccorp', 'taxrt_scorp', 'taxrt_soleprop',
+                      'taxrt_partner', 'sub_slti', 'intded_c', 'intded_nc']:
+            make_lists_window(self.pol.policies, ptype,
+                              [*range(2020, 2030)], 10)
+
+
+def array_inputs(forwardLooking):
+    """
+    Returns the inputs used by the array engine (see
+    Calculator._array_inputs), with basic or forward-looking equations.
+    """
+    parm = Parameter({'forwardLooking': forwardLooking})
+    calc = Calculator(parm, Policy('policy_baseline.csv'))
+    return calc._array_inputs([(calc, YEAR)])
+
+
+class ArrayKernels():
+    """
+    Array functions, evaluated for every asset type, industry and firm type
+    at once, with the inputs used by the array engine.
+    """
+    params = [['basic', 'forward']]
+    param_names = ['mode']
+
+    def setup(self, mode):
+        self.inp = array_inputs(mode == 'forward')
+        self.mode = mode
+        inp = self.inp
+        rules = inp['rules']
+        self.exprt = inp['s179'] + (1 - inp['s179']) * rules['bonus']
+        if mode == 'forward':
+            self.length = inp['tau'].shape[-1]
+            (self.D, ncells, nuniq) = calcDlist_dedup(
+                rules['method'], inp['r'], inp['pi'], inp['delta'],
+                rules['life'], rules['acclrt'], self.exprt, self.length)
+        else:
+            (self.D, ncells, nuniq) = calcD_dedup(
+                rules['method'], inp['r'], inp['pi'], inp['delta'],
+                rules['life'], rules['acclrt'])
+
+    def time_calcD(self, mode):
+        inp = self.inp
+        rules = inp['rules']
+        if self.mode == 'forward':
+            _calcD_list_vec(rules['method'], inp['r'], inp['pi'],
+                            inp['delta'], rules['life'], rules['acclrt'],
+                            self.exprt, self.length)
+        else:
+            _calcD_vec(rules['method'], inp['r'], inp['pi'], inp['delta'],
+                       rules['life'], rules['acclrt'])
+
+    def time_calcD_dedup(self, mode):
+        inp = self.inp
+        rules = inp['rules']
+        if self.mode == 'forward':
+            calcDlist_dedup(rules['method'], inp['r'], inp['pi'],
+                            inp['delta'], rules['life'], rules['acclrt'],
+                            self.exprt, self.length)
+        else:
+            calcD_dedup(rules['method'], inp['r'], inp['pi'], inp['delta'],
+                        rules['life'], rules['acclrt'])
+
+    def time_calcZ(self, mode):
+        inp = self.inp
+        rules = inp['rules']
+        if self.mode == 'forward':
+            _calcZ2_vec(rules['method'], inp['r'], inp['tau'],
+                        rules['itcrt'], rules['itc_base'],
+                        rules['itc_life'], inp['s179'], rules['bonus'],
+                        inp['pi'], inp['delta'], rules['life'],
+                        rules['acclrt'], Dlist=self.D)
+        else:
+            _calcZ1_vec(rules['method'], inp['r'], inp['tau'],
+                        rules['itcrt'], rules['itc_base'],
+                        rules['itc_life'], inp['s179'], rules['bonus'],
+                        inp['pi'], inp['delta'], rules['life'],
+                        rules['acclrt'], D=self.D)
+
+    def time_calcCOC(self, mode):
+        inp = self.inp
+        rules = inp['rules']
+        if self.mode == 'forward':
+            calcCOC2_vec(inp['r'], inp['pi'], inp['rd'], inp['delta'],
+                         inp['Delta'], inp['tau'], inp['phi'],
+                         rules['method'], rules['itcrt'], rules['itc_base'],
+                         rules['itc_life'], inp['s179'], rules['bonus'],
+                         rules['life'], rules['acclrt'], inp['tau_prop'],
+                         Dlist=self.D)
+        else:
+            calcCOC1_vec(inp['r'], inp['pi'], inp['rd'], inp['delta'],
+                         inp['Delta'], inp['tau'], inp['phi'],
+                         rules['method'], rules['itcrt'], rules['itc_base'],
+                         rules['itc_life'], inp['s179'], rules['bonus'],
+                         rules['life'], rules['acclrt'], inp['tau_prop'],
+                         D=self.D)
+
+    def time_calcEATR(self, mode):
+        inp = self.inp
+        rules = inp['rulesf']
+        args = (inp['r'][:, 0], inp['pi'][:, 0], inp['rd'][:, 0],
+                inp['delta'][:, 0], inp['Delta'][:, 0], inp['tau'][:, 0])
+        ruleargs = (rules['method'][:, 0], rules['itcrt'][:, 0],
+                    rules['itc_base'][:, 0], rules['itc_life'][:, 0], 0.0,
+                    inp['rules']['bonus'][:, 0], rules['life'][:, 0],
+                    rules['acclrt'][:, 0], inp['tau_prop'][:, 0])
+        if self.mode == 'forward':
+            calcEATRd2_vec(*args, inp['phi'][:, 0], inp['FDIIrt'],
+                           inp['tang'][:, 0], inp['p'], *ruleargs)
+            calcEATRf2_vec(*args, inp['GILTIrt'], inp['tang'][:, 0],
+                           inp['p'], inp['tauf'], *ruleargs)
+        else:
+            calcEATRd1_vec(*args, inp['phi'][:, 0], inp['FDIIrt'],
+                           inp['tang'][:, 0], inp['p'], *ruleargs)
+            calcEATRf1_vec(*args, inp['GILTIrt'], inp['tang'][:, 0],
+                           inp['p'], inp['tauf'], *ruleargs)
+
+
+class ForwardArrayKernels():
+    """
+    Array functions used only by the forward-looking equations.
+    """
+
+    def setup(self):
+        self.inp = array_inputs(True)
+
+    def time_calcF2(self):
+        inp = self.inp
+        _calcF2_vec(inp['r'], inp['rd'], inp['pi'], inp['delta'],
+                    inp['Delta'], inp['tau'], inp['phi'])
+
+    def time_calcT(self):
+        inp = self.inp
+        _calcT_vec(inp['r'], inp['pi'], inp['delta'], inp['tau'])
@@ -0,0 +1,45 @@
+"""
+Benchmark of the full flow of main_work.py: four policy scenarios with
+forward-looking equations, followed by every tabulation. Scenarios are
+calculated together in this process with calc_scenarios, rather than in
+worker processes with run_scenarios, so that all of the memory used is
+measured; the results are the same.
+"""
+from parameter import Parameter
+from policy import Policy
+from calculator import calc_scenarios
+from outputBuilder import OutputBuilder
+from benchmarks.bench_output import remove_output
+
+# Scenarios in main_work.py, as (key, policy file)
+SCENARIOS = [('benchmark_clbase', 'policy_baseline.csv'),
+             ('benchmark_extII', 'policy_extendII.csv'),
+             ('benchmark_cpbase', 'policy_currentPolicy.csv'),
+             ('benchmark_biden', 'policy_biden.csv')]
+
+
+class MainWork():
+    """
+    Calculations and tabulations in main_work.py.
+    """
+
+    def teardown(self):
+        remove_output([key for (key, polfile) in SCENARIOS], 2021)
+
+    def time_main_work(self):
+        parm = Parameter({'forwardLooking': True})
+        pols = [Policy(polfile) for (key, polfile) in SCENARIOS]
+        yearlist = [*range(2021, 2023)]
+        calcs = calc_scenarios(parm, pols, yearlist, verbose=False)
+        obs = [OutputBuilder(calcs[k], SCENARIOS[k][0])
+               for k in range(len(SCENARIOS))]
+        for ob in obs:
+            ob.store_raw(2021)
+        for ob in obs:
+            ob.tabulate_industry(2021)
+            ob.tabulate_asset(2021)
+        for ob in obs:
+            ob.tabulate_main_multiyear(yearlist)
+        for year in yearlist:
+            for ob in obs:
+                ob.cocVariation(year)
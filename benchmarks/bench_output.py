@@ -0,0 +1,90 @@
+"""
+Benchmarks of the OutputBuilder tabulations, for results for 2020 to 2029
+under policy_baseline.csv. Files are saved with the key 'benchmark', and
+removed afterwards.
+"""
+import os
+from config import OUTPUTPATH
+from parameter import Parameter
+from policy import Policy
+from calculator import Calculator
+from outputBuilder import OutputBuilder, ftypes
+
+KEY = 'benchmark'
+YEAR = 2022
+
+
+def output_files(key, year):
+    """
+    Returns the paths of the files an OutputBuilder with the given key
+    saves from store_raw, tabulate_industry and tabulate_asset for the
+    given year, and from tabulate_main_multiyear.
+    """
+    fnames = list()
+    for name in ['coc', 'metr']:
+        for ftype in ftypes:
+            fnames.append('raw/' + name + '_' + ftype + '_' + key + '_' +
+                          str(year) + '.csv')
+    for name in ['byIndustry', 'byAssetType']:
+        fnames.append('raw/' + name + '_' + key + '_' + str(year) + '.csv')
+    for name in ['coc', 'mtr', 'mettr', 'ucoc', 'eatrd', 'eatrf']:
+        fnames.append('main/' + name + '_' + key + '.csv')
+    return [OUTPUTPATH + fname for fname in fnames]
+
+
+def remove_output(keys=[KEY], year=YEAR):
+    """
+    Removes the files saved by the benchmarks, for OutputBuilders with the
+    given keys tabulating the given year (see output_files).
+    """
+    for key in keys:
+        for fname in output_files(key, year):
+            if os.path.exists(fname):
+                os.remove(fname)
+
+
+class Tabulate():
+    """
+    OutputBuilder construction and tabulations. The averages stored by the
+    OutputBuilder are cleared before each tabulation, so each one computes
+    them again.
+    """
+    params = [['basic', 'forward']]
+    param_names = ['mode']
+
+    def setup(self, mode):
+        parm = Parameter({'forwardLooking': mode == 'forward'})
+        self.calc = Calculator(parm, Policy('policy_baseline.csv'),
+                               verbose=False)
+        self.yearlist = [*range(2020, 2030)]
+        self.calc.calc_years(self.yearlist)
+        self.ob = OutputBuilder(self.calc, KEY)
+
+    def teardown(self, mode):
+        remove_output()
+
+    def time_outputbuilder(self, mode):
+        OutputBuilder(self.calc, KEY)
+
+    def time_store_raw(self, mode):
+        self.ob.store_raw(YEAR)
+
+    def time_tabulate_main(self, mode):
+        self.ob.aggregates = dict()
+        self.ob.tabulate_main(YEAR)
+
+    def time_tabulate_industry(self, mode):
+        self.ob.aggregates = dict()
+        self.ob.tabulate_industry(YEAR)
+
+    def time_tabulate_asset(self, mode):
+        self.ob.aggregates = dict()
+        self.ob.tabulate_asset(YEAR)
+
+    def time_tabulate_main_multiyear(self, mode):
+        self.ob.aggregates = dict()
+        self.ob.tabulate_main_multiyear(self.yearlist)
+
+    def time_cocVariation(self, mode):
+        self.ob.aggregates = dict()
+        self.ob.cocVariation(YEAR)
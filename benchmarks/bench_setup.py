@@ -0,0 +1,26 @@
+"""
+Benchmarks of setting up the Parameter and Policy objects.
+"""
+from parameter import Parameter
+from policy import Policy
+
+
+class Setup():
+    """
+    Construction of Parameter and Policy objects. Policy files are read
+    from their caches, as after the first run (see filecache.py).
+    """
+
+    def time_parameter(self):
+        Parameter()
+
+    def time_parameter_forward(self):
+        Parameter({'forwardLooking': True})
+
+    def time_policy(self):
+        Policy('policy_baseline.csv')
+
+    def time_policy_all(self):
+        for polfile in ['policy_baseline.csv', 'policy_currentPolicy.csv',
+                        'policy_biden.csv', 'policy_extendII.csv']:
+            Policy(polfile)
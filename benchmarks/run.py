@@ -0,0 +1,152 @@
+"""
+Runs the benchmarks in this folder, and compares their runtime and peak
+memory against the baselines in baseline.json (see __init__.py).
+
+Each benchmark is run once to warm up (for example, to compile the JIT
+functions and fill the file caches), then timed up to REPEAT times, keeping
+the shortest time, and then run once more under tracemalloc to record the
+peak memory allocated during the run. Benchmarks shorter than SAMPLE_TIME
+are called several times for each timing, and the average is used. A
+benchmark is reported as a regression if its time exceeds the baseline by
+more than TIME_FACTOR, or its peak memory by more than MEM_FACTOR (and by
+at least MEM_SLACK bytes). Baselines depend on the machine, so store new
+ones with --save when changing machines.
+"""
+import argparse
+import importlib
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+MODULES = ['bench_kernels', 'bench_calculator', 'bench_setup',
+           'bench_output', 'bench_main']
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# Number of timed runs of each benchmark, and time after which no more runs
+# are started, in seconds
+REPEAT = 5
+MAX_TIME = 10.0
+# Shortest time for each timing, in seconds
+SAMPLE_TIME = 0.05
+# Ratios to the baselines above which results are reported as regressions
+TIME_FACTOR = 1.5
+MEM_FACTOR = 1.2
+MEM_SLACK = 100000
+
+
+def find_benchmarks(pattern=None):
+    """
+    Find every benchmark in MODULES whose name contains pattern.
+    Returns a list of (name, class, params, method name) tuples.
+    """
+    benchmarks = list()
+    for modname in MODULES:
+        module = importlib.import_module('benchmarks.' + modname)
+        for (clsname, cls) in vars(module).items():
+            if (type(cls) is not type or cls.__module__ != module.__name__
+                    or clsname.startswith('_')):
+                continue
+            methods = [name for name in dir(cls) if name.startswith('time_')]
+            if hasattr(cls, 'params'):
+                paramlist = list(itertools.product(*cls.params))
+            else:
+                paramlist = [()]
+            for params in paramlist:
+                for method in methods:
+                    name = '.'.join([modname, clsname, method])
+                    if len(params) > 0:
+                        name += '(' + ', '.join(params) + ')'
+                    if pattern is None or pattern in name:
+                        benchmarks.append((name, cls, params, method))
+    return benchmarks
+
+
+def measure(cls, params, method):
+    """
+    Run one benchmark, and return its shortest runtime in seconds and its
+    peak memory allocated in bytes.
+    """
+    bench = cls()
+    if hasattr(bench, 'setup'):
+        bench.setup(*params)
+    func = getattr(bench, method)
+    try:
+        start = time.perf_counter()
+        func(*params)
+        number = max(int(SAMPLE_TIME / (time.perf_counter() - start)), 1)
+        times = list()
+        while len(times) < REPEAT and sum(times) * number < MAX_TIME:
+            start = time.perf_counter()
+            for k in range(number):
+                func(*params)
+            times.append((time.perf_counter() - start) / number)
+        tracemalloc.start()
+        func(*params)
+        peakmem = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        if hasattr(bench, 'teardown'):
+            bench.teardown(*params)
+    return (min(times), peakmem)
+
+
+def format_ratio(new, old):
+    """
+    Returns the ratio of new to old as a string, or '' if old is missing.
+    """
+    if old is None:
+        return ''
+    return '%.2f' % (new / old)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmarks.')
+    parser.add_argument('pattern', nargs='?', default=None,
+                        help='only run benchmarks with this in their name')
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the new baselines')
+    args = parser.parse_args()
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+    else:
+        baseline = {'machine': None, 'results': dict()}
+    benchmarks = find_benchmarks(args.pattern)
+    print('%-62s %10s %6s %10s %6s' % ('Benchmark', 'Time (s)', 'Ratio',
+                                       'Peak (MB)', 'Ratio'))
+    results = dict()
+    regressions = list()
+    for (name, cls, params, method) in benchmarks:
+        (runtime, peakmem) = measure(cls, params, method)
+        results[name] = {'time': runtime, 'peakmem': peakmem}
+        base = baseline['results'].get(name)
+        if base is None:
+            (base_time, base_mem) = (None, None)
+        else:
+            (base_time, base_mem) = (base['time'], base['peakmem'])
+        flag = ''
+        if base is not None and (runtime > base_time * TIME_FACTOR or
+                                 (peakmem > base_mem * MEM_FACTOR and
+                                  peakmem > base_mem + MEM_SLACK)):
+            flag = 'REGRESSION'
+            regressions.append(name)
+        print('%-62s %10.5f %6s %10.3f %6s %s'
+              % (name, runtime, format_ratio(runtime, base_time),
+                 peakmem / 1e6, format_ratio(peakmem, base_mem), flag))
+        sys.stdout.flush()
+    if args.save:
+        baseline['machine'] = platform.platform()
+        baseline['results'].update(results)
+        with open(BASELINE, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print('Saved baselines to ' + BASELINE)
+    elif len(regressions) > 0:
+        print(str(len(regressions)) + ' regressions against the baselines')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,109 @@
 import copy
 import numpy as np
-from config import ntype, nind, ast_codes, ind_codes
+from config import ntype, nind, ccr_methods
+from policy import ccr_dtype
 from functions import (calcCOC1, calcCOC2, calcSc, calcSnc,
                        calcEATRd1, calcEATRf1, calcEATRd2, calcEATRf2,
-                       make_lists)
+                       make_lists, make_lists_window, forward_length,
+                       calcCOC1_vec,
+                       calcEATRd1_vec, calcEATRf1_vec, calcCOC2_vec,
+                       calcEATRd2_vec, calcEATRf2_vec, calcD_dedup,
+                       calcDlist_dedup)
+
+# Maximum number of (scenario, year) pairs evaluated together by the array
+# engine
+BATCH_SIZE = 10
+
+ftypes = ['corp', 'scorp', 'soleprop', 'partner']
+# Measures that can be selected with metrics=, and the results dictionary
+# holding each
+METRICS = ['coc', 'metr', 'mettr', 'ucoc', 'eatr']
+METRIC_RESULTS = {'coc': 'results_coc', 'metr': 'results_metr',
+                  'mettr': 'results_mettr', 'ucoc': 'results_ucoc',
+                  'eatr': 'results_international'}
+# Dtypes results can be stored in, and the bound on the relative error of
+# storing a result calculated in float64 in each (half the machine epsilon)
+RESULT_DTYPES = {'float64': 0.0, 'float32': 2.0**-24}
+
+
+def metric_set(metrics):
+    """
+    Return the set of measures to calculate for the measures in metrics
+    (all of METRICS if None), including the cost of capital if any measure
+    computed from it is selected.
+    """
+    if metrics is None:
+        return set(METRICS)
+    for metric in metrics:
+        assert metric in METRICS, 'Unknown metric ' + str(metric)
+    need = set(metrics)
+    if len(need & set(['metr', 'mettr', 'ucoc'])) > 0:
+        need.add('coc')
+    return need
+
+
+def cast_results(arr, dtype):
+    """
+    Return the array arr, calculated in float64, as an array of the given
+    result dtype, checking that each finite value is within the relative
+    error bound in RESULT_DTYPES of its value in arr (or within the smallest
+    normal number of that dtype, for smaller values). Raises an
+    OverflowError if any value is outside this bound, such as a value too
+    large for the dtype.
+    """
+    dtype = np.dtype(dtype)
+    assert dtype.name in RESULT_DTYPES
+    arr = np.asarray(arr)
+    if arr.dtype == dtype:
+        return arr
+    with np.errstate(over='ignore', invalid='ignore'):
+        out = arr.astype(dtype)
+        err = np.abs(out.astype(np.float64) - arr)
+    bound = RESULT_DTYPES[dtype.name] * np.abs(arr) + np.finfo(dtype).tiny
+    bad = np.isfinite(arr) & ~(err <= bound)
+    if bad.any():
+        raise OverflowError(str(int(bad.sum())) + ' results outside the ' +
+                            dtype.name + ' error bound, such as ' +
+                            str(arr[bad][0]))
+    return out
+
+
+class LazyResults(dict):
+    """
+    Dictionary of a Calculator's results for one measure by year, which
+    calculates the measure (see Calculator.calc_all) for a year when it is
+    first looked up with [] or get. Years are stored as strings, and may be
+    looked up as strings or integers. Checking whether a year is in the
+    dictionary (in), and iterating over it (keys, values, items), do not
+    calculate anything, so they only cover the years already calculated
+    for this measure.
+    """
+
+    def __init__(self, calc, metric, items=()):
+        """
+            calc: Calculator object the results belong to
+            metric: measure in METRICS
+        """
+        dict.__init__(self, items)
+        self.calc = calc
+        self.metric = metric
+
+    def __missing__(self, year):
+        key = str(year)
+        if not key.isdigit():
+            raise KeyError(year)
+        if key not in self:
+            self.calc.calc_all(int(year), metrics=[self.metric])
+            if key not in self:
+                raise KeyError(year)
+        return dict.__getitem__(self, key)
+
+    def get(self, year, default=None):
+        try:
+            return self[year]
+        except KeyError:
+            return default
+
 
 class Calculator():
     """
@@ -12,30 +112,117 @@ class Calculator():
     Computes and stores results.
     """
 
-    def __init__(self, parm, pol):
+    def __init__(self, parm, pol, engine='array', dtype='float64',
+                 verbose=True):
         """
             parm: Parameter class object
             pol: Policy class object
+            engine: 'array' to evaluate the whole grid with NumPy arrays,
+                    'jit' to loop over cells in compiled code (needs numba),
+                    'loop' to evaluate each cell separately
+            dtype: dtype to store results in, from RESULT_DTYPES; results
+                   are always calculated in float64
+            verbose: whether to print a message when the results for a year
+                     are first calculated
         """
-        # Store affiliated objects
-        self.parm = copy.deepcopy(parm)
-        self.pol = copy.deepcopy(pol)
+        # Store affiliated objects (as snapshots sharing their data)
+        self.parm = parm.snapshot()
+        self.pol = pol.snapshot()
+        assert engine in ['array', 'jit', 'loop']
+        self.engine = engine
+        assert np.dtype(dtype).name in RESULT_DTYPES
+        self.dtype = np.dtype(dtype)
+        self.verbose = verbose
         self.calc_all_called = False
-        self.results_coc = dict()
-        self.results_metr = dict()
-        self.results_ucoc = dict()
-        self.results_international = dict()
-        self.results_mettr = dict()
+        for metric in METRICS:
+            setattr(self, METRIC_RESULTS[metric], LazyResults(self, metric))
+        self.dedup_stats = dict()
+        self.inputs = dict()
     
-    def calc_all(self, year):
+    def calc_all(self, year, metrics=None):
         """
         Checks what type of equations to use, and calls the relevant
         calc_all_* function.
+            metrics: list of measures to calculate, from METRICS (by
+                     default, all of them), along with the cost of capital
+                     if needed for them; with the loop engine, every
+                     measure is always calculated
+        Measures not calculated are calculated when first looked up in the
+        results dictionaries.
         """
-        if self.parm.forwardLooking:
-            self._calc_all_forward(year)
+        if self.engine == 'array':
+            self._calc_array_batch([(self, year)], metrics=metrics)
+        elif self.engine == 'jit':
+            self._calc_all_jit(year, metrics)
         else:
-            self._calc_all_basic(year)
+            if self.parm.forwardLooking:
+                self._calc_all_forward(year)
+            else:
+                self._calc_all_basic(year)
+    
+    def calc_years(self, yearlist, metrics=None):
+        """
+        Calculates results for every year in yearlist, for the measures in
+        metrics (see calc_all). With the array engine, all years are
+        evaluated together in one batch; otherwise, calls calc_all for each
+        year. Results are the same as from calling calc_all for each year.
+        """
+        if self.engine == 'array':
+            self._calc_array_batch([(self, year) for year in yearlist],
+                                   metrics=metrics)
+        else:
+            for year in yearlist:
+                self.calc_all(year, metrics)
+    
+    def _calc_array_batch(self, batch, overrides=None, store=True,
+                          cells=None, metrics=None):
+        """
+        Evaluates a batch of (Calculator, year) pairs with the array engine,
+        using this Calculator's Parameter, in chunks of at most BATCH_SIZE
+        pairs to bound memory use.
+            overrides: list of dicts of policy values for each pair, to use
+                       instead of those in the Policy (see _array_inputs)
+            store: whether to store the results in each Calculator
+            cells: None for every cell, or a tuple of arrays of the asset
+                   type and industry positions to calculate (see
+                   _array_inputs and _finish_array)
+            metrics: list of measures to calculate (see calc_all)
+        Returns a list with a dict of result arrays for each chunk, with
+        axes (batch, firm type, asset type, industry), for the measures
+        calculated.
+        """
+        if overrides is None:
+            overrides = [dict() for entry in batch]
+        assert len(overrides) == len(batch)
+        results = list()
+        for i in range(0, len(batch), BATCH_SIZE):
+            if self.parm.forwardLooking:
+                calc_chunk = self._calc_all_forward_array
+            else:
+                calc_chunk = self._calc_all_basic_array
+            results.append(calc_chunk(batch[i:i+BATCH_SIZE],
+                                      overrides[i:i+BATCH_SIZE], store,
+                                      cells, metrics))
+        return results
+    
+    def _reuse_coc(self, batch, overrides, store, cells, metrics):
+        """
+        When the cost of capital is only needed for other measures in
+        metrics, return the costs of capital already stored for every
+        (Calculator, year) pair in batch, as an array with axes (batch,
+        firm type, asset type, industry), so that they are not calculated
+        again. Returns None if they must be calculated, including when they
+        are stored with less precision than float64.
+        """
+        if (not store or cells is not None or any(overrides) or
+                metrics is None or 'coc' in metrics):
+            return None
+        for (calc, year) in batch:
+            if (str(year) not in calc.results_coc or
+                    calc.dtype != np.float64):
+                return None
+        return np.array([[calc.results_coc[str(year)][ftype]
+                          for ftype in ftypes] for (calc, year) in batch])
     
     def _calc_all_basic(self, year):
         """
@@ -69,8 +256,8 @@ class Calculator():
         tau_p = self.pol.fetch('taxrt_partner', year)
         phi_c = self.pol.fetch('intded_c', year)
         phi_nc = self.pol.fetch('intded_nc', year)
-        drules = self.pol.read_ccr(year)
-        drulesf = self.pol.read_ccr('foreign')
+        drules = self.pol.read_ccr_array(year)
+        drulesf = self.pol.read_ccr_array('foreign')
         FDIIrt = self.pol.fetch('fdii_ex', year)
         GILTIrt = self.pol.fetch('gilti_ex', year)
         # Potentially include state and local taxes
@@ -91,20 +278,18 @@ class Calculator():
             tau_prop_p = 0.0
         # Run calculations
         for i in range(ntype):
-            ast = ast_codes[i]
             for j in range(nind):
-                ind = ind_codes[j]
                 # Extract relevant parameters
-                Delta_c = self.parm.Deltas.loc[ind, 'corp']
-                Delta_nc = self.parm.Deltas.loc[ind, 'noncorp']
+                Delta_c = self.parm.Delta_c_arr[j]
+                Delta_nc = self.parm.Delta_nc_arr[j]
                 r_c = self.parm.rd * Delta_c + self.parm.re * (1 - Delta_c)
                 r_nc = self.parm.rd * Delta_nc + self.parm.re * (1 - Delta_nc)
-                delta = self.parm.deltas.loc[ast, 'delta']
-                s179_c = self.parm.s179.loc[ast, 'corp']
-                s179_nc = self.parm.s179.loc[ast, 'noncorp']
-                tauf = self.parm.foreign.loc[ind, 'tauf']
+                delta = self.parm.delta_arr[i]
+                s179_c = self.parm.s179_c_arr[i]
+                s179_nc = self.parm.s179_nc_arr[i]
+                tauf = self.parm.tauf_arr[j]
                 # Only use property tax for tangibles
-                if ast[0:2] in ['EN', 'RD', 'AE']:
+                if self.parm.tang[i] == 0:
                     tau_prop_c2 = 0.0
                     tau_prop_sc2 = 0.0
                     tau_prop_sp2 = 0.0
@@ -117,43 +302,43 @@ class Calculator():
                 # Compute costs of capital
                 coc_ccorp[i,j] = calcCOC1(r_c, self.parm.pi, self.parm.rd,
                                           delta, Delta_c, tau_c, phi_c,
-                                          drules.loc[ast, 'method'],
-                                          drules.loc[ast, 'itcrt'],
-                                          drules.loc[ast, 'itc_base'],
-                                          drules.loc[ast, 'itc_life'],
-                                          s179_c, drules.loc[ast, 'bonus'],
-                                          drules.loc[ast, 'life'],
-                                          drules.loc[ast, 'acclrt'],
+                                          ccr_methods[drules['method'][i]],
+                                          drules['itcrt'][i],
+                                          drules['itc_base'][i],
+                                          drules['itc_life'][i],
+                                          s179_c, drules['bonus'][i],
+                                          drules['life'][i],
+                                          drules['acclrt'][i],
                                           tau_prop_c2)
                 coc_scorp[i,j] = calcCOC1(r_nc, self.parm.pi, self.parm.rd,
                                           delta, Delta_nc, tau_sc, phi_nc,
-                                          drules.loc[ast, 'method'],
-                                          drules.loc[ast, 'itcrt'],
-                                          drules.loc[ast, 'itc_base'],
-                                          drules.loc[ast, 'itc_life'],
-                                          s179_nc, drules.loc[ast, 'bonus'],
-                                          drules.loc[ast, 'life'],
-                                          drules.loc[ast, 'acclrt'],
+                                          ccr_methods[drules['method'][i]],
+                                          drules['itcrt'][i],
+                                          drules['itc_base'][i],
+                                          drules['itc_life'][i],
+                                          s179_nc, drules['bonus'][i],
+                                          drules['life'][i],
+                                          drules['acclrt'][i],
                                           tau_prop_sc2)
                 coc_soleprop[i,j] = calcCOC1(r_nc, self.parm.pi, self.parm.rd,
                                              delta, Delta_nc, tau_sp, phi_nc,
-                                             drules.loc[ast, 'method'],
-                                             drules.loc[ast, 'itcrt'],
-                                             drules.loc[ast, 'itc_base'],
-                                             drules.loc[ast, 'itc_life'],
-                                             s179_nc, drules.loc[ast, 'bonus'],
-                                             drules.loc[ast, 'life'],
-                                             drules.loc[ast, 'acclrt'],
+                                             ccr_methods[drules['method'][i]],
+                                             drules['itcrt'][i],
+                                             drules['itc_base'][i],
+                                             drules['itc_life'][i],
+                                             s179_nc, drules['bonus'][i],
+                                             drules['life'][i],
+                                             drules['acclrt'][i],
                                              tau_prop_sp2)
                 coc_partner[i,j] = calcCOC1(r_nc, self.parm.pi, self.parm.rd,
                                             delta, Delta_nc, tau_p, phi_nc,
-                                            drules.loc[ast, 'method'],
-                                            drules.loc[ast, 'itcrt'],
-                                            drules.loc[ast, 'itc_base'],
-                                            drules.loc[ast, 'itc_life'],
-                                            s179_nc, drules.loc[ast, 'bonus'],
-                                            drules.loc[ast, 'life'],
-                                            drules.loc[ast, 'acclrt'],
+                                            ccr_methods[drules['method'][i]],
+                                            drules['itcrt'][i],
+                                            drules['itc_base'][i],
+                                            drules['itc_life'][i],
+                                            s179_nc, drules['bonus'][i],
+                                            drules['life'][i],
+                                            drules['acclrt'][i],
                                             tau_prop_p2)
                 # Compute METRs
                 metr_ccorp[i,j] = ((coc_ccorp[i,j] - r_c + self.parm.pi) /
@@ -192,33 +377,31 @@ class Calculator():
                 mettr_soleprop[i,j] = (coc_soleprop[i,j] - s_nc) / coc_soleprop[i,j]
                 mettr_partner[i,j] = (coc_partner[i,j] - s_nc) / coc_partner[i,j]
                 # Compute EATRs
-                if ast[0:2] in ['EN', 'RD', 'AE']:
-                    tang = 0
-                else:
-                    tang = 1
+                tang = self.parm.tang[i]
                 eatr_dom[i,j] = calcEATRd1(r_c, self.parm.pi, self.parm.rd,
                                            delta, Delta_c, tau_c, phi_c,
                                            FDIIrt, tang, self.parm.p,
-                                           drulesf.loc[ast, 'method'],
-                                           drulesf.loc[ast, 'itcrt'],
-                                           drulesf.loc[ast, 'itc_base'],
-                                           drulesf.loc[ast, 'itc_life'],
-                                           0.0, drules.loc[ast, 'bonus'],
-                                           drulesf.loc[ast, 'life'],
-                                           drulesf.loc[ast, 'acclrt'],
+                                           ccr_methods[drulesf['method'][i]],
+                                           drulesf['itcrt'][i],
+                                           drulesf['itc_base'][i],
+                                           drulesf['itc_life'][i],
+                                           0.0, drules['bonus'][i],
+                                           drulesf['life'][i],
+                                           drulesf['acclrt'][i],
                                            tau_prop_c2)
                 eatr_for[i,j] = calcEATRf1(r_c, self.parm.pi, self.parm.rd,
                                            delta, Delta_c, tau_c,
                                            GILTIrt, tang, self.parm.p, tauf,
-                                           drulesf.loc[ast, 'method'],
-                                           drulesf.loc[ast, 'itcrt'],
-                                           drulesf.loc[ast, 'itc_base'],
-                                           drulesf.loc[ast, 'itc_life'],
-                                           0.0, drules.loc[ast, 'bonus'],
-                                           drulesf.loc[ast, 'life'],
-                                           drulesf.loc[ast, 'acclrt'],
+                                           ccr_methods[drulesf['method'][i]],
+                                           drulesf['itcrt'][i],
+                                           drulesf['itc_base'][i],
+                                           drulesf['itc_life'][i],
+                                           0.0, drules['bonus'][i],
+                                           drulesf['life'][i],
+                                           drulesf['acclrt'][i],
                                            tau_prop_c2)
-        print('Calculations complete for ' + str(year))
+        if self.verbose and str(year) not in self.inputs:
+            print('Calculations complete for ' + str(year))
         results1 = {'corp': coc_ccorp, 'scorp': coc_scorp,
                     'soleprop': coc_soleprop, 'partner': coc_partner}
         self.results_coc[str(year)] = results1
@@ -233,7 +416,575 @@ class Calculator():
         results5 = {'corp': mettr_ccorp, 'scorp': mettr_scorp,
                     'soleprop': mettr_soleprop, 'partner': mettr_partner}
         self.results_mettr[str(year)] = results5
+        self.inputs[str(year)] = self._input_record(year)
+        self._freeze_results(year)
+        self.calc_all_called = True
+    
+    def _array_inputs(self, batch, overrides=None, cells=None):
+        """
+        Extract parameters for a batch of (Calculator, year) pairs as arrays
+        with axes (batch, firm type, asset type, industry), for the array
+        and JIT engines. Policy parameters come from each Calculator's
+        Policy, and economic parameters (rd, re, pi, p, shares and sltaxes)
+        from each Calculator's Parameter. Asset and industry parameters and
+        the equation style come from this Calculator's Parameter.
+        Firm types are ordered C corporation, S corporation, sole
+        proprietorship, partnership. For forward-looking equations, the tax
+        rates (tau, phi, tau_prop) have an added last axis for the period,
+        built as sliding windows over each policy path.
+        Parameters that do not vary by policy have a batch axis of length 1.
+        If overrides is given, it is a list with a dict for each pair of
+        policy parameters (columns of the policy file, or numeric columns
+        of the CCR rules) and the values to use for them instead, in every
+        year and for every asset type.
+        If cells is given, it is a tuple of arrays of the positions of the
+        asset types and industries to keep, and the asset type and industry
+        axes only include those.
+        Returns a dict of arrays.
+        """
+        assert min([year for (calc, year) in batch]) >= 2020
+        nbatch = len(batch)
+        if overrides is None:
+            overrides = [dict() for entry in batch]
+        for override in overrides:
+            for term in override:
+                assert (term in ccr_dtype.names[1:] or
+                        (term in self.pol.policies.columns and
+                         term != 'ccr_sheet')), term + ' cannot be overridden'
+        def get(i, term):
+            # Policy parameter for the ith pair
+            if term in overrides[i]:
+                return overrides[i][term]
+            return batch[i][0].pol.fetch(term, batch[i][1])
+        # Calculators in the batch, each with the positions of its entries
+        calcs = list()
+        for (calc, year) in batch:
+            if not any(calc is c for c in calcs):
+                calcs.append(calc)
+        pos = [[i for i in range(nbatch) if batch[i][0] is calc]
+               for calc in calcs]
+        for (calc, year) in batch:
+            assert calc.parm.forwardLooking == self.parm.forwardLooking
+            assert calc.parm.include_slt == self.parm.include_slt
+            assert calc.parm.horizon == self.parm.horizon
+        inp = dict()
+        def fetch(term):
+            return np.array([get(i, term) for i in range(nbatch)],
+                            dtype=float)
+        # Periods for forward-looking lists, with a constant tail after the
+        # horizon or the last policy year (see forward_length)
+        length = forward_length(min([year for (calc, year) in batch]),
+                                self.parm.horizon)
+        def polwin(term):
+            lists = np.zeros((nbatch, length))
+            for k in range(len(calcs)):
+                years = [batch[i][1] for i in pos[k]]
+                lists[pos[k]] = make_lists_window(calcs[k].pol.policies,
+                                                  term, years, length)
+            for i in range(nbatch):
+                if term in overrides[i]:
+                    lists[i] = overrides[i][term]
+            return lists
+        # Extract policy parameters for the given years
+        if self.parm.forwardLooking:
+            tau_c = polwin('taxrt_ccorp')
+            tau_sc = polwin('taxrt_scorp')
+            tau_sp = polwin('taxrt_soleprop')
+            tau_p = polwin('taxrt_partner')
+            phi_c = polwin('intded_c')
+            phi_nc = polwin('intded_nc')
+            sub_slti = polwin('sub_slti')
+            shape = (nbatch, 1, 1, length)
+        else:
+            tau_c = fetch('taxrt_ccorp')
+            tau_sc = fetch('taxrt_scorp')
+            tau_sp = fetch('taxrt_soleprop')
+            tau_p = fetch('taxrt_partner')
+            phi_c = fetch('intded_c')
+            phi_nc = fetch('intded_nc')
+            sub_slti = fetch('sub_slti')
+            shape = (nbatch, 1, 1)
+        inp['FDIIrt'] = fetch('fdii_ex').reshape((nbatch, 1, 1))
+        inp['GILTIrt'] = fetch('gilti_ex').reshape((nbatch, 1, 1))
+        # Potentially include state and local taxes
+        if self.parm.include_slt:
+            def slt(name):
+                values = np.array([calc.parm.sltaxes[name]
+                                   for (calc, year) in batch], dtype=float)
+                return values.reshape((nbatch,) + (1,) * (len(shape) - 3))
+            tau_c = tau_c + slt('corp') * (1 - tau_c)
+            tau_sc = tau_sc + slt('soleprop') * (1 - sub_slti)
+            tau_sp = tau_sp + slt('partner') * (1 - sub_slti)
+            tau_p = tau_p + slt('partner') * (1 - sub_slti)
+            tau_prop = slt('property')[:, None] * (
+                1 - np.stack([tau_c, tau_sc, tau_sp, tau_p], axis=1))
+        else:
+            tau_prop = np.zeros((nbatch, 4) + shape[2:])
+        # Firm type parameters, shape (nbatch, 4, 1, 1)
+        inp['tau'] = np.stack([tau_c, tau_sc, tau_sp, tau_p], axis=1)
+        inp['tau'] = inp['tau'].reshape((nbatch, 4) + shape[1:])
+        inp['phi'] = np.stack([phi_c, phi_nc, phi_nc, phi_nc], axis=1)
+        inp['phi'] = inp['phi'].reshape((nbatch, 4) + shape[1:])
+        tau_prop = tau_prop.reshape((nbatch, 4) + shape[1:])
+        # Required returns and inflation, shape (nbatch, 1, 1, 1)
+        def econ(name):
+            return np.array([getattr(calc.parm, name)
+                             for (calc, year) in batch],
+                            dtype=float).reshape((nbatch, 1, 1, 1))
+        inp['rd'] = econ('rd')
+        inp['pi'] = econ('pi')
+        inp['p'] = econ('p')[:, 0]
+        # Industry parameters, shape (1, 4, 1, nind), and discount rates,
+        # shape (nbatch, 4, 1, nind)
+        Delta_c = self.parm.Delta_c_arr
+        Delta_nc = self.parm.Delta_nc_arr
+        inp['Delta'] = np.array([Delta_c, Delta_nc, Delta_nc,
+                                 Delta_nc]).reshape((1, 4, 1, nind))
+        inp['r'] = (inp['rd'] * inp['Delta'] +
+                    econ('re') * (1 - inp['Delta']))
+        inp['tauf'] = self.parm.tauf_arr
+        # Asset parameters, shape (1, 1, ntype, 1) or (1, 4, ntype, 1)
+        inp['delta'] = self.parm.delta_arr.reshape((1, 1, ntype, 1))
+        inp['s179'] = np.array([self.parm.s179_c_arr, self.parm.s179_nc_arr,
+                                self.parm.s179_nc_arr,
+                                self.parm.s179_nc_arr]).reshape((1, 4, ntype,
+                                                                 1))
+        # Only use property tax for tangibles
+        tang = self.parm.tang.reshape((1, 1, ntype, 1))
+        inp['tang'] = tang
+        if self.parm.forwardLooking:
+            tang = tang[..., None]
+        inp['tau_prop'] = np.where(tang == 1, tau_prop, 0.0)
+        # CCR rules, shape (nbatch, 1, ntype, 1)
+        drules = [calc.pol.read_ccr_array(year) for (calc, year) in batch]
+        drulesf = [calc.pol.read_ccr_array('foreign')
+                   for (calc, year) in batch]
+        inp['rules'] = dict()
+        inp['rulesf'] = dict()
+        for col in ['method', 'itcrt', 'itc_base', 'itc_life', 'bonus',
+                    'life', 'acclrt']:
+            inp['rules'][col] = np.array([d[col] for d in drules])
+            for i in range(nbatch):
+                if col in overrides[i]:
+                    inp['rules'][col][i] = overrides[i][col]
+            inp['rules'][col] = inp['rules'][col].reshape((nbatch, 1, ntype,
+                                                           1))
+            inp['rulesf'][col] = np.array([d[col] for d in drulesf])
+            inp['rulesf'][col] = inp['rulesf'][col].reshape((nbatch, 1,
+                                                             ntype, 1))
+        # Returns to savers, shape (nbatch, 4, 1, nind)
+        s = np.zeros((nbatch, 4, 1, nind))
+        for y in range(nbatch):
+            (calc, year) = batch[y]
+            taxrt_int = get(y, 'taxrt_int')
+            taxrt_div = get(y, 'taxrt_div')
+            taxrt_scg = get(y, 'taxrt_scg')
+            taxrt_lcg = get(y, 'taxrt_lcg')
+            if self.parm.include_slt:
+                # Include state and local taxes
+                subi = get(y, 'sub_slti')
+                taxrt_int += calc.parm.sltaxes['int'] * (1 - subi)
+                taxrt_div += calc.parm.sltaxes['qdiv'] * (1 - subi)
+                taxrt_scg += calc.parm.sltaxes['scg'] * (1 - subi)
+                taxrt_lcg += calc.parm.sltaxes['lcg'] * (1 - subi)
+            s_c = calcSc(calc.parm.rd, calc.parm.re, calc.parm.pi, Delta_c,
+                         calc.parm.shares, taxrt_int, taxrt_div, taxrt_scg,
+                         taxrt_lcg, get(y, 'stepup'))
+            s_nc = calcSnc(calc.parm.rd, calc.parm.re, calc.parm.pi,
+                           Delta_nc, calc.parm.shares, taxrt_int)
+            s[y] = np.array([s_c, s_nc, s_nc, s_nc]).reshape((4, 1, nind))
+        inp['s'] = s
+        if cells is not None:
+            # Keep only the given asset types and industries
+            (aidx, iidx) = cells
+            def subset(arr):
+                if np.ndim(arr) >= 4 and np.shape(arr)[2] == ntype:
+                    arr = arr[:, :, aidx]
+                if np.ndim(arr) >= 4 and np.shape(arr)[3] == nind:
+                    arr = arr[:, :, :, iidx]
+                return arr
+            for key in inp:
+                if type(inp[key]) is dict:
+                    for col in inp[key]:
+                        inp[key][col] = subset(inp[key][col])
+                else:
+                    inp[key] = subset(inp[key])
+            inp['tauf'] = inp['tauf'][iidx]
+        return inp
+    
+    def _calc_all_basic_array(self, batch, overrides=None, store=True,
+                                cells=None, metrics=None):
+        """
+        Calculate cost of capital by asset type, industry and firm type.
+        Takes naive view that present tax rates persist indefinitely.
+        Same as _calc_all_basic, but evaluates every cell for every
+        (Calculator, year) pair in batch at once using arrays with axes
+        (batch, firm type, asset type, industry), with any policy overrides
+        and only for the given cells (see _array_inputs), and only for the
+        measures in metrics (see calc_all). Stores the results if store is
+        True, and returns them (see _finish_array).
+        """
+        inp = self._array_inputs(batch, overrides, cells)
+        (r, pi, rd, p) = (inp['r'], inp['pi'], inp['rd'], inp['p'])
+        (delta, rules, rulesf) = (inp['delta'], inp['rules'], inp['rulesf'])
+        need = metric_set(metrics)
+        (ncells, nuniq) = (0, 0)
+        (coc, eatr_dom, eatr_for) = (None, None, None)
+        if 'coc' in need:
+            coc = self._reuse_coc(batch, overrides, store, cells, metrics)
+        if 'coc' in need and coc is None:
+            # Compute PV of depreciation once per unique set of parameters
+            (D, ncells1, nuniq1) = calcD_dedup(rules['method'], r, pi, delta,
+                                               rules['life'], rules['acclrt'])
+            ncells += ncells1
+            nuniq += nuniq1
+            # Compute costs of capital
+            coc = calcCOC1_vec(r, pi, rd, delta, inp['Delta'],
+                               inp['tau'], inp['phi'], rules['method'],
+                               rules['itcrt'], rules['itc_base'],
+                               rules['itc_life'], inp['s179'],
+                               rules['bonus'], rules['life'],
+                               rules['acclrt'], inp['tau_prop'], D)
+        if 'eatr' in need:
+            (Df, ncellsf, nuniqf) = calcD_dedup(rulesf['method'][:, 0],
+                                                r[:, 0], pi[:, 0],
+                                                delta[:, 0],
+                                                rulesf['life'][:, 0],
+                                                rulesf['acclrt'][:, 0])
+            ncells += ncellsf
+            nuniq += nuniqf
+            (eatr_dom, eatr_for) = self._calc_eatr_basic_array(inp, Df)
+        if store and ncells > 0:
+            self._store_dedup_stats(batch, ncells, nuniq)
+        return self._finish_array(batch, inp, coc, eatr_dom, eatr_for, store,
+                                  cells, need)
+    
+    def _calc_eatr_basic_array(self, inp, Df):
+        """
+        Compute EATRs (C corporations only) with axes (batch, asset type,
+        industry), for _calc_all_basic_array.
+        """
+        (r, pi, rd, p) = (inp['r'], inp['pi'], inp['rd'], inp['p'])
+        (delta, rules, rulesf) = (inp['delta'], inp['rules'], inp['rulesf'])
+        eatr_dom = calcEATRd1_vec(r[:, 0], pi[:, 0], rd[:, 0], delta[:, 0],
+                                  inp['Delta'][:, 0], inp['tau'][:, 0],
+                                  inp['phi'][:, 0], inp['FDIIrt'],
+                                  inp['tang'][:, 0], p,
+                                  rulesf['method'][:, 0],
+                                  rulesf['itcrt'][:, 0],
+                                  rulesf['itc_base'][:, 0],
+                                  rulesf['itc_life'][:, 0], 0.0,
+                                  rules['bonus'][:, 0], rulesf['life'][:, 0],
+                                  rulesf['acclrt'][:, 0],
+                                  inp['tau_prop'][:, 0], Df)
+        eatr_for = calcEATRf1_vec(r[:, 0], pi[:, 0], rd[:, 0], delta[:, 0],
+                                  inp['Delta'][:, 0], inp['tau'][:, 0],
+                                  inp['GILTIrt'], inp['tang'][:, 0],
+                                  p, inp['tauf'],
+                                  rulesf['method'][:, 0],
+                                  rulesf['itcrt'][:, 0],
+                                  rulesf['itc_base'][:, 0],
+                                  rulesf['itc_life'][:, 0], 0.0,
+                                  rules['bonus'][:, 0], rulesf['life'][:, 0],
+                                  rulesf['acclrt'][:, 0],
+                                  inp['tau_prop'][:, 0], Df)
+        return (eatr_dom, eatr_for)
+    
+    def _calc_all_jit(self, year, metrics=None):
+        """
+        Calculate cost of capital by asset type, industry and firm type.
+        Same as _calc_all_basic or _calc_all_forward, but loops over the
+        cells in compiled code (see jitfunctions.py), only for the measures
+        in metrics (see calc_all).
+        """
+        # Import here so that numba is only required for this engine
+        import jitfunctions as jf
+        inp = self._array_inputs([(self, year)])
+        pi = self.parm.pi
+        # Drop the axes each parameter does not vary along
+        r = inp['r'][0, :, 0, :]
+        Delta = inp['Delta'][0, :, 0, :]
+        delta = inp['delta'][0, 0, :, 0]
+        s179 = inp['s179'][0, :, :, 0]
+        tang = inp['tang'][0, 0, :, 0]
+        tau = inp['tau'][0, :, 0, 0]
+        phi = inp['phi'][0, :, 0, 0]
+        tau_prop = inp['tau_prop'][0, :, :, 0]
+        rules = dict()
+        rulesf = dict()
+        for col in inp['rules']:
+            rules[col] = inp['rules'][col][0, 0, :, 0]
+            rulesf[col] = inp['rulesf'][col][0, 0, :, 0]
+        if self.parm.forwardLooking:
+            calcCOC_grid = jf.calcCOC2_grid
+            calcEATR_grid = jf.calcEATR2_grid
+        else:
+            calcCOC_grid = jf.calcCOC1_grid
+            calcEATR_grid = jf.calcEATR1_grid
+        need = metric_set(metrics)
+        (coc, eatr_dom, eatr_for) = (None, None, None)
+        if 'coc' in need:
+            coc = self._reuse_coc([(self, year)], [dict()], True, None,
+                                  metrics)
+        if 'coc' in need and coc is None:
+            # Compute costs of capital
+            coc = calcCOC_grid(r, pi, self.parm.rd, delta, Delta, tau, phi,
+                               rules['method'], rules['itcrt'],
+                               rules['itc_base'], rules['itc_life'], s179,
+                               rules['bonus'], rules['life'],
+                               rules['acclrt'], tau_prop)[None]
+        if 'eatr' in need:
+            # Compute EATRs (C corporations only)
+            (eatr_dom, eatr_for) = calcEATR_grid(r[0], pi, self.parm.rd,
+                                                 delta, Delta[0], tau[0],
+                                                 phi[0],
+                                                 inp['FDIIrt'][0, 0, 0],
+                                                 inp['GILTIrt'][0, 0, 0],
+                                                 tang, self.parm.p,
+                                                 inp['tauf'],
+                                                 rulesf['method'],
+                                                 rulesf['itcrt'],
+                                                 rulesf['itc_base'],
+                                                 rulesf['itc_life'], 0.0,
+                                                 rules['bonus'],
+                                                 rulesf['life'],
+                                                 rulesf['acclrt'],
+                                                 tau_prop[0])
+            (eatr_dom, eatr_for) = (eatr_dom[None], eatr_for[None])
+        self._finish_array([(self, year)], inp, coc, eatr_dom, eatr_for,
+                           metrics=need)
+    
+    def _finish_array(self, batch, inp, coc, eatr_dom, eatr_for, store=True,
+                      cells=None, metrics=None):
+        """
+        Compute METRs, user costs of capital and METTRs from the costs of
+        capital, with axes (batch, firm type, asset type, industry), for
+        those in the set of measures metrics (by default, all), and store
+        the results for each (Calculator, year) pair in batch if store is
+        True. Measures not calculated are passed as None. If cells is given,
+        the results are only for those asset types and industries, and
+        replace those cells in the results already stored.
+        Returns a dict of the result arrays calculated.
+        """
+        if metrics is None:
+            metrics = set(METRICS)
+        res = dict()
+        if coc is not None:
+            res['coc'] = coc
+        if 'metr' in metrics:
+            # Compute METRs (all relative to C corporation cost of capital)
+            res['metr'] = (coc - inp['r'] + inp['pi']) / coc[:, :1]
+        if 'ucoc' in metrics:
+            # Compute user cost of capital
+            res['ucoc'] = coc + inp['delta']
+        if 'mettr' in metrics:
+            # Compute METTRs
+            res['mettr'] = (coc - inp['s']) / coc
+        if eatr_dom is not None:
+            res['eatr_dom'] = eatr_dom
+            res['eatr_for'] = eatr_for
+        if store:
+            for y in range(len(batch)):
+                (calc, year) = batch[y]
+                if calc.verbose and str(year) not in calc.inputs:
+                    print('Calculations complete for ' + str(year))
+                res1 = {name: res[name][y] for name in res}
+                if cells is not None:
+                    res1 = calc._merge_results(year, cells, res1)
+                calc._store_results(year, **res1)
+        return res
+    
+    def _store_dedup_stats(self, batch, ncells, nunique):
+        """
+        Record how many cells the depreciation PVs were computed for, and
+        how many unique sets of parameters they were computed from, when
+        computed together for the (Calculator, year) pairs in batch.
+        """
+        for (calc, year) in batch:
+            calc.dedup_stats[str(year)] = {
+                'ccr_sheet': calc.pol.policies.loc[min(year, 2029),
+                                                   'ccr_sheet'],
+                'years': [y for (c, y) in batch if c is calc],
+                'scenarios': len(set([id(c) for (c, y) in batch])),
+                'cells': ncells, 'unique': nunique,
+                'deduplicated': ncells - nunique}
+    
+    def _store_results(self, year, coc=None, metr=None, mettr=None,
+                       ucoc=None, eatr_dom=None, eatr_for=None):
+        """
+        Store arrays with axes (firm type, asset type, industry) in the
+        results dictionaries for the given year, for the measures given.
+        """
+        for (results, arr) in [(self.results_coc, coc),
+                               (self.results_metr, metr),
+                               (self.results_mettr, mettr),
+                               (self.results_ucoc, ucoc)]:
+            if arr is not None:
+                results[str(year)] = {ftypes[k]: arr[k] for k in range(4)}
+        if eatr_dom is not None:
+            self.results_international[str(year)] = {'domestic': eatr_dom,
+                                                     'foreign': eatr_for}
+        self.inputs[str(year)] = self._input_record(year)
+        self._freeze_results(year)
         self.calc_all_called = True
+    
+    def _freeze_results(self, year):
+        """
+        Convert the result arrays for the given year to the result dtype
+        (see cast_results), and make them read-only, so that snapshots of
+        this Calculator can share them.
+        """
+        for results in [self.results_coc, self.results_metr,
+                        self.results_ucoc, self.results_international,
+                        self.results_mettr]:
+            if str(year) not in results:
+                continue
+            for key in results[str(year)]:
+                arr = cast_results(results[str(year)][key], self.dtype)
+                arr.flags.writeable = False
+                results[str(year)][key] = arr
+    
+    def _merge_results(self, year, cells, res):
+        """
+        Replace the given cells (see _finish_array) of the results stored
+        for the given year with those in res, a dict of arrays for some of
+        coc, metr, mettr, ucoc, eatr_dom and eatr_for.
+        Returns a dict of the merged arrays.
+        """
+        (aidx, iidx) = cells
+        merged = dict()
+        for name in res:
+            if name in ['eatr_dom', 'eatr_for']:
+                key = {'eatr_dom': 'domestic', 'eatr_for': 'foreign'}[name]
+                old = np.array(self.results_international[str(year)][key])
+                old[np.ix_(aidx, iidx)] = res[name]
+            else:
+                results = getattr(self, METRIC_RESULTS[name])
+                old = np.array([results[str(year)][ftype]
+                                for ftype in ftypes])
+                old[np.ix_(range(4), aidx, iidx)] = res[name]
+            merged[name] = old
+        return merged
+    
+    def _stored_metrics(self, year):
+        """
+        Return the list of measures in METRICS stored for the given year.
+        """
+        return [metric for metric in METRICS
+                if str(year) in getattr(self, METRIC_RESULTS[metric])]
+    
+    def _input_record(self, year):
+        """
+        Record the inputs that the results for the given year depend on:
+            econ: economic parameters and equation style, which affect
+                  every cell
+            policy: policy parameters in the years used, which affect
+                    every cell
+            assets: asset parameters and CCR rules by asset type, which
+                    affect only that asset type
+            industries: industry parameters by industry, which affect only
+                        that industry
+        """
+        parm = self.parm
+        econ = (parm.rd, parm.re, parm.pi, parm.p, parm.include_slt,
+                parm.forwardLooking, parm.horizon,
+                sorted(parm.shares.items()), sorted(parm.sltaxes.items()))
+        if parm.forwardLooking:
+            length = forward_length(year, parm.horizon)
+            years = sorted(set([min(y, 2029)
+                                for y in range(year, year + length)]))
+        else:
+            years = [year]
+        cols = [col for col in self.pol.policies.columns
+                if col != 'ccr_sheet']
+        policy = self.pol.policies.loc[years, cols].to_numpy(dtype=float)
+        rules = self.pol.read_ccr_array(year)
+        rulesf = self.pol.read_ccr_array('foreign')
+        assets = np.column_stack([parm.delta_arr, parm.s179_c_arr,
+                                  parm.s179_nc_arr, parm.tang] +
+                                 [rules[col] for col in rules.dtype.names] +
+                                 [rulesf[col] for col in rulesf.dtype.names])
+        industries = np.column_stack([parm.Delta_c_arr, parm.Delta_nc_arr,
+                                      parm.tauf_arr])
+        return {'econ': econ, 'policy': policy, 'assets': assets,
+                'industries': industries}
+    
+    def update(self, parm=None, pol=None):
+        """
+        Replace the Parameter and/or Policy objects with (snapshots of) parm
+        and pol, and recalculate the results already calculated for each
+        year, only for the cells affected by the inputs that changed (see
+        _input_record). A change in economic or policy parameters affects
+        every cell for the years that use them; a change in the parameters
+        or CCR rules for an asset type affects only that asset type, and a
+        change in the parameters for an industry only that industry. With
+        the loop and JIT engines, every cell is recalculated for the years
+        affected. Only the measures already calculated for each year are
+        recalculated.
+        Returns a dict with the number of cells recalculated for each year.
+        """
+        if parm is not None:
+            self.parm = parm.snapshot()
+        if pol is not None:
+            self.pol = pol.snapshot()
+        fullyears = list()
+        partial = list()
+        ncells = dict()
+        for year in sorted(self.inputs, key=int):
+            old = self.inputs[year]
+            new = self._input_record(int(year))
+            if (old['econ'] != new['econ'] or
+                old['policy'].shape != new['policy'].shape or
+                not np.array_equal(old['policy'], new['policy'],
+                                   equal_nan=True)):
+                fullyears.append(int(year))
+                ncells[year] = 4 * ntype * nind
+                continue
+            def changed(a, b):
+                # Rows with any changed value, treating NaNs as equal
+                same = (a == b) | (np.isnan(a) & np.isnan(b))
+                return np.where(~same.all(axis=1))[0]
+            aidx = changed(old['assets'], new['assets'])
+            iidx = changed(old['industries'], new['industries'])
+            if self.engine != 'array' and len(aidx) + len(iidx) > 0:
+                fullyears.append(int(year))
+                ncells[year] = 4 * ntype * nind
+                continue
+            # Rows for the asset types, and columns for the industries
+            if len(aidx) > 0:
+                partial.append((int(year), (aidx, np.arange(nind))))
+            if len(iidx) > 0:
+                partial.append((int(year), (np.arange(ntype), iidx)))
+            ncells[year] = 4 * (len(aidx) * nind + len(iidx) * ntype -
+                                len(aidx) * len(iidx))
+        # Recalculate years with the same measures together
+        groups = dict()
+        for year in fullyears:
+            metrics = tuple(self._stored_metrics(year))
+            groups.setdefault(metrics, list()).append(year)
+        for metrics in groups:
+            self.calc_years(groups[metrics], list(metrics))
+        for (year, cells) in partial:
+            self._calc_array_batch([(self, year)], cells=cells,
+                                   metrics=self._stored_metrics(year))
+        return ncells
+    
+    def snapshot(self):
+        """
+        Return a copy of this Calculator object that shares its Parameter,
+        Policy and result arrays instead of copying them. Result arrays are
+        read-only, and results added later to either object do not appear
+        in the other.
+        """
+        snap = copy.copy(self)
+        for metric in METRICS:
+            results = getattr(self, METRIC_RESULTS[metric])
+            setattr(snap, METRIC_RESULTS[metric],
+                    LazyResults(snap, metric, {y: dict(results[y])
+                                               for y in results}))
+        snap.dedup_stats = dict(self.dedup_stats)
+        snap.inputs = dict(self.inputs)
+        return snap
         
     def _calc_all_forward(self, year):
         """
@@ -260,16 +1011,21 @@ class Calculator():
         ucoc_partner = np.zeros((ntype, nind))
         eatr_dom = np.zeros((ntype, nind))
         eatr_for = np.zeros((ntype, nind))
-        # Extract policy parameters for the given year
-        taulist_c = make_lists(self.pol.policies, 'taxrt_ccorp', year, 50)
-        taulist_sc = make_lists(self.pol.policies, 'taxrt_scorp', year, 50)
-        taulist_sp = make_lists(self.pol.policies, 'taxrt_soleprop', year, 50)
-        taulist_p = make_lists(self.pol.policies, 'taxrt_partner', year, 50)
-        philist_c = make_lists(self.pol.policies, 'intded_c', year, 50)
-        philist_nc = make_lists(self.pol.policies, 'intded_nc', year, 50)
-        sublist_i = make_lists(self.pol.policies, 'sub_slti', year, 50)
-        drules = self.pol.read_ccr(year)
-        drulesf = self.pol.read_ccr('foreign')
+        # Extract policy parameters for the given year, up to the constant
+        # tail after the horizon or the last policy year (see
+        # forward_length)
+        length = forward_length(year, self.parm.horizon)
+        taulist_c = make_lists(self.pol.policies, 'taxrt_ccorp', year, length)
+        taulist_sc = make_lists(self.pol.policies, 'taxrt_scorp', year, length)
+        taulist_sp = make_lists(self.pol.policies, 'taxrt_soleprop', year,
+                                length)
+        taulist_p = make_lists(self.pol.policies, 'taxrt_partner', year,
+                               length)
+        philist_c = make_lists(self.pol.policies, 'intded_c', year, length)
+        philist_nc = make_lists(self.pol.policies, 'intded_nc', year, length)
+        sublist_i = make_lists(self.pol.policies, 'sub_slti', year, length)
+        drules = self.pol.read_ccr_array(year)
+        drulesf = self.pol.read_ccr_array('foreign')
         FDIIrt = self.pol.fetch('fdii_ex', year)
         GILTIrt = self.pol.fetch('gilti_ex', year)
         # Potentially include state and local taxes
@@ -289,20 +1045,18 @@ class Calculator():
             taulist_prop_p = np.zeros(len(taulist_p))
         # Run calculations
         for i in range(ntype):
-            ast = ast_codes[i]
             for j in range(nind):
-                ind = ind_codes[j]
                 # Extract relevant parameters
-                Delta_c = self.parm.Deltas.loc[ind, 'corp']
-                Delta_nc = self.parm.Deltas.loc[ind, 'noncorp']
+                Delta_c = self.parm.Delta_c_arr[j]
+                Delta_nc = self.parm.Delta_nc_arr[j]
                 r_c = self.parm.rd * Delta_c + self.parm.re * (1 - Delta_c)
                 r_nc = self.parm.rd * Delta_nc + self.parm.re * (1 - Delta_nc)
-                delta = self.parm.deltas.loc[ast, 'delta']
-                s179_c = self.parm.s179.loc[ast, 'corp']
-                s179_nc = self.parm.s179.loc[ast, 'noncorp']
-                tauf = self.parm.foreign.loc[ind, 'tauf']
+                delta = self.parm.delta_arr[i]
+                s179_c = self.parm.s179_c_arr[i]
+                s179_nc = self.parm.s179_nc_arr[i]
+                tauf = self.parm.tauf_arr[j]
                 # Only use property tax for tangibles
-                if ast[0:2] in ['EN', 'RD', 'AE']:
+                if self.parm.tang[i] == 0:
                     taulist_prop_c2 = np.zeros(len(taulist_prop_c))
                     taulist_prop_sc2 = np.zeros(len(taulist_prop_sc))
                     taulist_prop_sp2 = np.zeros(len(taulist_prop_sp))
@@ -315,51 +1069,54 @@ class Calculator():
                 # Compute costs of capital
                 coc_ccorp[i,j] = calcCOC2(r_c, self.parm.pi, self.parm.rd,
                                           delta, Delta_c, taulist_c, philist_c,
-                                          drules.loc[ast, 'method'],
-                                          drules.loc[ast, 'itcrt'],
-                                          drules.loc[ast, 'itc_base'],
-                                          drules.loc[ast, 'itc_life'],
-                                          s179_c, drules.loc[ast, 'bonus'],
-                                          drules.loc[ast, 'life'],
-                                          drules.loc[ast, 'acclrt'],
-                                          taulist_prop_c2, 50)
+                                          ccr_methods[drules['method'][i]],
+                                          drules['itcrt'][i],
+                                          drules['itc_base'][i],
+                                          drules['itc_life'][i],
+                                          s179_c, drules['bonus'][i],
+                                          drules['life'][i],
+                                          drules['acclrt'][i],
+                                          taulist_prop_c2, length)
                 coc_scorp[i,j] = calcCOC2(r_nc, self.parm.pi, self.parm.rd,
-                                          delta, Delta_nc, taulist_sc, philist_nc,
-                                          drules.loc[ast, 'method'],
-                                          drules.loc[ast, 'itcrt'],
-                                          drules.loc[ast, 'itc_base'],
-                                          drules.loc[ast, 'itc_life'],
-                                          s179_nc, drules.loc[ast, 'bonus'],
-                                          drules.loc[ast, 'life'],
-                                          drules.loc[ast, 'acclrt'],
-                                          taulist_prop_sc2, 50)
+                                          delta, Delta_nc, taulist_sc,
+                                          philist_nc,
+                                          ccr_methods[drules['method'][i]],
+                                          drules['itcrt'][i],
+                                          drules['itc_base'][i],
+                                          drules['itc_life'][i],
+                                          s179_nc, drules['bonus'][i],
+                                          drules['life'][i],
+                                          drules['acclrt'][i],
+                                          taulist_prop_sc2, length)
                 coc_soleprop[i,j] = calcCOC2(r_nc, self.parm.pi, self.parm.rd,
-                                             delta, Delta_nc, taulist_sp, philist_nc,
-                                             drules.loc[ast, 'method'],
-                                             drules.loc[ast, 'itcrt'],
-                                             drules.loc[ast, 'itc_base'],
-                                             drules.loc[ast, 'itc_life'],
-                                             s179_nc, drules.loc[ast, 'bonus'],
-                                             drules.loc[ast, 'life'],
-                                             drules.loc[ast, 'acclrt'],
-                                             taulist_prop_sp2, 50)
+                                             delta, Delta_nc, taulist_sp,
+                                             philist_nc,
+                                             ccr_methods[drules['method'][i]],
+                                             drules['itcrt'][i],
+                                             drules['itc_base'][i],
+                                             drules['itc_life'][i],
+                                             s179_nc, drules['bonus'][i],
+                                             drules['life'][i],
+                                             drules['acclrt'][i],
+                                             taulist_prop_sp2, length)
                 coc_partner[i,j] = calcCOC2(r_nc, self.parm.pi, self.parm.rd,
-                                            delta, Delta_nc, taulist_p, philist_nc,
-                                            drules.loc[ast, 'method'],
-                                            drules.loc[ast, 'itcrt'],
-                                            drules.loc[ast, 'itc_base'],
-                                            drules.loc[ast, 'itc_life'],
-                                            s179_nc, drules.loc[ast, 'bonus'],
-                                            drules.loc[ast, 'life'],
-                                            drules.loc[ast, 'acclrt'],
-                                            taulist_prop_p2, 50)
+                                            delta, Delta_nc, taulist_p,
+                                            philist_nc,
+                                            ccr_methods[drules['method'][i]],
+                                            drules['itcrt'][i],
+                                            drules['itc_base'][i],
+                                            drules['itc_life'][i],
+                                            s179_nc, drules['bonus'][i],
+                                            drules['life'][i],
+                                            drules['acclrt'][i],
+                                            taulist_prop_p2, length)
                 # Compute METRs
                 metr_ccorp[i,j] = ((coc_ccorp[i,j] - r_c + self.parm.pi) /
                                    coc_ccorp[i,j])
                 metr_scorp[i,j] = ((coc_scorp[i,j] - r_nc + self.parm.pi) /
                                    coc_ccorp[i,j])
-                metr_soleprop[i,j] = ((coc_soleprop[i,j] - r_nc + self.parm.pi) /
-                                      coc_ccorp[i,j])
+                metr_soleprop[i,j] = ((coc_soleprop[i,j] - r_nc +
+                                       self.parm.pi) / coc_ccorp[i,j])
                 metr_partner[i,j] = ((coc_partner[i,j] - r_nc + self.parm.pi) /
                                      coc_ccorp[i,j])
                 # Compute user cost of capital
@@ -387,36 +1144,37 @@ class Calculator():
                 # Compute METTRs
                 mettr_ccorp[i,j] = (coc_ccorp[i,j] - s_c) / coc_ccorp[i,j]
                 mettr_scorp[i,j] = (coc_scorp[i,j] - s_nc) / coc_scorp[i,j]
-                mettr_soleprop[i,j] = (coc_soleprop[i,j] - s_nc) / coc_soleprop[i,j]
-                mettr_partner[i,j] = (coc_partner[i,j] - s_nc) / coc_partner[i,j]
+                mettr_soleprop[i,j] = ((coc_soleprop[i,j] - s_nc) /
+                                       coc_soleprop[i,j])
+                mettr_partner[i,j] = ((coc_partner[i,j] - s_nc) /
+                                      coc_partner[i,j])
                 # Compute EATRs
-                if ast[0:2] in ['EN', 'RD', 'AE']:
-                    tang = 0
-                else:
-                    tang = 1
+                tang = self.parm.tang[i]
                 eatr_dom[i,j] = calcEATRd2(r_c, self.parm.pi, self.parm.rd,
-                                           delta, Delta_c, taulist_c, philist_c,
+                                           delta, Delta_c, taulist_c,
+                                           philist_c,
                                            FDIIrt, tang, self.parm.p,
-                                           drulesf.loc[ast, 'method'],
-                                           drulesf.loc[ast, 'itcrt'],
-                                           drulesf.loc[ast, 'itc_base'],
-                                           drulesf.loc[ast, 'itc_life'],
-                                           0.0, drules.loc[ast, 'bonus'],
-                                           drulesf.loc[ast, 'life'],
-                                           drulesf.loc[ast, 'acclrt'],
+                                           ccr_methods[drulesf['method'][i]],
+                                           drulesf['itcrt'][i],
+                                           drulesf['itc_base'][i],
+                                           drulesf['itc_life'][i],
+                                           0.0, drules['bonus'][i],
+                                           drulesf['life'][i],
+                                           drulesf['acclrt'][i],
                                            taulist_prop_c2)
                 eatr_for[i,j ] = calcEATRf2(r_c, self.parm.pi, self.parm.rd,
                                            delta, Delta_c, taulist_c,
                                            GILTIrt, tang, self.parm.p, tauf,
-                                           drulesf.loc[ast, 'method'],
-                                           drulesf.loc[ast, 'itcrt'],
-                                           drulesf.loc[ast, 'itc_base'],
-                                           drulesf.loc[ast, 'itc_life'],
-                                           0.0, drules.loc[ast, 'bonus'],
-                                           drulesf.loc[ast, 'life'],
-                                           drulesf.loc[ast, 'acclrt'],
+                                           ccr_methods[drulesf['method'][i]],
+                                           drulesf['itcrt'][i],
+                                           drulesf['itc_base'][i],
+                                           drulesf['itc_life'][i],
+                                           0.0, drules['bonus'][i],
+                                           drulesf['life'][i],
+                                           drulesf['acclrt'][i],
                                            taulist_prop_c2)
-        print('Calculations complete for ' + str(year))
+        if self.verbose and str(year) not in self.inputs:
+            print('Calculations complete for ' + str(year))
         results1 = {'corp': coc_ccorp, 'scorp': coc_scorp,
                     'soleprop': coc_soleprop, 'partner': coc_partner}
         self.results_coc[str(year)] = results1
@@ -431,4 +1189,177 @@ class Calculator():
         results5 = {'corp': mettr_ccorp, 'scorp': mettr_scorp,
                     'soleprop': mettr_soleprop, 'partner': mettr_partner}
         self.results_mettr[str(year)] = results5
+        self.inputs[str(year)] = self._input_record(year)
+        self._freeze_results(year)
         self.calc_all_called = True
+    
+    def _calc_all_forward_array(self, batch, overrides=None, store=True,
+                                cells=None, metrics=None):
+        """
+        Calculate cost of capital by asset type, industry and firm type.
+        Uses forward-looking equations for future tax policies.
+        Same as _calc_all_forward, but evaluates every cell for every
+        (Calculator, year) pair in batch at once using arrays with axes
+        (batch, firm type, asset type, industry, period), with any policy
+        overrides and only for the given cells (see _array_inputs), and
+        only for the measures in metrics (see calc_all). Stores the results
+        if store is True, and returns them (see _finish_array).
+        """
+        inp = self._array_inputs(batch, overrides, cells)
+        (r, pi, rd, p) = (inp['r'], inp['pi'], inp['rd'], inp['p'])
+        (delta, rules, rulesf) = (inp['delta'], inp['rules'], inp['rulesf'])
+        s179 = inp['s179']
+        length = inp['tau'].shape[-1]
+        need = metric_set(metrics)
+        (ncells, nuniq) = (0, 0)
+        (coc, eatr_dom, eatr_for) = (None, None, None)
+        if 'coc' in need:
+            coc = self._reuse_coc(batch, overrides, store, cells, metrics)
+        if 'coc' in need and coc is None:
+            # Compute PVs of depreciation once per unique set of parameters
+            exprt = s179 + (1 - s179) * rules['bonus']
+            (Dlist, ncells1, nuniq1) = calcDlist_dedup(rules['method'], r,
+                                                       pi, delta,
+                                                       rules['life'],
+                                                       rules['acclrt'],
+                                                       exprt, length)
+            ncells += ncells1
+            nuniq += nuniq1
+            # Compute costs of capital
+            coc = calcCOC2_vec(r, pi, rd, delta, inp['Delta'],
+                               inp['tau'], inp['phi'], rules['method'],
+                               rules['itcrt'], rules['itc_base'],
+                               rules['itc_life'], s179, rules['bonus'],
+                               rules['life'], rules['acclrt'],
+                               inp['tau_prop'], length, Dlist=Dlist)
+        if 'eatr' in need:
+            exprtf = 0.0 + (1 - 0.0) * rules['bonus'][:, 0]
+            (Dlistf, ncellsf, nuniqf) = calcDlist_dedup(
+                rulesf['method'][:, 0], r[:, 0], pi[:, 0], delta[:, 0],
+                rulesf['life'][:, 0], rulesf['acclrt'][:, 0], exprtf,
+                length)
+            (Df, ncellsf2, nuniqf2) = calcD_dedup(rulesf['method'][:, 0],
+                                                  r[:, 0], pi[:, 0],
+                                                  delta[:, 0],
+                                                  rulesf['life'][:, 0],
+                                                  rulesf['acclrt'][:, 0])
+            ncells += ncellsf + ncellsf2
+            nuniq += nuniqf + nuniqf2
+            (eatr_dom, eatr_for) = self._calc_eatr_forward_array(inp, Dlistf,
+                                                                 Df)
+        if store and ncells > 0:
+            self._store_dedup_stats(batch, ncells, nuniq)
+        return self._finish_array(batch, inp, coc, eatr_dom, eatr_for, store,
+                                  cells, need)
+    
+    def _calc_eatr_forward_array(self, inp, Dlistf, Df):
+        """
+        Compute EATRs (C corporations only) with axes (batch, asset type,
+        industry), for _calc_all_forward_array.
+        """
+        (r, pi, rd, p) = (inp['r'], inp['pi'], inp['rd'], inp['p'])
+        (delta, rules, rulesf) = (inp['delta'], inp['rules'], inp['rulesf'])
+        eatr_dom = calcEATRd2_vec(r[:, 0], pi[:, 0], rd[:, 0], delta[:, 0],
+                                  inp['Delta'][:, 0], inp['tau'][:, 0],
+                                  inp['phi'][:, 0], inp['FDIIrt'],
+                                  inp['tang'][:, 0], p,
+                                  rulesf['method'][:, 0],
+                                  rulesf['itcrt'][:, 0],
+                                  rulesf['itc_base'][:, 0],
+                                  rulesf['itc_life'][:, 0], 0.0,
+                                  rules['bonus'][:, 0], rulesf['life'][:, 0],
+                                  rulesf['acclrt'][:, 0],
+                                  inp['tau_prop'][:, 0], Dlistf)
+        eatr_for = calcEATRf2_vec(r[:, 0], pi[:, 0], rd[:, 0], delta[:, 0],
+                                  inp['Delta'][:, 0], inp['tau'][:, 0],
+                                  inp['GILTIrt'], inp['tang'][:, 0],
+                                  p, inp['tauf'],
+                                  rulesf['method'][:, 0],
+                                  rulesf['itcrt'][:, 0],
+                                  rulesf['itc_base'][:, 0],
+                                  rulesf['itc_life'][:, 0], 0.0,
+                                  rules['bonus'][:, 0], rulesf['life'][:, 0],
+                                  rulesf['acclrt'][:, 0],
+                                  inp['tau_prop'][:, 0], Df)
+        return (eatr_dom, eatr_for)
+
+
+def calc_scenarios(parm, pols, yearlist, engine='array', metrics=None,
+                   dtype='float64', verbose=True):
+    """
+    Creates a Calculator for each Policy object in pols, all using the
+    Parameter object parm and storing results in dtype (and printing
+    progress messages if verbose), and calculates results for every year
+    in yearlist, for the measures in metrics (see Calculator.calc_all). With the array engine, the scenarios are
+    evaluated together with a leading scenario axis, so parameter arrays
+    and discount kernels are built once for all of them.
+    Returns the list of Calculator objects, in the same order as pols.
+    """
+    calcs = [Calculator(parm, pol, engine, dtype, verbose)
+             for pol in pols]
+    if engine == 'array':
+        batch = [(calc, year) for calc in calcs for year in yearlist]
+        calcs[0]._calc_array_batch(batch, metrics=metrics)
+    else:
+        for calc in calcs:
+            calc.calc_years(yearlist, metrics)
+    return calcs
+
+# Parameters and policy rates that calc_jacobian differentiates with respect
+# to by default
+JACOBIAN_PARMS = ['rf', 'pi', 'premD', 'premE', 'p']
+JACOBIAN_POLS = ['taxrt_ccorp', 'taxrt_scorp', 'taxrt_soleprop',
+                 'taxrt_partner', 'taxrt_int', 'taxrt_div', 'taxrt_scg',
+                 'taxrt_lcg']
+
+def calc_jacobian(parm, pol, year, parmvars=JACOBIAN_PARMS,
+                  polvars=JACOBIAN_POLS, h=1e-4):
+    """
+    Calculates the derivatives of the results for the given year with
+    respect to economic parameters and policy rates, using central
+    differences with step h. Every bumped scenario is evaluated together
+    in one batch with the array engine.
+        parmvars: economic parameters, from 'rf', 'pi', 'premD', 'premE'
+                  and 'p'; the required returns rd and re move with rf
+                  and with their premiums
+        polvars: columns of the policy file; each is shifted in every year
+    Returns a dict with the list of variables ('vars') and arrays of
+    derivatives with axes (variable, firm type, asset type, industry) for
+    coc, metr and mettr, and (variable, asset type, industry) for eatr_dom
+    and eatr_for.
+    """
+    for var in parmvars:
+        assert var in ['rf', 'pi', 'premD', 'premE', 'p']
+    for var in polvars:
+        assert var in pol.policies.columns and var != 'ccr_sheet'
+    base = Calculator(parm, pol, verbose=False)
+    # Calculators with each variable bumped down and up
+    calcs = list()
+    for var in parmvars:
+        for step in [-h, h]:
+            parm2 = base.parm.snapshot()
+            setattr(parm2, var, getattr(parm2, var) + step)
+            if var in ['rf', 'premD']:
+                parm2.rd = parm2.rd + step
+            if var in ['rf', 'premE']:
+                parm2.re = parm2.re + step
+            calcs.append(Calculator(parm2, base.pol, verbose=False))
+    for var in polvars:
+        for step in [-h, h]:
+            pol2 = base.pol.snapshot()
+            pol2.policies[var] = pol2.policies[var] + step
+            calcs.append(Calculator(base.parm, pol2, verbose=False))
+    base._calc_array_batch([(calc, year) for calc in calcs])
+    # Central differences
+    def diff(results, keys):
+        res = np.array([[results(calc)[str(year)][key] for key in keys]
+                        for calc in calcs])
+        return (res[1::2] - res[0::2]) / (2 * h)
+    jac = {'vars': parmvars + polvars}
+    jac['coc'] = diff(lambda calc: calc.results_coc, ftypes)
+    jac['metr'] = diff(lambda calc: calc.results_metr, ftypes)
+    jac['mettr'] = diff(lambda calc: calc.results_mettr, ftypes)
+    (jac['eatr_dom'], jac['eatr_for']) = np.moveaxis(
+        diff(lambda calc: calc.results_international,
+             ['domestic', 'foreign']), 1, 0)
+    return jac
@@ -41,3 +41,6 @@ catlist = ['All', 'C corporations', 'S corporations',
            'Equipment', 'Structures', 'Residential',
            'Intellectual property']
 
+
+# Capital cost recovery methods, in order of their integer codes
+ccr_methods = ['DB', 'SL', 'EXP', 'ECON']
@@ -0,0 +1,105 @@
+"""
+Binary cache for parsed input files.
+
+Parsing CCR_rules.xlsx with pandas is the slowest part of creating a
+Policy object. The functions here parse a file once, save the resulting
+DataFrames as a compressed NumPy file next to it (FILENAME.npz), and load
+that instead whenever it is still valid. The cache records a hash of the
+original file, so it is rebuilt whenever the file changes.
+"""
+import hashlib
+import os
+import zipfile
+import numpy as np
+import pandas as pd
+
+
+def file_hash(path):
+    """
+    Return the SHA-1 hash of the contents of a file.
+    """
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _save_frames(cachepath, fhash, frames):
+    """
+    Save a dict of DataFrames (with default indexes) to cachepath, along
+    with the hash of the file they were parsed from.
+    """
+    arrays = {'hash': np.array(fhash), 'names': np.array(list(frames))}
+    for i, name in enumerate(frames):
+        df = frames[name]
+        arrays['columns_%d' % i] = np.array(list(df.columns))
+        for j, col in enumerate(df.columns):
+            values = df[col].to_numpy()
+            if values.dtype == object:
+                # Strings are stored as fixed-width unicode
+                assert all(type(v) is str for v in values)
+                values = values.astype(str)
+            arrays['data_%d_%d' % (i, j)] = values
+    # Write to a temporary file first, so other processes never read a
+    # partly written cache
+    tmppath = cachepath + '.' + str(os.getpid()) + '.tmp'
+    try:
+        with open(tmppath, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmppath, cachepath)
+    except OSError:
+        # Skip caching if the cache cannot be written
+        print('Warning: could not write cache file ' + cachepath)
+
+
+def _load_frames(cachepath, fhash, names=None):
+    """
+    Load a dict of DataFrames from cachepath, only for the given names if
+    names is not None. Returns None if there is no cache or it was built
+    from a different version of the file.
+    """
+    if not os.path.exists(cachepath):
+        return None
+    try:
+        with np.load(cachepath, allow_pickle=False) as cache:
+            if str(cache['hash']) != fhash:
+                return None
+            frames = dict()
+            for i, name in enumerate(cache['names']):
+                if names is not None and str(name) not in names:
+                    continue
+                columns = list(cache['columns_%d' % i])
+                frames[str(name)] = pd.DataFrame(
+                    {str(col): cache['data_%d_%d' % (i, j)]
+                     for j, col in enumerate(columns)})
+            return frames
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        # Treat unreadable caches as missing
+        return None
+
+
+def read_excel_cached(path, sheets=None):
+    """
+    Return a dict of DataFrames for the given sheets (by default, every
+    sheet) in an Excel workbook, as from pd.read_excel, using the cache if
+    valid. The cache always holds every sheet.
+    """
+    fhash = file_hash(path)
+    frames = _load_frames(path + '.npz', fhash, sheets)
+    if frames is None:
+        frames = pd.read_excel(path, sheet_name=None)
+        _save_frames(path + '.npz', fhash, frames)
+        if sheets is not None:
+            frames = {name: frames[name] for name in sheets}
+    return frames
+
+
+def read_csv_cached(path):
+    """
+    Return a DataFrame of a CSV file, as from pd.read_csv(path), using the
+    cache if valid.
+    """
+    fhash = file_hash(path)
+    frames = _load_frames(path + '.npz', fhash)
+    if frames is None:
+        frames = {'csv': pd.read_csv(path)}
+        _save_frames(path + '.npz', fhash, frames)
+    return frames['csv']
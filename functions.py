@@ -1,4 +1,6 @@
+from collections import OrderedDict
 import numpy as np
+from config import ccr_methods
 
 
 def _calcD_db(r, L, n):
@@ -77,7 +79,21 @@ def _calcD_dbsl_per(r, L, n, a, b):
                      (1 - np.exp(-r * (b - a))))
     else:
         # end of period occurs after tax life ends
-        if a < t2:
+        if a < t1:
+            # If period covers the switch to straight-line depreciation
+            # and the end of the tax life (as for the last period, which
+            # runs to infinity)
+            Ddb = (n / L / (r + n / L) *
+                   np.exp(-(r + n / L) * a) *
+                   (1 - np.exp(-(r + n / L) * (t1 - a))))
+            if r == 0:
+                Dsl = np.exp(1 - n)
+            else:
+                Dsl = (n / L / r * np.exp(1 - n) *
+                       np.exp(-r * t1) *
+                       (1 - np.exp(-r * (t2 - t1))))
+            D = Ddb + Dsl
+        elif a < t2:
             # If tax life ends during period
             if r == 0:
                 D = np.exp(1 - n) * (t2 - a) / (t2 - t1)
@@ -101,14 +117,85 @@ def _calcDlist_dbsl(r, L, n, exprt, length=50):
         L: tax life
         r: discount rate
         exprt: effective expensing rate
-        length: number of periods to use
+        length: number of periods to use, with the last period running to
+                infinity (at least 2)
     """
+    assert length >= 2
     Dlist = np.zeros(length)
     Dlist[0] = exprt + (1 - exprt) * _calcD_dbsl_per(r, L, n, 0, 0.5)
-    for j in range(1, length):
+    for j in range(1, length-1):
         Dlist[j] = (1 - exprt) * _calcD_dbsl_per(r, L, n, j-0.5, j+0.5)
+    # Calculate from last period to infinity
+    Dlist[length-1] = ((1 - exprt) *
+                       _calcD_dbsl_per(r, L, n, length-1-0.5, 9e99))
     return Dlist
 
+def _calc_periods(length, last=None):
+    """
+    Return arrays of the start and end of each period, using the mid-year
+    convention. If last is given, it is the end of the final period.
+    """
+    a = np.arange(length) - 0.5
+    a[0] = 0.0
+    b = np.arange(length) + 0.5
+    if last is not None:
+        b[length-1] = last
+    return (a, b)
+
+# Cache of discount kernels, keyed by (effective discount rate, length)
+KERNEL_CACHE_SIZE = 16384
+_kernel_cache = OrderedDict()
+
+def _calcKernels(x, length):
+    """
+    Return discount factors for each period, using the mid-year convention
+    with the last period running to infinity:
+        elo: exp(-x * a) at the start of each period
+        ehi: exp(-x * b) at the end of each period
+        eper: 1 - exp(-x * (b - a)) over each period
+    These depend only on the effective discount rate x = r - pi + delta,
+    so they are computed once per unique rate and kept in a bounded LRU
+    cache for reuse across cells, firm types and years.
+        x: effective discount rate (scalar or array)
+        length: number of periods to use
+    Returns arrays with the shape of x plus a last axis for the period.
+    """
+    if np.ndim(x) == 0 and (float(x), length) in _kernel_cache:
+        # Fast path for a single rate already in the cache
+        _kernel_cache.move_to_end((float(x), length))
+        kern = _kernel_cache[(float(x), length)]
+        return (kern[0], kern[1], kern[2])
+    xarr = np.asarray(x, dtype=float)
+    (xuniq, inverse) = np.unique(xarr, return_inverse=True)
+    kernels = [None] * len(xuniq)
+    missing = list()
+    for k in range(len(xuniq)):
+        key = (xuniq[k], length)
+        if key in _kernel_cache:
+            _kernel_cache.move_to_end(key)
+            kernels[k] = _kernel_cache[key]
+        else:
+            missing.append(k)
+    if len(missing) > 0:
+        # Compute all new kernels at once
+        (a, b) = _calc_periods(length, 9e99)
+        xnew = xuniq[missing][:, None]
+        elo = np.exp(-xnew * a)
+        ehi = np.exp(-xnew * b)
+        eper = 1 - np.exp(-xnew * (b - a))
+        for m in range(len(missing)):
+            kern = np.array([elo[m], ehi[m], eper[m]])
+            kern.flags.writeable = False
+            kernels[missing[m]] = kern
+            _kernel_cache[(xuniq[missing[m]], length)] = kern
+        while len(_kernel_cache) > KERNEL_CACHE_SIZE:
+            _kernel_cache.popitem(last=False)
+    kernels = np.array(kernels)[inverse.reshape(-1)]
+    kernels = kernels.reshape(xarr.shape + (3, length))
+    if xarr.ndim == 0:
+        return (kernels[0], kernels[1], kernels[2])
+    return (kernels[..., 0, :], kernels[..., 1, :], kernels[..., 2, :])
+
 def _calcD_econ(r, pi, delta):
     """
     Calculate present value of depreciation deductions by economic
@@ -143,14 +230,21 @@ def _calcDlist_econ(r, pi, delta, exprt, length=50):
         r: discount rate
         exprt: effective expensing rate
     """
-    # Calculate for fist (half) year
-    Dlist = np.zeros(length)
-    Dlist[0] = exprt + (1 - exprt) * _calcD_econ_per(r, pi, delta, 0, 0.5)
-    for j in range(1, length-1):
-        Dlist[j] = (1 - exprt) * _calcD_econ_per(r, pi, delta, j-0.5, j+0.5)
-    # Calculate from last period to infinity
-    Dlist[length-1] = ((1 - exprt) *
-                       _calcD_econ_per(r, pi, delta, length-1-0.5, 9e99))
+    if r - pi + delta == 0:
+        # Calculate for fist (half) year
+        Dlist = np.zeros(length)
+        Dlist[0] = exprt + (1 - exprt) * _calcD_econ_per(r, pi, delta, 0, 0.5)
+        for j in range(1, length-1):
+            Dlist[j] = ((1 - exprt) *
+                        _calcD_econ_per(r, pi, delta, j-0.5, j+0.5))
+        # Calculate from last period to infinity
+        Dlist[length-1] = ((1 - exprt) *
+                           _calcD_econ_per(r, pi, delta, length-1-0.5, 9e99))
+        return Dlist
+    # Use cached discount factors, with the last period running to infinity
+    (elo, _, eper) = _calcKernels(r - pi + delta, length)
+    Dlist = (1 - exprt) * (delta / (r - pi + delta) * elo * eper)
+    Dlist[0] = exprt + Dlist[0]
     return Dlist
 
 def _calcITCpv(c, r, L):
@@ -209,11 +303,14 @@ def _calcD_list(method, r, pi, delta, life, accl, exprt, length=50):
     return Dlist
 
 def _calcZ2(method, r, taulist, itcrt, itcdb, itclife, s179, bonus, 
-            pi=None, delta=None, life = None, accl=None, length=50):
+            pi=None, delta=None, life = None, accl=None, length=None):
     """
-    Calculate tax shield from capital cost recovery assuming constant tax
-    rates.
+    Calculate tax shield from capital cost recovery allowing for tax rates
+    that vary by year.
+        length: number of periods to use (by default, the length of taulist)
     """
+    if length is None:
+        length = len(taulist)
     # Compute effective expensing rate (ignoring actual expensing)
     exprt = s179 + (1 - s179) * bonus
     # Produce Dlist
@@ -251,7 +348,7 @@ def _calcF_per(r, rd, pi, delta, Delta, a, b):
          (1 - np.exp(-(r - pi + delta) * (b - a))))
     return F
 
-def _calcF2(r, rd, pi, delta, Delta, taulist, philist, length=50):
+def _calcF2(r, rd, pi, delta, Delta, taulist, philist, length=None):
     """
     Calculates present value of interest deduction over lifetime
         Delta: ratio of debt to assets
@@ -261,17 +358,15 @@ def _calcF2(r, rd, pi, delta, Delta, taulist, philist, length=50):
         delta: depreciation rate
         taulist: array of tax rates per period
         philist: array of deductible shares of interest per period
-        length: number of periods to use
+        length: number of periods to use (by default, the length of taulist)
     """
+    if length is None:
+        length = len(taulist)
     assert len(taulist) == length
     assert len(philist) == length
-    Flist = np.zeros(length)
-    # Calcuate for first (half) year
-    Flist[0] = _calcF_per(r, rd, pi, delta, Delta, 0, 0.5)
-    for j in range(1, length-1):
-        Flist[j] = _calcF_per(r, rd, pi, delta, Delta, j-0.5, j+0.5)
-    # Calculate from final period to infinity
-    Flist[length-1] = _calcF_per(r, rd, pi, delta, Delta, length-1-0.5, 9e99)
+    # Use cached discount factors, with the last period running to infinity
+    (elo, _, eper) = _calcKernels(r - pi + delta, length)
+    Flist = Delta * rd / (r - pi + delta) * elo * eper
     F = sum(Flist * philist * taulist)
     return F
 
@@ -283,12 +378,9 @@ def _calcT(r, pi, delta, taulist):
         delta: depreciation rate
         taulist: array of tax rates per period
     """
-    T = taulist[0] * (1 - np.exp(-(r - pi + delta) * 0.5))
-    for j in range(1, len(taulist) - 1):
-        T += taulist[j] * (np.exp(-(r - pi + delta) * (j - 0.5)) -
-                           np.exp(-(r - pi + delta) * (j + 0.5)))
-    T += (taulist[len(taulist) - 1] *
-          np.exp(-(r - pi + delta) * (len(taulist) - 1.5)))
+    # Use cached discount factors, with the last period running to infinity
+    (elo, ehi, _) = _calcKernels(r - pi + delta, len(taulist))
+    T = sum(taulist * (elo - ehi))
     return T
 
 def calcCOC1(r, pi, rd, delta, Delta, tau, phi,
@@ -304,9 +396,11 @@ def calcCOC1(r, pi, rd, delta, Delta, tau, phi,
 
 def calcCOC2(r, pi, rd, delta, Delta, taulist, philist,
              method, itcrt, itcdb, itclife, s179, bonus, life, accl,
-             taulist_prop, length = 50):
+             taulist_prop, length=None):
     """
     Calculate cost of capital allowing for tax rates that vary by year.
+    The lists have a value for each period, with the last period running to
+    infinity (see make_lists).
     """
     Z = _calcZ2(method, r, taulist, itcrt, itcdb, itclife, s179, bonus, pi,
                 delta, life, accl, length)
@@ -402,9 +496,29 @@ def calcEATRf2(r, pi, rd, delta, Delta, taulist, exGILTI, tang, p, tauf,
             (p - 0.1*tang) / p * max(T * (1.0 - exGILTI) - 0.8*tauf, 0))
     return eatr
 
+def forward_length(syear, length=None):
+    """
+    Return the number of periods to use for forward-looking lists beginning
+    in syear, for a horizon of length periods (None for an infinite
+    horizon). Policies are constant after 2029, and the last period of each
+    list runs to infinity, so the list only needs the years up to 2029 plus
+    one period for the constant tail after them; the tail is then included
+    in closed form, with no truncation error. Shorter horizons are kept as
+    they are; any horizon of at least 2030 - syear (so any of at least 10,
+    for years from 2020) gives the same lists as an infinite one.
+    """
+    nexplicit = max(2030 - syear, 2)
+    if length is None:
+        return nexplicit
+    assert length >= 2
+    return min(length, nexplicit)
+
 def make_lists(poldf, ptype, syear, length):
     """
     Make arrays of given length of tax rates or deductible interest shares.
+    The functions using these lists take the last period to run to
+    infinity, so the last value applies to every later year (see
+    forward_length).
         policies: regular policy DataFrame
         ptype: Policy parameter to convert into forward-looking list
         syear: year to begin array
@@ -419,6 +533,28 @@ def make_lists(poldf, ptype, syear, length):
         pollist[year-syear] = poldf.loc[min(year, 2029), ptype]
     return pollist
 
+def make_lists_window(poldf, ptype, years, length):
+    """
+    Make arrays of given length of tax rates or deductible interest shares
+    for several start years at once, as rows of a (year, period) array.
+    Row i equals make_lists(poldf, ptype, years[i], length). The rows are
+    read-only windows into a single policy path.
+        policies: regular policy DataFrame
+        ptype: Policy parameter to convert into forward-looking lists
+        years: list of years to begin arrays
+    """
+    assert ptype in ['taxrt_ccorp', 'taxrt_scorp', 'taxrt_soleprop',
+                     'taxrt_partner', 'sub_slti', 'intded_c', 'intded_nc']
+    assert min(years) >= 2020
+    assert type(length) is int
+    assert length >= 1
+    syear = min(years)
+    pathyears = [min(year, 2029)
+                 for year in range(syear, max(years) + length)]
+    path = poldf.loc[pathyears, ptype].to_numpy(dtype=float)
+    windows = np.lib.stride_tricks.sliding_window_view(path, length)
+    return windows[np.array(years) - syear]
+
 def calcSc(rd, re, pi, Delta, shares, tau_int, tau_div, tau_scg, tau_lcg,
            stepup):
     """
@@ -473,3 +609,406 @@ def calcSnc(rd, re, pi, Delta, shares, tau_int):
     s = Delta * sd + (1 - Delta) * se
     return s
 
+
+
+# Array versions of the functions above. Every argument may be a NumPy array,
+# and all arguments are broadcast against each other, so a whole grid of
+# asset types, industries and firm types can be evaluated in one call.
+# These follow the scalar functions term by term, so they reproduce them.
+# Depreciation methods are given as integer codes, the position of the
+# method in config.ccr_methods (as in Policy.read_ccr_array).
+DB = ccr_methods.index('DB')
+SL = ccr_methods.index('SL')
+EXP = ccr_methods.index('EXP')
+ECON = ccr_methods.index('ECON')
+
+def _calcD_db_vec(r, L, n):
+    """
+    Array version of _calcD_db.
+    """
+    term1 = n / (r * L + n) * (1 - np.exp(-(r * L + n) * (n - 1) / n))
+    term2 = n / r / L * np.exp(1 - n - r * L) * (np.exp(r * L / n) - 1)
+    D = term1 + term2
+    return D
+
+def _calcD_sl_vec(r, L):
+    """
+    Array version of _calcD_sl.
+    """
+    D = np.where(L == 0, 1.0, (1.0 - np.exp(-r * L)) / (r * L))
+    return D
+
+def _calcD_econ_vec(r, pi, delta):
+    """
+    Array version of _calcD_econ.
+    """
+    D = delta / (r - pi + delta)
+    return D
+
+def _calcITCpv_vec(c, r, L):
+    """
+    Array version of _calcITCpv.
+    """
+    pvc = np.where(L == 0, c, c / r / L * (1 - np.exp(-r * L)))
+    return pvc
+
+def _calcD_vec(method, r, pi, delta, life, accl):
+    """
+    Calculate present value of depreciation deductions for an array of
+    methods, selecting the method for each cell as in _calcZ1.
+    """
+    assert np.isin(method, [DB, SL, EXP, ECON]).all()
+    # Every method is evaluated on every cell and then selected, so ignore
+    # warnings from cells where a method does not apply
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        D = np.where(method == DB, _calcD_db_vec(r, life, accl),
+                     np.where(method == SL, _calcD_sl_vec(r, life),
+                              np.where(method == ECON,
+                                       _calcD_econ_vec(r, pi, delta), 1.0)))
+    return D
+
+def _calcZ1_vec(method, r, tau, itcrt, itcdb, itclife, s179, bonus,
+                pi=None, delta=None, life=None, accl=None, D=None):
+    """
+    Array version of _calcZ1. The method argument is an array of method
+    codes, and the PV of depreciation is selected by method for each cell.
+        D: PV of depreciation deductions, if already computed
+    """
+    if D is None:
+        D = _calcD_vec(method, r, pi, delta, life, accl)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pvc = _calcITCpv_vec(itcrt, r, itclife)
+    # Compute effective expensing share
+    b = s179 + (1 - s179) * bonus
+    # Compute CCR tax shield
+    Z = tau * (1 - itcrt*itcdb) * (b + (1 - b) * D) + pvc
+    return Z
+
+def calcCOC1_vec(r, pi, rd, delta, Delta, tau, phi,
+                 method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                 tau_prop, D=None):
+    """
+    Array version of calcCOC1.
+        D: PV of depreciation deductions, if already computed
+    """
+    Z = _calcZ1_vec(method, r, tau, itcrt, itcdb, itclife, s179, bonus, pi,
+                    delta, life, accl, D)
+    F = _calcF1(r, rd, pi, delta, Delta, tau, phi)
+    rho = (1 - Z - F) / (1 - tau) * (r - pi + delta) - delta + tau_prop
+    return rho
+
+def calcEATRd1_vec(r, pi, rd, delta, Delta, tau, phi, exFDII, tang, p,
+                   method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                   tau_prop, D=None):
+    """
+    Array version of calcEATRd1.
+        D: PV of depreciation deductions, if already computed
+    """
+    assert np.isin(tang, [0, 1]).all()
+    assert np.all(p > 0.1)
+    assert np.all(exFDII >= 0)
+    assert np.all(exFDII <= 1)
+    coc = calcCOC1_vec(r, pi, rd, delta, Delta, tau, phi,
+                       method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                       tau_prop, D)
+    eatr = ((coc - r + pi) / p + (p - coc) / p * tau -
+            (p - 0.1*tang) / p * exFDII * tau)
+    return eatr
+
+def calcEATRf1_vec(r, pi, rd, delta, Delta, tau, exGILTI, tang, p, tauf,
+                   method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                   tau_prop, D=None):
+    """
+    Array version of calcEATRf1.
+        D: PV of depreciation deductions, if already computed
+    """
+    assert np.isin(tang, [0, 1]).all()
+    assert np.all(p > 0.1)
+    assert np.all(exGILTI >= 0)
+    assert np.all(exGILTI <= 1)
+    coc = calcCOC1_vec(r, pi, rd, delta, Delta, tauf, 1.0,
+                       method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                       0.0, D)
+    eatr = ((coc - r + pi) / p + (p - coc) / p * tauf +
+            (p - 0.1*tang) / p * np.maximum(tau * (1.0 - exGILTI) - 0.8*tauf,
+                                            0))
+    return eatr
+
+def _calcD_dbsl_per_vec(r, L, n, a, b):
+    """
+    Array version of _calcD_dbsl_per. The period bounds a and b may be
+    arrays of periods, which are broadcast against the other arguments.
+    """
+    # Ensure N is not an int
+    n = n * 1.0
+    # Switching point
+    t1 = L * (1 - 1 / n)
+    # End of tax life
+    t2 = L
+    # Exponential depreciation through min(b, t1)
+    Ddb = (n / L / (r + n / L) * np.exp(-(r + n / L) * a) *
+           (1 - np.exp(-(r + n / L) * (np.minimum(b, t1) - a))))
+    # Straight-line depreciation from s to e, where s >= t1
+    def Dsl(s, e):
+        return np.where(r == 0, np.exp(1 - n) * (e - s) / (t2 - t1),
+                        n / L / r * np.exp(1 - n) * np.exp(-r * s) *
+                        (1 - np.exp(-r * (e - s))))
+    D = np.where(b <= t1, Ddb,
+                 np.where(b <= t2,
+                          np.where(a < t1, Ddb + Dsl(t1, b), Dsl(a, b)),
+                          np.where(a < t1, Ddb + Dsl(t1, t2),
+                                   np.where(a < t2, Dsl(a, t2), 0.0))))
+    return D
+
+def _calcDlist_dbsl_vec(r, L, n, exprt, length=50):
+    """
+    Array version of _calcDlist_dbsl. Returns an array with an added last
+    axis for the period.
+    """
+    assert length >= 2
+    (a, b) = _calc_periods(length, 9e99)
+    Dlist = ((1 - exprt[..., None]) *
+             _calcD_dbsl_per_vec(r[..., None], L[..., None], n[..., None],
+                                 a, b))
+    Dlist[..., 0] += exprt
+    return Dlist
+
+def _calcDlist_econ_vec(r, pi, delta, exprt, length=50, kernels=None):
+    """
+    Array version of _calcDlist_econ. Returns an array with an added last
+    axis for the period.
+        kernels: result of _calcKernels(r - pi + delta, length), if known
+    """
+    x = r - pi + delta
+    if kernels is None:
+        kernels = _calcKernels(x, length)
+    (elo, _, eper) = kernels
+    Dlist = ((1 - exprt[..., None]) *
+             (delta[..., None] / x[..., None] * elo * eper))
+    if np.any(x == 0):
+        (a, b) = _calc_periods(length, 9e99)
+        Dlist = np.where((x == 0)[..., None],
+                         (1 - exprt[..., None]) * (delta[..., None] * (b - a)),
+                         Dlist)
+    Dlist[..., 0] += exprt
+    return Dlist
+
+def _calcD_list_vec(method, r, pi, delta, life, accl, exprt, length=50,
+                    kernels=None):
+    """
+    Array version of _calcD_list. All arguments except pi are arrays of
+    the same shape, pi is broadcast against them, and the result has an
+    added last axis for the period.
+        kernels: result of _calcKernels(r - pi + delta, length), if known
+    """
+    assert np.isin(method, [DB, SL, EXP, ECON]).all()
+    # Every method is evaluated on every cell and then selected, so ignore
+    # warnings from cells where a method does not apply
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        n = np.where(method == SL, 1.0, accl)
+        Dlist_dbsl = _calcDlist_dbsl_vec(r, life, n, exprt, length)
+        Dlist_econ = _calcDlist_econ_vec(r, pi, delta, exprt, length,
+                                         kernels)
+    Dlist_exp = np.zeros(length)
+    Dlist_exp[0] = 1.0
+    method = method[..., None]
+    Dlist = np.where((method == DB) | (method == SL), Dlist_dbsl,
+                     np.where(method == ECON, Dlist_econ, Dlist_exp))
+    return Dlist
+
+def _calcZ2_vec(method, r, taulist, itcrt, itcdb, itclife, s179, bonus,
+                pi=None, delta=None, life=None, accl=None, length=None,
+                kernels=None, Dlist=None):
+    """
+    Array version of _calcZ2. The taulist argument has a last axis for the
+    period, and its other axes are broadcast against the other arguments.
+        kernels: result of _calcKernels(r - pi + delta, length), if known
+        Dlist: PV of depreciation deductions in each period, if known
+    """
+    if length is None:
+        length = np.shape(taulist)[-1]
+    # Broadcast cell parameters to a common shape
+    (method, r, itcrt, itcdb, itclife, s179, bonus, delta, life,
+     accl) = np.broadcast_arrays(method, r, itcrt, itcdb, itclife, s179,
+                                 bonus, delta, life, accl)
+    # Compute effective expensing rate (ignoring actual expensing)
+    exprt = s179 + (1 - s179) * bonus
+    # Produce Dlist
+    if Dlist is None:
+        Dlist = _calcD_list_vec(method, r, pi, delta, life, accl, exprt,
+                                length, kernels)
+    # Compute PV of tax shield from depreciation
+    PVD = np.einsum('...j,...j->...', taulist, Dlist)
+    # Compute CCR tax shield
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pvc = _calcITCpv_vec(itcrt, r, itclife)
+    Z = (1 - itcrt*itcdb) * PVD + pvc
+    return Z
+
+def _calcF2_vec(r, rd, pi, delta, Delta, taulist, philist, length=None,
+                kernels=None):
+    """
+    Array version of _calcF2. The taulist and philist arguments have a last
+    axis for the period.
+        kernels: result of _calcKernels(r - pi + delta, length), if known
+    """
+    if length is None:
+        length = np.shape(taulist)[-1]
+    assert np.shape(taulist)[-1] == length
+    assert np.shape(philist)[-1] == length
+    x = r - pi + delta
+    if kernels is None:
+        kernels = _calcKernels(x, length)
+    (elo, _, eper) = kernels
+    Flist = (Delta * rd)[..., None] / x[..., None] * elo * eper
+    F = np.einsum('...j,...j->...', Flist * philist, taulist)
+    return F
+
+def _calcT_weights_vec(r, pi, delta, length, kernels=None):
+    """
+    Weights on the tax rate in each period used in _calcT, for an array of
+    discount rates. Returns an array with an added last axis for the period.
+        kernels: result of _calcKernels(r - pi + delta, length), if known
+    """
+    if kernels is None:
+        kernels = _calcKernels(r - pi + delta, length)
+    (elo, ehi, _) = kernels
+    wgts = elo - ehi
+    return wgts
+
+def _calcT_vec(r, pi, delta, taulist, kernels=None):
+    """
+    Array version of _calcT. The taulist argument has a last axis for the
+    period.
+        kernels: result of _calcKernels(r - pi + delta, length), if known
+    """
+    wgts = _calcT_weights_vec(r, pi, delta, np.shape(taulist)[-1], kernels)
+    T = np.einsum('...j,...j->...', taulist, wgts)
+    return T
+
+def calcCOC2_vec(r, pi, rd, delta, Delta, taulist, philist,
+                 method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                 taulist_prop, length=None, kernels=None, Dlist=None):
+    """
+    Array version of calcCOC2. The list arguments have a last axis for the
+    period, and their other axes are broadcast against the other arguments.
+        kernels: result of _calcKernels(r - pi + delta, length), if known
+        Dlist: PV of depreciation deductions in each period, if known
+    """
+    if length is None:
+        length = np.shape(taulist)[-1]
+    (r, delta, Delta) = np.broadcast_arrays(r, delta, Delta)
+    if kernels is None:
+        kernels = _calcKernels(r - pi + delta, length)
+    Z = _calcZ2_vec(method, r, taulist, itcrt, itcdb, itclife, s179, bonus,
+                    pi, delta, life, accl, length, kernels, Dlist)
+    F = _calcF2_vec(r, rd, pi, delta, Delta, taulist, philist, length,
+                    kernels)
+    T = _calcT_vec(r, pi, delta, taulist, kernels)
+    Tp = _calcT_vec(r, pi, delta, taulist_prop, kernels)
+    rho = (1 - Z - F) / (1 - T) * (r - pi + delta) - delta + Tp
+    return rho
+
+def calcEATRd2_vec(r, pi, rd, delta, Delta, taulist, philist, exFDII, tang,
+                   p, method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                   taulist_prop, Dlist=None):
+    """
+    Array version of calcEATRd2.
+        Dlist: PV of depreciation deductions in each period, if known
+    """
+    assert np.isin(tang, [0, 1]).all()
+    assert np.all(p > 0.1)
+    assert np.all(exFDII >= 0)
+    assert np.all(exFDII <= 1)
+    (r, delta) = np.broadcast_arrays(r, delta)
+    kernels = _calcKernels(r - pi + delta, np.shape(taulist)[-1])
+    coc = calcCOC2_vec(r, pi, rd, delta, Delta, taulist, philist,
+                       method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                       taulist_prop, kernels=kernels, Dlist=Dlist)
+    T = _calcT_vec(r, pi, delta, taulist, kernels)
+    eatr = ((coc - r + pi) / p + (p - coc) / p * T -
+            (p - 0.1*tang) / p * exFDII * T)
+    return eatr
+
+def calcEATRf2_vec(r, pi, rd, delta, Delta, taulist, exGILTI, tang, p, tauf,
+                   method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                   taulist_prop, D=None):
+    """
+    Array version of calcEATRf2.
+        D: PV of depreciation deductions, if already computed
+    """
+    assert np.isin(tang, [0, 1]).all()
+    assert np.all(p > 0.1)
+    assert np.all(exGILTI >= 0)
+    assert np.all(exGILTI <= 1)
+    (r, delta) = np.broadcast_arrays(r, delta)
+    coc = calcCOC1_vec(r, pi, rd, delta, Delta, tauf, 1.0,
+                       method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                       0.0, D)
+    T = _calcT_vec(r, pi, delta, taulist)
+    eatr = ((coc - r + pi) / p + (p - coc) / p * tauf +
+            (p - 0.1*tang) / p * np.maximum(T * (1.0 - exGILTI) - 0.8*tauf,
+                                            0))
+    return eatr
+
+def _calc_dedup(func, args):
+    """
+    Evaluate an array function only on the unique combinations of its
+    arguments, and scatter the results back to every cell.
+        func: function of the arrays in args, returning an array with the
+              same first axis (plus any further axes)
+        args: list of arrays, broadcast against each other
+    Returns the results with the broadcast shape of args (plus any further
+    axes from func), the number of cells and the number of unique cells.
+    """
+    shape = np.broadcast_shapes(*[np.shape(arg) for arg in args])
+    # Encode each argument as integer codes before broadcasting, and
+    # combine the codes into a single key for each cell
+    uniqs = list()
+    key = np.zeros(shape, dtype=np.int64)
+    for arg in args:
+        (uniq, inverse) = np.unique(arg, return_inverse=True)
+        uniqs.append(uniq)
+        key = key * len(uniq) + inverse.reshape(np.shape(arg))
+    assert np.prod([float(len(uniq)) for uniq in uniqs]) < 2.0**62
+    (ukeys, inverse) = np.unique(key, return_inverse=True)
+    # Decode the unique keys into the argument values
+    uargs = list()
+    for uniq in reversed(uniqs):
+        uargs.insert(0, uniq[ukeys % len(uniq)])
+        ukeys = ukeys // len(uniq)
+    res = func(*uargs)
+    res = res[inverse.reshape(-1)]
+    return (res.reshape(shape + res.shape[1:]), key.size, len(uargs[0]))
+
+def calcD_dedup(method, r, pi, delta, life, accl):
+    """
+    Calculate present value of depreciation deductions (as in _calcZ1)
+    for an array of cells, computing it only once for each unique set of
+    depreciation parameters. The inflation rate pi may be an array.
+    Returns D, the number of cells and the number of unique cells.
+    """
+    # Set parameters that do not apply to a method to a common value
+    pi = np.where(method == ECON, pi, 0.0)
+    delta = np.where(method == ECON, delta, 0.0)
+    life = np.where((method == DB) | (method == SL), life, 0.0)
+    accl = np.where(method == DB, accl, 0.0)
+    return _calc_dedup(_calcD_vec, [method, r, pi, delta, life, accl])
+
+def calcDlist_dedup(method, r, pi, delta, life, accl, exprt, length=50):
+    """
+    Calculate present values of depreciation deductions in each period
+    (as in _calcZ2) for an array of cells, computing them only once for
+    each unique set of depreciation parameters. The inflation rate pi may
+    be an array.
+    Returns Dlist, the number of cells and the number of unique cells.
+    """
+    # Set parameters that do not apply to a method to a common value
+    pi = np.where(method == ECON, pi, 0.0)
+    delta = np.where(method == ECON, delta, 0.0)
+    life = np.where((method == DB) | (method == SL), life, 0.0)
+    accl = np.where(method == DB, accl, 0.0)
+    exprt = np.where(method == EXP, 0.0, exprt)
+    def func(m, x, q, d, L, n, e):
+        return _calcD_list_vec(m, x, q, d, L, n, e, length)
+    return _calc_dedup(func, [method, r, pi, delta, life, accl, exprt])
@@ -0,0 +1,272 @@
+"""
+Golden-output regression checks for the Calculator engines.
+
+snapshot_golden calculates reference results for every shipped policy
+file, with both basic and forward-looking equations, using the Calculator
+as it was at GOLDEN_COMMIT (before any of the engines were added), so the
+reference does not depend on the code being checked. It runs in a separate
+process from a copy of the repository at that commit (taken with git
+archive), and the results are saved with save_results (see resultstore.py)
+to a folder for each equation style, with the commit in their metadata:
+    golden/basic/, golden/forward/
+compare_golden calculates the same results with any engine and compares
+them with the snapshot cell by cell, for every measure (coc, metr, mettr
+and ucoc by firm type, and the domestic and foreign EATRs). A cell passes
+if its absolute error is at most atol + rtol * |reference|, or if both
+values are NaN (or the same infinity).
+
+The forward-looking equations now build policy lists only up to the last
+policy year, with the rest of the sums in closed form, where the original
+code used lists of 50 years with the tail after them in closed form. Since
+policy is constant after 2029, these are the same sums, so the results
+differ from the reference only by rounding, by at most 2% of the default
+tolerances in any cell (most in the METRs and METTRs). Results with basic
+equations are the same as the reference.
+
+The snapshot is large (about 66 MB for 2020 to 2029), so it is not kept in
+the repository; as it always comes from GOLDEN_COMMIT, it can be taken
+again at any time. To run from the top folder:
+    python golden.py snapshot
+    python golden.py compare array
+    python golden.py compare jit float32
+"""
+import io
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tarfile
+import tempfile
+import numpy as np
+import pandas as pd
+from parameter import Parameter
+from policy import Policy
+from calculator import Calculator
+from resultstore import save_results, ResultStore, result_arrays
+
+GOLDEN_PATH = 'golden/'
+# Commit whose Calculator calculates the reference results
+GOLDEN_COMMIT = '123ab83'
+POLFILES = ['policy_baseline.csv', 'policy_currentPolicy.csv',
+            'policy_biden.csv', 'policy_extendII.csv']
+MODES = {'basic': False, 'forward': True}
+# Default tolerances, which allow for rounding in the sums over periods of
+# the forward-looking equations
+RTOL = 1e-9
+ATOL = 1e-12
+
+
+def _calculate(engine, mode, polfiles, yearlist, dtype='float64'):
+    """
+    Returns a Calculator for each policy file in polfiles, using the given
+    engine and equation style, with results for every year in yearlist.
+    """
+    parm = Parameter({'forwardLooking': MODES[mode]})
+    calcs = list()
+    for polfile in polfiles:
+        calc = Calculator(parm, Policy(polfile), engine, dtype,
+                          verbose=False)
+        calc.calc_years(yearlist)
+        calcs.append(calc)
+    return calcs
+
+
+# Script run from a copy of the repository at the reference commit, with
+# a JSON list of [forwardLooking, polfiles, yearlist, output file] as its
+# argument. It saves a list with a dict of results for each policy file,
+# mapping each year to the arrays for each measure (as for
+# Calculator._store_results).
+_REFERENCE_SCRIPT = """
+import pickle
+import sys
+import json
+import numpy as np
+from parameter import Parameter
+from policy import Policy
+from calculator import Calculator
+(forward, polfiles, yearlist, outfile) = json.loads(sys.argv[1])
+ftypes = ['corp', 'scorp', 'soleprop', 'partner']
+parm = Parameter({'forwardLooking': forward})
+results = list()
+for polfile in polfiles:
+    calc = Calculator(parm, Policy(polfile))
+    res = dict()
+    for year in yearlist:
+        calc.calc_all(year)
+        year1 = str(year)
+        res[year] = dict((name, np.array([getattr(calc, 'results_' + name)
+                                          [year1][ftype]
+                                          for ftype in ftypes]))
+                         for name in ['coc', 'metr', 'mettr', 'ucoc'])
+        eatr = calc.results_international[year1]
+        res[year]['eatr_dom'] = np.asarray(eatr['domestic'])
+        res[year]['eatr_for'] = np.asarray(eatr['foreign'])
+    results.append(res)
+with open(outfile, 'wb') as f:
+    pickle.dump(results, f)
+"""
+
+
+def _git(*args):
+    """
+    Run git with the given arguments in the folder of this file, and return
+    its output as bytes.
+    """
+    return subprocess.run(['git'] + list(args), check=True,
+                          capture_output=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__))
+                          ).stdout
+
+
+def _reference_results(commit, mode, polfiles, yearlist):
+    """
+    Calculate results with the Calculator at the given commit, for each
+    policy file in polfiles and every year in yearlist, with the given
+    equation style, in a separate process working from a copy of the
+    repository at that commit.
+    Returns a list with a dict for each policy file, mapping each year to
+    a dict of result arrays (as for Calculator._store_results).
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        archive = tarfile.open(fileobj=io.BytesIO(_git('archive', commit)))
+        archive.extractall(tmpdir, filter='data')
+        outfile = os.path.join(tmpdir, 'golden_results.pkl')
+        args = json.dumps([MODES[mode], list(polfiles), list(yearlist),
+                           outfile])
+        # Hide the progress messages from the old Calculator
+        subprocess.run([sys.executable, '-c', _REFERENCE_SCRIPT, args],
+                       check=True, cwd=tmpdir, stdout=subprocess.DEVNULL)
+        with open(outfile, 'rb') as f:
+            return pickle.load(f)
+
+
+def snapshot_golden(path=GOLDEN_PATH, yearlist=None, commit=GOLDEN_COMMIT):
+    """
+    Calculate reference results with the Calculator at the given commit
+    (by default, GOLDEN_COMMIT) for every policy file in POLFILES and every
+    year in yearlist (by default, 2020 to 2029), with each equation style,
+    and save them to path, replacing any snapshot already there. The full
+    hash of the commit is saved in the metadata of each store.
+    """
+    if yearlist is None:
+        yearlist = [*range(2020, 2030)]
+    sha = _git('rev-parse', commit + '^{commit}').decode().strip()
+    for mode in MODES:
+        print('Calculating ' + mode + ' results at commit ' + sha[:7])
+        results = _reference_results(sha, mode, POLFILES, yearlist)
+        # Store the results in Calculators, to save them
+        parm = Parameter({'forwardLooking': MODES[mode]})
+        calcs = list()
+        for k in range(len(POLFILES)):
+            calc = Calculator(parm, Policy(POLFILES[k]), 'loop',
+                              verbose=False)
+            for year in yearlist:
+                calc._store_results(year, **results[k][year])
+            calcs.append(calc)
+        save_results(os.path.join(path, mode), calcs, POLFILES, yearlist,
+                     info={'commit': sha})
+
+
+def compare_results(calcs, store, rtol=RTOL, atol=ATOL, nworst=20):
+    """
+    Compare the results of a list of Calculators, one for each scenario in
+    the ResultStore store (in the same order), against it, cell by cell.
+    Returns a DataFrame summarizing the errors in each measure, and a
+    DataFrame of the nworst cells with the largest errors relative to the
+    tolerance.
+    """
+    assert len(calcs) == len(store.coords['scenario'])
+    summary = list()
+    worst = list()
+    for measure in store.measures:
+        ref = np.array(store[measure], dtype=np.float64)
+        new = np.zeros(ref.shape)
+        for k in range(len(calcs)):
+            for y in range(len(store.coords['year'])):
+                new[k, y] = result_arrays(calcs[k],
+                                          store.coords['year'][y])[measure]
+        same = (new == ref) | (np.isnan(new) & np.isnan(ref))
+        with np.errstate(invalid='ignore'):
+            abserr = np.where(same, 0.0, np.abs(new - ref))
+            # A NaN in only one of the results is an infinite error
+            abserr[np.isnan(abserr)] = np.inf
+            relerr = np.where(same, 0.0, abserr / np.abs(ref))
+            ratio = abserr / (atol + rtol * np.abs(ref))
+        ratio[same] = 0.0
+        ratio[np.isnan(ratio)] = np.inf
+        summary.append([measure, ref.size, int((ratio > 1).sum()),
+                        abserr.max(), np.nanmax(relerr), ratio.max()])
+        # Cells with the largest errors relative to the tolerance
+        nkeep = min(nworst, ratio.size)
+        flat = np.argpartition(ratio.ravel(), -nkeep)[-nkeep:]
+        for pos in flat:
+            index = np.unravel_index(pos, ratio.shape)
+            labels = dict((dim, store.coords[dim][i]) for (dim, i)
+                          in zip(store.dims[measure], index))
+            # EATRs are only calculated for C corporations
+            worst.append([measure, labels['scenario'], labels['year'],
+                          labels.get('firm', 'corp'), labels['asset'],
+                          labels['industry'], ref[index], new[index],
+                          abserr[index], relerr[index], ratio[index]])
+    summary = pd.DataFrame(summary, columns=['measure', 'cells', 'failed',
+                                             'max_abserr', 'max_relerr',
+                                             'max_ratio'])
+    worst = pd.DataFrame(worst, columns=['measure', 'scenario', 'year',
+                                         'firm', 'asset', 'industry',
+                                         'reference', 'value', 'abserr',
+                                         'relerr', 'ratio'])
+    worst = worst.sort_values('ratio', ascending=False).head(nworst)
+    return (summary, worst.reset_index(drop=True))
+
+
+def compare_golden(engine='array', dtype='float64', path=GOLDEN_PATH,
+                   rtol=RTOL, atol=ATOL, nworst=20):
+    """
+    Calculate results with the given engine and result dtype for every
+    policy file, year and equation style in the snapshot at path, and
+    compare them against it (see compare_results).
+    Returns a DataFrame summarizing the errors in each measure for each
+    equation style, and a DataFrame of the nworst cells with the largest
+    errors relative to the tolerance.
+    """
+    summaries = list()
+    worsts = list()
+    for mode in MODES:
+        store = ResultStore(os.path.join(path, mode))
+        calcs = _calculate(engine, mode, store.coords['scenario'],
+                           store.coords['year'], dtype)
+        (summary, worst) = compare_results(calcs, store, rtol, atol, nworst)
+        summary.insert(0, 'mode', mode)
+        worst.insert(0, 'mode', mode)
+        summaries.append(summary)
+        worsts.append(worst)
+    summary = pd.concat(summaries, ignore_index=True)
+    worst = pd.concat(worsts, ignore_index=True)
+    worst = worst.sort_values('ratio', ascending=False).head(nworst)
+    return (summary, worst.reset_index(drop=True))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'snapshot':
+        snapshot_golden()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        engine = sys.argv[2] if len(sys.argv) > 2 else 'array'
+        dtype = sys.argv[3] if len(sys.argv) > 3 else 'float64'
+        # float32 results are only accurate to their rounding error
+        rtol = max(RTOL, 2.0**-24) if dtype == 'float32' else RTOL
+        (summary, worst) = compare_golden(engine, dtype, rtol=rtol)
+        pd.set_option('display.width', 200)
+        for mode in MODES:
+            store = ResultStore(os.path.join(GOLDEN_PATH, mode))
+            print('Reference ' + mode + ' results from commit ' +
+                  store.info.get('commit', 'unknown'))
+        print(summary.to_string(index=False))
+        print('Worst cells:')
+        print(worst.to_string(index=False))
+        if summary['failed'].sum() > 0:
+            print(str(summary['failed'].sum()) + ' cells out of tolerance')
+            sys.exit(1)
+        print('All cells within tolerance')
+    else:
+        print('Usage: python golden.py snapshot | compare [engine] [dtype]')
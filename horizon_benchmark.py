@@ -0,0 +1,106 @@
+"""
+Benchmark of the horizon for forward-looking equations.
+
+Forward-looking equations hold policy constant after the horizon (see
+Parameter.horizon and functions.forward_length). benchmark_horizon
+calculates results for a list of horizons and reports the runtime of each,
+along with the largest absolute error in the cost of capital and the EATRs
+against a reference with no horizon limit, so that the cheapest horizon
+meeting a given accuracy tolerance can be chosen for batch runs. Policy is
+constant after 2029, so horizons of 10 or more are the same as no limit
+for years from 2020, and only shorter horizons are worth comparing.
+
+To run with the default settings (horizons of 2 to 9 years):
+    python horizon_benchmark.py
+or with a list of horizons:
+    python horizon_benchmark.py 2 4 6 8
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+from parameter import Parameter
+from policy import Policy
+from calculator import Calculator
+
+ftypes = ['corp', 'scorp', 'soleprop', 'partner']
+
+
+def _run_horizon(parm, pol, yearlist, engine, repeats):
+    """
+    Calculates forward-looking results for every year in yearlist with a
+    new Calculator, repeats times.
+    Returns the Calculator from the last run and the shortest runtime, in
+    seconds.
+    """
+    best = np.inf
+    for k in range(repeats):
+        calc = Calculator(parm, pol, engine, verbose=False)
+        start = time.perf_counter()
+        calc.calc_years(yearlist)
+        best = min(best, time.perf_counter() - start)
+    return (calc, best)
+
+
+def _max_error(calc, ref, yearlist):
+    """
+    Returns the largest absolute differences between the results of calc
+    and ref over every year in yearlist, for the cost of capital and for
+    the domestic and foreign EATRs.
+    """
+    err_coc = 0.0
+    err_eatr = 0.0
+    for year in yearlist:
+        year = str(year)
+        for ftype in ftypes:
+            diff = np.abs(calc.results_coc[year][ftype] -
+                          ref.results_coc[year][ftype])
+            err_coc = max(err_coc, np.nanmax(diff))
+        for loc in ['domestic', 'foreign']:
+            diff = np.abs(calc.results_international[year][loc] -
+                          ref.results_international[year][loc])
+            err_eatr = max(err_eatr, np.nanmax(diff))
+    return (err_coc, err_eatr)
+
+
+def benchmark_horizon(horizons, yearlist=None, polfile='policy_baseline.csv',
+                      parmdict=None, engine='array', repeats=3):
+    """
+    Benchmarks forward-looking calculations for each horizon in horizons.
+        yearlist: years to calculate (by default, 2020 to 2029)
+        polfile: policy CSV file to use
+        parmdict: dict of other parameters to pass to Parameter
+        engine: Calculator engine to use
+        repeats: number of times to run each horizon, keeping the shortest
+                 runtime
+    Returns a DataFrame with a row for each horizon, giving the runtime in
+    seconds and the largest absolute errors in the cost of capital
+    (err_coc) and the EATRs (err_eatr), against a reference with no horizon
+    limit.
+    """
+    if yearlist is None:
+        yearlist = [*range(2020, 2030)]
+    if parmdict is None:
+        parmdict = dict()
+    pol = Policy(polfile)
+    parmdict = dict(parmdict, forwardLooking=True)
+    ref = _run_horizon(Parameter(dict(parmdict, horizon=None)), pol,
+                       yearlist, engine, 1)[0]
+    rows = list()
+    for horizon in horizons:
+        parm = Parameter(dict(parmdict, horizon=horizon))
+        (calc, runtime) = _run_horizon(parm, pol, yearlist, engine, repeats)
+        (err_coc, err_eatr) = _max_error(calc, ref, yearlist)
+        rows.append([horizon, runtime, err_coc, err_eatr])
+    results = pd.DataFrame(rows, columns=['horizon', 'seconds', 'err_coc',
+                                          'err_eatr'])
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        horizons = [int(arg) for arg in sys.argv[1:]]
+    else:
+        horizons = [*range(2, 10)]
+    results = benchmark_horizon(horizons)
+    print(results.to_string(index=False))
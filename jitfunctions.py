@@ -0,0 +1,608 @@
+"""
+Compiled versions of the functions in functions.py, using numba in
+nopython mode. These follow the scalar functions line by line, with two
+differences required by nopython mode:
+    method: integer code for the depreciation method, the position of the
+            method name in config.ccr_methods
+    shares: calcSc and calcSnc take the holding shares as separate
+            arguments instead of a dict
+The *_grid functions loop over every asset type, industry and firm type
+in compiled code, and are used by the 'jit' engine of the Calculator.
+
+Compiled functions are cached on disk (in __pycache__), so the compile
+cost is only paid once per machine.
+"""
+import os
+import numpy as np
+from config import ccr_methods
+
+
+# The JIT switch follows tclocal/decorators.py, which is not imported since
+# importing tclocal loads the whole local Tax-Calculator (and its policy
+# file). As there, one way to use the Python debugger is to change DO_JIT
+# to False, or to set the NOTAXCALCJIT environment variable.
+DO_JIT = True
+
+
+def id_wrapper(*dec_args, **dec_kwargs):  # pylint: disable=unused-argument
+    """
+    Function wrapper when numba package is not being used during debugging.
+    """
+    def wrap(fnc):
+        """
+        wrap function nested in id_wrapper function.
+        """
+        def wrapped_f(*args, **kwargs):
+            """
+            wrapped_f function nested in wrap function.
+            """
+            return fnc(*args, **kwargs)
+        return wrapped_f
+    return wrap
+
+
+if DO_JIT is False or 'NOTAXCALCJIT' in os.environ:
+    JIT = id_wrapper
+else:
+    import numba
+    JIT = numba.jit
+
+# Integer codes for depreciation methods, the position of each method in
+# config.ccr_methods (as in Policy.compile_ccr). numba compiles these into
+# the cached functions as constants, so delete the cache in __pycache__
+# after changing ccr_methods.
+DB = ccr_methods.index('DB')
+SL = ccr_methods.index('SL')
+EXP = ccr_methods.index('EXP')
+ECON = ccr_methods.index('ECON')
+
+
+@JIT(nopython=True, cache=True)
+def _calcD_db(r, L, n):
+    """
+    Calculate present value of depreciation deductions by declining balance
+    method.
+    """
+    assert r > 0
+    assert L >= 0
+    assert n >= 1
+    term1 = n / (r * L + n) * (1 - np.exp(-(r * L + n) * (n - 1) / n))
+    term2 = n / r / L * np.exp(1 - n - r * L) * (np.exp(r * L / n) - 1)
+    D = term1 + term2
+    return D
+
+
+@JIT(nopython=True, cache=True)
+def _calcD_sl(r, L):
+    """
+    Calculate present value of depreciation deductions by straight-line
+    method.
+    """
+    assert r > 0
+    assert L >= 0
+    if L == 0:
+        D = 1.0
+    else:
+        D = (1.0 - np.exp(-r * L)) / (r * L)
+    return D
+
+
+@JIT(nopython=True, cache=True)
+def _calcD_dbsl_per(r, L, n, a, b):
+    """
+    Calculates PV of depreciation deductions during [a,b] for declining
+    balance and straight-line depreciation.
+    """
+    # Ensure N is not an int
+    n = n * 1.0
+    # Switching point
+    t1 = L * (1 - 1 / n)
+    # End of tax life
+    t2 = L
+    if b <= t1:
+        # If entirely subject to exponential depreciation
+        D = (n / L / (r + n / L) * np.exp(-(r + n / L) * a) *
+             (1 - np.exp(-(r + n / L) * (b - a))))
+    elif b <= t2:
+        if a < t1:
+            # If period splits exponential and straight-line depreciation
+            Ddb = (n / L / (r + n / L) *
+                   np.exp(-(r + n / L) * a) *
+                   (1 - np.exp(-(r + n / L) * (t1 - a))))
+            if r == 0:
+                # Special case of zero nominal discount rate
+                Dsl = np.exp(1 - n) * (b - t1) / (t2 - t1)
+            else:
+                Dsl = (n / L / r * np.exp(1 - n) *
+                       np.exp(-r * t1) *
+                       (1 - np.exp(-r * (b - t1))))
+            D = Ddb + Dsl
+        else:
+            # If entirely subject to straight-line depreciation
+            if r == 0:
+                D = np.exp(1 - n) * (b - a) / (t2 - t1)
+            else:
+                D = (n / L / r * np.exp(1 - n) *
+                     np.exp(-r * a) *
+                     (1 - np.exp(-r * (b - a))))
+    else:
+        # end of period occurs after tax life ends
+        if a < t1:
+            # If period covers the switch to straight-line depreciation
+            # and the end of the tax life (as for the last period, which
+            # runs to infinity)
+            Ddb = (n / L / (r + n / L) *
+                   np.exp(-(r + n / L) * a) *
+                   (1 - np.exp(-(r + n / L) * (t1 - a))))
+            if r == 0:
+                Dsl = np.exp(1 - n)
+            else:
+                Dsl = (n / L / r * np.exp(1 - n) *
+                       np.exp(-r * t1) *
+                       (1 - np.exp(-r * (t2 - t1))))
+            D = Ddb + Dsl
+        elif a < t2:
+            # If tax life ends during period
+            if r == 0:
+                D = np.exp(1 - n) * (t2 - a) / (t2 - t1)
+            else:
+                D = (n / L / r * np.exp(1 - n) *
+                     np.exp(-r * a) *
+                     (1 - np.exp(-r * (t2 - a))))
+        else:
+            # If period occurs entirely after tax life has ended
+            D = 0.0
+    return D
+
+
+@JIT(nopython=True, cache=True)
+def _calcDlist_dbsl(r, L, n, exprt, length=50):
+    """
+    Calculates present value of depreciation deductions over lifetime
+    for declining balance and straight-line depreciation.
+    """
+    Dlist = np.zeros(length)
+    Dlist[0] = exprt + (1 - exprt) * _calcD_dbsl_per(r, L, n, 0.0, 0.5)
+    for j in range(1, length-1):
+        Dlist[j] = (1 - exprt) * _calcD_dbsl_per(r, L, n, j-0.5, j+0.5)
+    # Calculate from last period to infinity
+    Dlist[length-1] = ((1 - exprt) *
+                       _calcD_dbsl_per(r, L, n, length-1-0.5, 9e99))
+    return Dlist
+
+
+@JIT(nopython=True, cache=True)
+def _calcD_econ(r, pi, delta):
+    """
+    Calculate present value of depreciation deductions by economic
+    depreciation.
+    """
+    assert r - pi > 0
+    D = delta / (r - pi + delta)
+    return D
+
+
+@JIT(nopython=True, cache=True)
+def _calcD_econ_per(r, pi, delta, a, b):
+    """
+    Calculates PV of depreciation deduction during [a,b] using economic
+    depreciation method.
+    """
+    if r - pi + delta == 0:
+        D = delta * (b - a)
+    else:
+        D = (delta / (r - pi + delta) * np.exp(-(r - pi + delta) * a) *
+             (1 - np.exp(-(r - pi + delta) * (b - a))))
+    return D
+
+
+@JIT(nopython=True, cache=True)
+def _calcDlist_econ(r, pi, delta, exprt, length=50):
+    """
+    Calculates present value of depreciation deductions over lifetime
+    for economic depreciation.
+    """
+    # Calculate for fist (half) year
+    Dlist = np.zeros(length)
+    Dlist[0] = exprt + (1 - exprt) * _calcD_econ_per(r, pi, delta, 0.0, 0.5)
+    for j in range(1, length-1):
+        Dlist[j] = (1 - exprt) * _calcD_econ_per(r, pi, delta, j-0.5, j+0.5)
+    # Calculate from last period to infinity
+    Dlist[length-1] = ((1 - exprt) *
+                       _calcD_econ_per(r, pi, delta, length-1-0.5, 9e99))
+    return Dlist
+
+
+@JIT(nopython=True, cache=True)
+def _calcITCpv(c, r, L):
+    """
+    Calculate present value of investment tax credit.
+    """
+    assert r > 0
+    assert L >= 0
+    if L == 0:
+        pvc = c
+    else:
+        pvc = c / r / L * (1 - np.exp(-r * L))
+    return pvc
+
+
+@JIT(nopython=True, cache=True)
+def _calcZ1(method, r, tau, itcrt, itcdb, itclife, s179, bonus,
+            pi, delta, life, accl):
+    """
+    Calculate tax shield from capital cost recovery assuming constant tax
+    rates.
+    """
+    # Compute PV of depreciation
+    assert method >= DB and method <= ECON
+    if method == DB:
+        D = _calcD_db(r, life, accl)
+    elif method == SL:
+        D = _calcD_sl(r, life)
+    elif method == ECON:
+        D = _calcD_econ(r, pi, delta)
+    else:
+        D = 1.0
+    # Compute effective expensing share
+    b = s179 + (1 - s179) * bonus
+    # Compute CCR tax shield
+    Z = (tau * (1 - itcrt*itcdb) * (b + (1 - b) * D) +
+         _calcITCpv(itcrt, r, itclife))
+    return Z
+
+
+@JIT(nopython=True, cache=True)
+def _calcD_list(method, r, pi, delta, life, accl, exprt, length=50):
+    """
+    Build array of present values of depreciation deductions taken in each
+    period, using mid-year convention.
+    """
+    assert method >= DB and method <= ECON
+    if method == DB:
+        Dlist = _calcDlist_dbsl(r, life, accl, exprt, length)
+    elif method == SL:
+        Dlist = _calcDlist_dbsl(r, life, 1.0, exprt, length)
+    elif method == ECON:
+        Dlist = _calcDlist_econ(r, pi, delta, exprt, length)
+    else:
+        Dlist = np.zeros(length)
+        Dlist[0] = 1.0
+    return Dlist
+
+
+@JIT(nopython=True, cache=True)
+def _calcZ2(method, r, taulist, itcrt, itcdb, itclife, s179, bonus,
+            pi, delta, life, accl, length=50):
+    """
+    Calculate tax shield from capital cost recovery allowing for tax rates
+    that vary by year.
+    """
+    # Compute effective expensing rate (ignoring actual expensing)
+    exprt = s179 + (1 - s179) * bonus
+    # Produce Dlist
+    Dlist = _calcD_list(method, r, pi, delta, life, accl, exprt, length)
+    # Compute PV of tax shield from depreciation
+    PVD = 0.0
+    for j in range(length):
+        PVD += taulist[j] * Dlist[j]
+    # Compute CCR tax shield
+    Z = (1 - itcrt*itcdb) * PVD + _calcITCpv(itcrt, r, itclife)
+    return Z
+
+
+@JIT(nopython=True, cache=True)
+def _calcF1(r, rd, pi, delta, Delta, tau, phi):
+    """
+    Calculate tax shield from debt financing assuming constant tax rates.
+    """
+    F = Delta * rd * phi * tau / (r - pi + delta)
+    return F
+
+
+@JIT(nopython=True, cache=True)
+def _calcF_per(r, rd, pi, delta, Delta, a, b):
+    """
+    Calculates present value of interest accruing during period [a,b]
+    """
+    F = (Delta * rd / (r - pi + delta) * np.exp(-(r - pi + delta) * a) *
+         (1 - np.exp(-(r - pi + delta) * (b - a))))
+    return F
+
+
+@JIT(nopython=True, cache=True)
+def _calcF2(r, rd, pi, delta, Delta, taulist, philist, length=50):
+    """
+    Calculates present value of interest deduction over lifetime
+    """
+    assert len(taulist) == length
+    assert len(philist) == length
+    Flist = np.zeros(length)
+    # Calcuate for first (half) year
+    Flist[0] = _calcF_per(r, rd, pi, delta, Delta, 0.0, 0.5)
+    for j in range(1, length-1):
+        Flist[j] = _calcF_per(r, rd, pi, delta, Delta, j-0.5, j+0.5)
+    # Calculate from final period to infinity
+    Flist[length-1] = _calcF_per(r, rd, pi, delta, Delta, length-1-0.5, 9e99)
+    F = 0.0
+    for j in range(length):
+        F += Flist[j] * philist[j] * taulist[j]
+    return F
+
+
+@JIT(nopython=True, cache=True)
+def _calcT(r, pi, delta, taulist):
+    """
+    Calculate weighted average tax rate over life of the asset.
+    """
+    T = taulist[0] * (1 - np.exp(-(r - pi + delta) * 0.5))
+    for j in range(1, len(taulist) - 1):
+        T += taulist[j] * (np.exp(-(r - pi + delta) * (j - 0.5)) -
+                           np.exp(-(r - pi + delta) * (j + 0.5)))
+    T += (taulist[len(taulist) - 1] *
+          np.exp(-(r - pi + delta) * (len(taulist) - 1.5)))
+    return T
+
+
+@JIT(nopython=True, cache=True)
+def calcCOC1(r, pi, rd, delta, Delta, tau, phi,
+             method, itcrt, itcdb, itclife, s179, bonus, life, accl, tau_prop):
+    """
+    Calculate cost of capital assuming constant tax rates.
+    """
+    Z = _calcZ1(method, r, tau, itcrt, itcdb, itclife, s179, bonus, pi, delta,
+                life, accl)
+    F = _calcF1(r, rd, pi, delta, Delta, tau, phi)
+    rho = (1 - Z - F) / (1 - tau) * (r - pi + delta) - delta + tau_prop
+    return rho
+
+
+@JIT(nopython=True, cache=True)
+def calcCOC2(r, pi, rd, delta, Delta, taulist, philist,
+             method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+             taulist_prop, length=50):
+    """
+    Calculate cost of capital allowing for tax rates that vary by year.
+    """
+    Z = _calcZ2(method, r, taulist, itcrt, itcdb, itclife, s179, bonus, pi,
+                delta, life, accl, length)
+    F = _calcF2(r, rd, pi, delta, Delta, taulist, philist, length)
+    T = _calcT(r, pi, delta, taulist)
+    Tp = _calcT(r, pi, delta, taulist_prop)
+    rho = (1 - Z - F) / (1 - T) * (r - pi + delta) - delta + Tp
+    return rho
+
+
+@JIT(nopython=True, cache=True)
+def calcEATRd1(r, pi, rd, delta, Delta, tau, phi, exFDII, tang, p,
+               method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+               tau_prop):
+    """
+    Calculate EATR on domestic investment with foreign sales,
+    assuming constant tax rates.
+    """
+    assert tang == 0 or tang == 1
+    assert p > 0.1
+    assert exFDII >= 0
+    assert exFDII <= 1
+    coc = calcCOC1(r, pi, rd, delta, Delta, tau, phi,
+                   method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                   tau_prop)
+    eatr = ((coc - r + pi) / p + (p - coc) / p * tau -
+            (p - 0.1*tang) / p * exFDII * tau)
+    return eatr
+
+
+@JIT(nopython=True, cache=True)
+def calcEATRd2(r, pi, rd, delta, Delta, taulist, philist, exFDII, tang, p,
+               method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+               taulist_prop):
+    """
+    Calculate EATR on domestic investment with foreign sales,
+    allowing for tax rates that vary by year.
+    """
+    assert tang == 0 or tang == 1
+    assert p > 0.1
+    assert exFDII >= 0
+    assert exFDII <= 1
+    coc = calcCOC2(r, pi, rd, delta, Delta, taulist, philist,
+                   method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+                   taulist_prop, len(taulist))
+    T = _calcT(r, pi, delta, taulist)
+    eatr = ((coc - r + pi) / p + (p - coc) / p * T -
+            (p - 0.1*tang) / p * exFDII * T)
+    return eatr
+
+
+@JIT(nopython=True, cache=True)
+def calcEATRf1(r, pi, rd, delta, Delta, tau, exGILTI, tang, p, tauf,
+               method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+               tau_prop):
+    """
+    Calculate EATR on foreign investment, assuming constant tax rates.
+    """
+    assert tang == 0 or tang == 1
+    assert p > 0.1
+    assert exGILTI >= 0
+    assert exGILTI <= 1
+    coc = calcCOC1(r, pi, rd, delta, Delta, tauf, 1.0,
+                   method, itcrt, itcdb, itclife, s179, bonus, life, accl, 0.0)
+    eatr = ((coc - r + pi) / p + (p - coc) / p * tauf +
+            (p - 0.1*tang) / p * max(tau * (1.0 - exGILTI) - 0.8*tauf, 0.0))
+    return eatr
+
+
+@JIT(nopython=True, cache=True)
+def calcEATRf2(r, pi, rd, delta, Delta, taulist, exGILTI, tang, p, tauf,
+               method, itcrt, itcdb, itclife, s179, bonus, life, accl,
+               taulist_prop):
+    """
+    Calculate EATR on foreign investment, allowing for tax rates that vary
+    by year.
+    """
+    assert tang == 0 or tang == 1
+    assert p > 0.1
+    assert exGILTI >= 0
+    assert exGILTI <= 1
+    coc = calcCOC1(r, pi, rd, delta, Delta, tauf, 1.0,
+                   method, itcrt, itcdb, itclife, s179, bonus, life, accl, 0.0)
+    T = _calcT(r, pi, delta, taulist)
+    eatr = ((coc - r + pi) / p + (p - coc) / p * tauf +
+            (p - 0.1*tang) / p * max(T * (1.0 - exGILTI) - 0.8*tauf, 0.0))
+    return eatr
+
+
+@JIT(nopython=True, cache=True)
+def calcSc(rd, re, pi, Delta, txshr_d_c, txshr_e, divshr, wt_scg, wt_lcg,
+           h_lcg, h_xcg, tau_int, tau_div, tau_scg, tau_lcg, stepup):
+    """
+    Calculate return to saving through corporations.
+    The holding shares are the entries of Parameter.shares.
+    """
+    # After-tax return to lenders
+    sd = txshr_d_c * rd * (1 - tau_int) + (1 - txshr_d_c) * rd - pi
+    # After-tax return through capital gains
+    if stepup == 1:
+        tau_xcg = 0.
+    else:
+        tau_xcg = tau_lcg
+    hl = h_lcg
+    hx = h_xcg
+    m = divshr
+    s_scg = re * (1 - tau_scg)
+    s_lcg = (1.0 / (hl * (1 - m)) *
+             np.log(np.exp(hl * (1 - m) * re) * (1 - tau_lcg) + tau_lcg))
+    s_xcg = (1.0 / (hx * (1 - m)) *
+             np.log(np.exp(hx * (1 - m) * re) * (1 - tau_xcg) + tau_xcg))
+    s_cg = (wt_scg * s_scg + wt_lcg * s_lcg +
+            (1 - wt_scg - wt_lcg) * s_xcg - pi)
+    # After-tax return through equity
+    se = (txshr_e * (m * re * (1 - tau_div) +
+          (1 - m) * (s_cg + pi)) + (1 - txshr_e) * re - pi)
+    s = Delta * sd + (1 - Delta) * se
+    return s
+
+
+@JIT(nopython=True, cache=True)
+def calcSnc(rd, re, pi, Delta, txshr_d_nc, tau_int):
+    """
+    Calculate return to saving through pass-through businesses.
+    """
+    # After-tax return to lenders
+    sd = txshr_d_nc * rd * (1 - tau_int) + (1 - txshr_d_nc) * rd - pi
+    se = re - pi
+    s = Delta * sd + (1 - Delta) * se
+    return s
+
+
+@JIT(nopython=True, cache=True)
+def calcCOC1_grid(r, pi, rd, delta, Delta, tau, phi, method, itcrt, itcdb,
+                  itclife, s179, bonus, life, accl, tau_prop):
+    """
+    Calculate cost of capital for every firm type, asset type and industry,
+    assuming constant tax rates. Arguments are indexed by
+        firm type: tau, phi
+        firm type and industry: r, Delta
+        firm type and asset type: s179, tau_prop
+        asset type: delta, method, itcrt, itcdb, itclife, bonus, life, accl
+    Returns array with axes (firm type, asset type, industry).
+    """
+    (nfirm, nind) = r.shape
+    ntype = len(delta)
+    coc = np.zeros((nfirm, ntype, nind))
+    for k in range(nfirm):
+        for i in range(ntype):
+            for j in range(nind):
+                coc[k, i, j] = calcCOC1(r[k, j], pi, rd, delta[i],
+                                        Delta[k, j], tau[k], phi[k],
+                                        method[i], itcrt[i], itcdb[i],
+                                        itclife[i], s179[k, i], bonus[i],
+                                        life[i], accl[i], tau_prop[k, i])
+    return coc
+
+
+@JIT(nopython=True, cache=True)
+def calcCOC2_grid(r, pi, rd, delta, Delta, taulist, philist, method, itcrt,
+                  itcdb, itclife, s179, bonus, life, accl, taulist_prop):
+    """
+    Calculate cost of capital for every firm type, asset type and industry,
+    allowing for tax rates that vary by year. Arguments are indexed as in
+    calcCOC1_grid, with an added last axis for the period in taulist,
+    philist and taulist_prop, the last period running to infinity.
+    Returns array with axes (firm type, asset type, industry).
+    """
+    length = taulist.shape[1]
+    (nfirm, nind) = r.shape
+    ntype = len(delta)
+    coc = np.zeros((nfirm, ntype, nind))
+    for k in range(nfirm):
+        for i in range(ntype):
+            for j in range(nind):
+                coc[k, i, j] = calcCOC2(r[k, j], pi, rd, delta[i],
+                                        Delta[k, j], taulist[k], philist[k],
+                                        method[i], itcrt[i], itcdb[i],
+                                        itclife[i], s179[k, i], bonus[i],
+                                        life[i], accl[i], taulist_prop[k, i],
+                                        length)
+    return coc
+
+
+@JIT(nopython=True, cache=True)
+def calcEATR1_grid(r, pi, rd, delta, Delta, tau, phi, exFDII, exGILTI, tang,
+                   p, tauf, method, itcrt, itcdb, itclife, s179, bonus, life,
+                   accl, tau_prop):
+    """
+    Calculate domestic and foreign EATRs for C corporations for every asset
+    type and industry, assuming constant tax rates. Arguments are indexed by
+        industry: r, Delta, tauf
+        asset type: delta, tang, method, itcrt, itcdb, itclife, bonus, life,
+                    accl, tau_prop
+    Returns two arrays with axes (asset type, industry).
+    """
+    nind = len(r)
+    ntype = len(delta)
+    eatr_dom = np.zeros((ntype, nind))
+    eatr_for = np.zeros((ntype, nind))
+    for i in range(ntype):
+        for j in range(nind):
+            eatr_dom[i, j] = calcEATRd1(r[j], pi, rd, delta[i], Delta[j],
+                                        tau, phi, exFDII, tang[i], p,
+                                        method[i], itcrt[i], itcdb[i],
+                                        itclife[i], s179, bonus[i], life[i],
+                                        accl[i], tau_prop[i])
+            eatr_for[i, j] = calcEATRf1(r[j], pi, rd, delta[i], Delta[j],
+                                        tau, exGILTI, tang[i], p, tauf[j],
+                                        method[i], itcrt[i], itcdb[i],
+                                        itclife[i], s179, bonus[i], life[i],
+                                        accl[i], tau_prop[i])
+    return (eatr_dom, eatr_for)
+
+
+@JIT(nopython=True, cache=True)
+def calcEATR2_grid(r, pi, rd, delta, Delta, taulist, philist, exFDII,
+                   exGILTI, tang, p, tauf, method, itcrt, itcdb, itclife,
+                   s179, bonus, life, accl, taulist_prop):
+    """
+    Calculate domestic and foreign EATRs for C corporations for every asset
+    type and industry, allowing for tax rates that vary by year. Arguments
+    are indexed as in calcEATR1_grid, with an added last axis for the period
+    in taulist, philist and taulist_prop.
+    Returns two arrays with axes (asset type, industry).
+    """
+    nind = len(r)
+    ntype = len(delta)
+    eatr_dom = np.zeros((ntype, nind))
+    eatr_for = np.zeros((ntype, nind))
+    for i in range(ntype):
+        for j in range(nind):
+            eatr_dom[i, j] = calcEATRd2(r[j], pi, rd, delta[i], Delta[j],
+                                        taulist, philist, exFDII, tang[i], p,
+                                        method[i], itcrt[i], itcdb[i],
+                                        itclife[i], s179, bonus[i], life[i],
+                                        accl[i], taulist_prop[i])
+            eatr_for[i, j] = calcEATRf2(r[j], pi, rd, delta[i], Delta[j],
+                                        taulist, exGILTI, tang[i], p, tauf[j],
+                                        method[i], itcrt[i], itcdb[i],
+                                        itclife[i], s179, bonus[i], life[i],
+                                        accl[i], taulist_prop[i])
+    return (eatr_dom, eatr_for)
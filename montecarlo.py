@@ -0,0 +1,347 @@
+"""
+Monte Carlo simulation of results over uncertain Parameter assumptions.
+
+The economic parameters in Parameter.set_chosen_parms are point
+estimates. run_montecarlo draws many sets of these parameters from given
+distributions, evaluates them in chunks with the array engine, and keeps
+running summary statistics (mean, standard deviation and quantiles) of the
+aggregate results by category (as in OutputBuilder.tabulate_main). Only
+one chunk of draws is held in memory at a time, and the summaries have a
+fixed size, so memory use does not grow with the number of draws.
+
+Distributions are given as a dict with the same structure as the dict
+passed to Parameter.update_parms, with a distribution in place of each
+value, for example:
+    {'rf': ('normal', 0.025, 0.005),
+     'premE': ('uniform', 0.04, 0.06),
+     'sltaxes': {'corp': ('triangular', 0.03, 0.05, 0.07)}}
+Each distribution is a tuple of the name of a numpy.random.Generator method
+and its arguments, or a function f(rng, n) returning n draws. Sets of draws
+that Parameter.update_parms rejects (such as rf <= 0, or shares outside
+0 to 1) are drawn again, so each distribution is in effect truncated to
+valid values.
+
+Chunks can be run on several processors. Scripts doing so must only call
+run_montecarlo under if __name__ == '__main__':, as worker processes may
+import the script.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import os
+import numpy as np
+import pandas as pd
+from config import catlist
+from parameter import Parameter
+from policy import Policy
+from calculator import Calculator
+from outputBuilder import OutputBuilder, stack_results, measlist
+
+# Parameters that may be drawn, and the dicts of parameters that may be drawn
+MC_PARMS = ['rf', 'pi', 'premD', 'premE', 'rd', 're', 'p']
+MC_DICTS = ['shares', 'sltaxes']
+
+# Largest number of sets of parameters drawn for each valid set, before
+# giving up
+MAX_REDRAWS = 100
+
+# Setup in each worker process
+_worker = dict()
+
+
+class StreamingStats():
+    """
+    Weighted summary statistics of an array of values, updated one batch
+    of observations at a time.
+
+    Keeps the total weight, mean and sum of squared deviations of each
+    value (merged as in Chan et al.), and a sketch of its distribution for
+    quantiles: the observations are kept sorted in at most size groups of
+    roughly equal weight, each stored as its weight and mean. Quantiles
+    are interpolated between the groups, with an error of about 1/size in
+    probability. Two StreamingStats objects can be merged, so chunks can be
+    summarized separately and then combined.
+    """
+
+    def __init__(self, shape, size=1000):
+        """
+            shape: shape of each observation
+            size: number of groups in the quantile sketch
+        """
+        self.shape = tuple(shape)
+        self.size = size
+        nval = int(np.prod(self.shape))
+        self.count = 0
+        self.wsum = np.zeros(nval)
+        self.avg = np.zeros(nval)
+        self.m2 = np.zeros(nval)
+        self.sketch_w = np.zeros((nval, 0))
+        self.sketch_x = np.zeros((nval, 0))
+
+    def _combine(self, wsum, avg, m2, sketch_w, sketch_x, count):
+        """
+        Combine the summaries of another set of observations into these.
+        """
+        wtot = self.wsum + wsum
+        dev = avg - self.avg
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(wtot > 0, wsum / wtot, 0.0)
+        self.avg = self.avg + dev * share
+        self.m2 = self.m2 + m2 + dev**2 * self.wsum * share
+        self.wsum = wtot
+        self.count += count
+        self._compress(np.concatenate([self.sketch_w, sketch_w], axis=1),
+                       np.concatenate([self.sketch_x, sketch_x], axis=1))
+
+    def _compress(self, w, x):
+        """
+        Sort the weighted points (w, x) for each value and merge them into
+        at most size groups of roughly equal weight.
+        """
+        (nval, npts) = x.shape
+        order = np.argsort(x, axis=1, kind='stable')
+        x = np.take_along_axis(x, order, axis=1)
+        w = np.take_along_axis(w, order, axis=1)
+        if npts <= self.size:
+            (self.sketch_w, self.sketch_x) = (w, x)
+            return
+        # Assign each point to a group by its cumulative weight
+        cumw = np.cumsum(w, axis=1)
+        tot = cumw[:, -1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pos = np.where(tot > 0, (cumw - 0.5 * w) / tot, 0.0)
+        group = np.minimum((pos * self.size).astype(int), self.size - 1)
+        idx = (group + self.size * np.arange(nval)[:, None]).ravel()
+        gw = np.bincount(idx, w.ravel(), nval * self.size)
+        gwx = np.bincount(idx, np.where(w > 0, w * x, 0.0).ravel(),
+                          nval * self.size)
+        # Move empty groups to the end of each row
+        gw = gw.reshape((nval, self.size))
+        gwx = gwx.reshape((nval, self.size))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gx = np.where(gw > 0, gwx / gw, np.inf)
+        order = np.argsort(gx, axis=1, kind='stable')
+        self.sketch_w = np.take_along_axis(gw, order, axis=1)
+        self.sketch_x = np.take_along_axis(gx, order, axis=1)
+
+    def add(self, values, weights=None):
+        """
+        Add a batch of observations.
+            values: array with axes (observation,) + shape
+            weights: array of weights for each observation (default 1)
+        """
+        values = np.asarray(values, dtype=float)
+        assert values.shape[1:] == self.shape
+        nobs = values.shape[0]
+        if weights is None:
+            weights = np.ones(nobs)
+        weights = np.asarray(weights, dtype=float)
+        assert weights.shape == (nobs,)
+        assert np.all(weights >= 0)
+        x = values.reshape((nobs, -1)).T
+        wsum = weights.sum() * np.ones(x.shape[0])
+        avg = (x * weights).sum(axis=1) / weights.sum()
+        m2 = ((x - avg[:, None])**2 * weights).sum(axis=1)
+        w = np.broadcast_to(weights, x.shape)
+        self._combine(wsum, avg, m2, w, x, nobs)
+
+    def merge(self, other):
+        """
+        Add the observations summarized by another StreamingStats object.
+        """
+        assert other.shape == self.shape
+        self._combine(other.wsum, other.avg, other.m2, other.sketch_w,
+                      other.sketch_x, other.count)
+
+    def mean(self):
+        """
+        Return the weighted mean of each value.
+        """
+        return self.avg.reshape(self.shape)
+
+    def sd(self):
+        """
+        Return the weighted standard deviation of each value.
+        """
+        return np.sqrt(self.m2 / self.wsum).reshape(self.shape)
+
+    def quantile(self, q):
+        """
+        Return the estimated q quantile of each value.
+        """
+        assert q >= 0 and q <= 1
+        res = np.zeros(self.sketch_x.shape[0])
+        for k in range(len(res)):
+            w = self.sketch_w[k]
+            x = self.sketch_x[k][w > 0]
+            w = w[w > 0]
+            mid = (np.cumsum(w) - 0.5 * w) / w.sum()
+            res[k] = np.interp(q, mid, x)
+        return res.reshape(self.shape)
+
+
+def draw_parms(dists, n, rng):
+    """
+    Draw n sets of parameters from the distributions in dists (see above),
+    using the numpy.random.Generator rng.
+    Returns a list of n dicts to pass to Parameter.update_parms.
+    """
+    def draw(dist):
+        if callable(dist):
+            vals = np.asarray(dist(rng, n), dtype=float)
+        else:
+            vals = getattr(rng, dist[0])(*dist[1:], size=n)
+        assert np.shape(vals) == (n,)
+        return vals
+    draws = [dict() for i in range(n)]
+    for name in dists:
+        if name in MC_DICTS:
+            for elem in dists[name]:
+                vals = draw(dists[name][elem])
+                for i in range(n):
+                    draws[i].setdefault(name, dict())[elem] = vals[i]
+        else:
+            assert name in MC_PARMS
+            vals = draw(dists[name])
+            for i in range(n):
+                draws[i][name] = vals[i]
+    return draws
+
+
+def draw_valid_parms(base, dists, n, rng):
+    """
+    Draw n sets of parameters from the distributions in dists (see
+    draw_parms), drawing again any set that Parameter.update_parms rejects
+    for the Parameter object base.
+    Returns a list of n Parameter objects.
+    """
+    parms = list()
+    ndrawn = 0
+    while len(parms) < n:
+        if ndrawn >= MAX_REDRAWS * n:
+            raise ValueError('Fewer than 1 in ' + str(MAX_REDRAWS) +
+                             ' sets of parameters drawn are valid; check '
+                             'the distributions')
+        pdicts = draw_parms(dists, n - len(parms), rng)
+        ndrawn += len(pdicts)
+        for pdict in pdicts:
+            parm = base.snapshot()
+            try:
+                parm.update_parms(pdict)
+            except AssertionError:
+                continue
+            # Required returns move with rf and the premiums, unless drawn
+            if 'rd' not in pdict and ('rf' in pdict or 'premD' in pdict):
+                parm.rd = parm.rf + parm.premD
+            if 're' not in pdict and ('rf' in pdict or 'premE' in pdict):
+                parm.re = parm.rf + parm.premE
+            parms.append(parm)
+    return parms
+
+
+def _init_worker(parmdict, polfile, weighting, dtype='float64'):
+    """
+    Loads the Parameter, Policy and asset weights, once per process.
+    """
+    _worker['parm'] = Parameter(parmdict)
+    _worker['pol'] = Policy(polfile)
+    _worker['weighting'] = weighting
+    _worker['dtype'] = dtype
+    _worker['ob'] = None
+
+
+def _run_chunk(dists, n, seed, yearlist, size):
+    """
+    Draws n sets of parameters using the given seed, calculates results
+    for every year in yearlist, and summarizes the results by category.
+    Returns a StreamingStats object for each year.
+    """
+    rng = np.random.default_rng(seed)
+    calcs = list()
+    for parm in draw_valid_parms(_worker['parm'], dists, n, rng):
+        calcs.append(Calculator(parm, _worker['pol'],
+                                dtype=_worker['dtype'], verbose=False))
+    calcs[0]._calc_array_batch([(calc, year) for calc in calcs
+                                for year in yearlist])
+    if _worker['ob'] is None:
+        # Set up the asset weights and category masks
+        _worker['ob'] = OutputBuilder(calcs[0], 'montecarlo',
+                                      _worker['weighting'])
+    main = np.array([_worker['ob'].aggregate_main(stack_results(calc,
+                                                                yearlist))
+                     for calc in calcs])
+    stats = list()
+    for y in range(len(yearlist)):
+        stat = StreamingStats(main.shape[2:], size)
+        stat.add(main[:, y])
+        stats.append(stat)
+    return stats
+
+
+def run_montecarlo(dists, ndraws, yearlist, parmdict=None,
+                   polfile='policy_baseline.csv', weighting='stock',
+                   chunksize=20, seed=0, max_workers=1, size=1000,
+                   dtype='float64'):
+    """
+    Calculates results for ndraws sets of parameters drawn from dists, in
+    chunks of chunksize draws, and summarizes the weighted averages by
+    category (as in OutputBuilder.tabulate_main) for each year.
+        dists: dict of distributions (see above)
+        yearlist: list of years
+        parmdict: dict of other parameters to pass to Parameter
+        polfile: name of the policy CSV file
+        weighting: 'stock' or 'investment', as for OutputBuilder
+        seed: seed for the random draws; each chunk draws from its own
+              stream, so results do not depend on max_workers
+        max_workers: number of processes to use
+        size: number of groups in the quantile sketches
+        dtype: dtype to store each chunk's results in (see Calculator);
+               summaries are always accumulated in float64
+    Returns a dict of StreamingStats objects by year, each for an array
+    with axes (measure, category), in the order of measlist and catlist.
+    """
+    assert ndraws >= 1
+    nchunks = (ndraws + chunksize - 1) // chunksize
+    seeds = np.random.SeedSequence(seed).spawn(nchunks)
+    tasks = [(dists, min(chunksize, ndraws - k * chunksize), seeds[k],
+              yearlist, size) for k in range(nchunks)]
+    stats = {year: StreamingStats((len(measlist), len(catlist)), size)
+             for year in yearlist}
+    def combine(chunkstats):
+        for y in range(len(yearlist)):
+            stats[yearlist[y]].merge(chunkstats[y])
+    if max_workers == 1:
+        _init_worker(parmdict, polfile, weighting, dtype)
+        for task in tasks:
+            combine(_run_chunk(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_init_worker,
+                                 initargs=(parmdict, polfile, weighting,
+                                           dtype)) as executor:
+            # Submit a limited number of chunks at a time, so that results
+            # waiting to be combined do not use too much memory
+            limit = 2 * (max_workers or os.cpu_count())
+            pending = list()
+            for task in tasks:
+                pending.append(executor.submit(_run_chunk, *task))
+                if len(pending) >= limit:
+                    combine(pending.pop(0).result())
+            for future in pending:
+                combine(future.result())
+    return stats
+
+
+def summary_tables(stats, quantiles=[0.05, 0.5, 0.95]):
+    """
+    Convert a StreamingStats object from run_montecarlo to DataFrames in
+    the format of OutputBuilder.tabulate_main.
+    Returns a dict of DataFrames, with keys 'mean', 'sd' and each quantile.
+    """
+    def table(arr):
+        df1 = pd.DataFrame({'Category': catlist})
+        for m in range(len(measlist)):
+            df1[measlist[m]] = arr[m]
+        return df1
+    tables = {'mean': table(stats.mean()), 'sd': table(stats.sd())}
+    for q in quantiles:
+        tables[q] = table(stats.quantile(q))
+    return tables
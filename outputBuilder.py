@@ -1,9 +1,54 @@
-import copy
 import numpy as np
 import pandas as pd
 from config import (INPUTPATH, OUTPUTPATH, ast_codes, ind_codes,
                     catlist, ntype, nind)
 
+# Firm types, in the order of the firm type axis
+ftypes = ['corp', 'scorp', 'soleprop', 'partner']
+# Measures, in the order of the measure axis used by aggregate()
+measlist = ['CoC', 'METR', 'METTR', 'UCoC', 'EATRd', 'EATRf']
+
+def stack_arrays(res):
+    """
+    Stack a dict of result arrays, as returned by the array engine, into
+    an array with last axes (measure, firm type, asset type, industry), with
+    measures in the order of measlist. The arrays for coc, metr, mettr and
+    ucoc have last axes (firm type, asset type, industry), and those for
+    eatr_dom and eatr_for (asset type, industry), after the same leading
+    axes. EATRs are for C corporations only, and are 0 for other firm types.
+    The stacked array has the same dtype as the cost of capital.
+    """
+    lead = np.shape(res['coc'])[:-3]
+    stack = np.zeros(lead + (len(measlist), 4, ntype, nind),
+                     dtype=np.asarray(res['coc']).dtype)
+    stack[..., 0, :, :, :] = res['coc']
+    stack[..., 1, :, :, :] = res['metr']
+    stack[..., 2, :, :, :] = res['mettr']
+    stack[..., 3, :, :, :] = res['ucoc']
+    stack[..., 4, 0, :, :] = res['eatr_dom']
+    stack[..., 5, 0, :, :] = res['eatr_for']
+    return stack
+
+def stack_results(calc, yearlist):
+    """
+    Stack the results of a Calculator for every year in yearlist as an
+    array with axes (year, measure, firm type, asset type, industry) (see
+    stack_arrays).
+    """
+    years = [str(year) for year in yearlist]
+    res = dict()
+    for (name, results) in [('coc', calc.results_coc),
+                            ('metr', calc.results_metr),
+                            ('mettr', calc.results_mettr),
+                            ('ucoc', calc.results_ucoc)]:
+        res[name] = np.array([[results[year][ftype] for ftype in ftypes]
+                              for year in years])
+    res['eatr_dom'] = np.array([calc.results_international[year]['domestic']
+                                for year in years])
+    res['eatr_for'] = np.array([calc.results_international[year]['foreign']
+                                for year in years])
+    return stack_arrays(res)
+
 class OutputBuilder():
     """
     OutputBuilder class.
@@ -16,9 +61,10 @@ class OutputBuilder():
             parm: Parameter class object
             pol: Policy class object
         """
-        # Store Calculator object
-        assert calc.calc_all_called
-        self.calc = copy.deepcopy(calc)
+        # Store Calculator object (as a snapshot sharing its results). The
+        # weights do not need any results, so calc need not have any yet;
+        # methods using results check that their years were calculated.
+        self.calc = calc.snapshot()
         # Read in asset data
         if weighting is not None:
             assert weighting in ['stock', 'investment']
@@ -45,12 +91,13 @@ class OutputBuilder():
                                           index_col='asset').fillna(value = 0)
         self.stock_partner = pd.read_csv(fpath + 'partner.csv',
                                          index_col='asset').fillna(value = 0)
+        self.build_masks()
     
     def store_raw(self, year):
         """
         Store output from Calculator for the given year.
         """
-        assert str(year) in list(self.calc.results_coc)
+        assert str(year) in self.calc.inputs
         # Convert result arrays to DataFrames
         df_corp1 = pd.DataFrame(self.calc.results_coc[str(year)]['corp'],
                                 index=ast_codes, columns=ind_codes)
@@ -79,73 +126,125 @@ class OutputBuilder():
         df_soleprop2.to_csv(OUTPUTPATH + 'raw/metr_soleprop_' + fileend)
         df_partner2.to_csv(OUTPUTPATH + 'raw/metr_partner_' + fileend)
     
+    def build_masks(self):
+        """
+        Build the weights and category masks used by aggregate().
+            weights: array (measure, firm type, asset type, industry) of
+                     asset weights for each measure; EATRs use C corporation
+                     weights only
+            catmask: array (measure, category, firm type, asset type) of
+                     0/1 indicators of the cells in each category of
+                     catlist; EATRs are not computed by firm type
+        Both are stored in the Calculator's result dtype.
+        """
+        stock = np.array([self.stock_ccorp.to_numpy(),
+                          self.stock_scorp.to_numpy(),
+                          self.stock_soleprop.to_numpy(),
+                          self.stock_partner.to_numpy()])
+        self.weights = np.zeros((len(measlist), 4, ntype, nind),
+                                dtype=self.calc.dtype)
+        self.weights[:4] = stock
+        self.weights[4:, 0] = stock[0]
+        # Categories as (firm types, asset types), in the order of catlist
+        cats = [(slice(0, 4), slice(0, ntype)),
+                (0, slice(0, ntype)), (1, slice(0, ntype)),
+                (2, slice(0, ntype)), (3, slice(0, ntype)),
+                (slice(0, 4), slice(0, 37)), (slice(0, 4), slice(37, 68)),
+                (slice(0, 4), slice(91, 92)), (slice(0, 4), slice(68, 91))]
+        self.catmask = np.zeros((len(measlist), len(catlist), 4, ntype),
+                                dtype=self.calc.dtype)
+        for c in range(len(cats)):
+            self.catmask[(slice(None), c) + cats[c]] = 1.
+        self.catmask[4:, 1:5] = 0.
+        # Averages already computed, by year
+        self.aggregates = dict()
+    
+    def aggregate(self, yearlist):
+        """
+        Compute weighted averages of every measure in measlist, by category,
+        by asset type and by industry, and the standard deviation of the
+        cost of capital, for every year in yearlist. Years not yet
+        aggregated are done together, in a single pass.
+        Returns a dict with, for each year, a dict of:
+            main: array (measure, category)
+            asset: array (measure, asset type)
+            industry: array (measure, industry)
+            sd: standard deviation of the cost of capital
+        """
+        for year in yearlist:
+            assert str(year) in self.calc.inputs
+        newyears = [str(year) for year in yearlist
+                    if str(year) not in self.aggregates]
+        if len(newyears) > 0:
+            res = stack_results(self.calc, newyears)
+            tables = self.aggregate_arrays(res)
+            main = tables['main']
+            # Variance of the cost of capital around its overall average
+            dev2 = (res[:, 0] - main[:, 0, 0, None, None, None])**2
+            vcoc = (np.einsum('yfai,fai->y', dev2, self.weights[0],
+                              dtype=np.float64)
+                    / self.weights[0].sum(dtype=np.float64))
+            for y in range(len(newyears)):
+                self.aggregates[newyears[y]] = {
+                    'main': main[y], 'asset': tables['asset'][y],
+                    'industry': tables['industry'][y], 'sd': vcoc[y]**0.5}
+        return {year: self.aggregates[str(year)] for year in yearlist}
+    
+    def aggregate_main(self, res):
+        """
+        Compute weighted averages by category (as in tabulate_main) for an
+        array of results with last axes (measure, firm type, asset type,
+        industry), as from stack_results. Returns an array with the same
+        leading axes and last axes (measure, category). Sums are accumulated
+        in float64, whatever the dtype of res and the weights.
+        """
+        maintot = np.einsum('mfai,mcfa->mc', self.weights, self.catmask,
+                            dtype=np.float64)
+        # Categories excluded from a measure are reported as 0
+        maintot[~self.catmask.any(axis=(2, 3))] = 1.
+        # Sum over industries first, then over the cells in each category
+        wsum = np.einsum('...mfai,mfai->...mfa', res, self.weights,
+                         dtype=np.float64)
+        main = (np.einsum('...mfa,mcfa->...mc', wsum, self.catmask,
+                          optimize=True)
+                / maintot)
+        return main
+    
+    def aggregate_arrays(self, res):
+        """
+        Compute weighted averages by category, by asset type and by
+        industry for an array of results with last axes (measure, firm type,
+        asset type, industry), as from stack_results or stack_arrays.
+        Returns a dict of arrays with the same leading axes as res:
+            main: last axes (measure, category)
+            asset: last axes (measure, asset type)
+            industry: last axes (measure, industry)
+        Sums are accumulated in float64, as in aggregate_main.
+        """
+        asset = (np.einsum('...mfai,mfai->...ma', res, self.weights,
+                           dtype=np.float64)
+                 / self.weights.sum(axis=(1, 3), dtype=np.float64))
+        industry = (np.einsum('...mfai,mfai->...mi', res, self.weights,
+                              dtype=np.float64)
+                    / self.weights.sum(axis=(1, 2), dtype=np.float64))
+        return {'main': self.aggregate_main(res), 'asset': asset,
+                'industry': industry}
+    
     def tabulate_industry(self, year):
         """
         Compute weighted averags of various measures by industry
         for the given year.
         """
-        assert str(year) in list(self.calc.results_coc)
-        # Extract asset weights
-        stock_ccorp_arr = self.stock_ccorp.to_numpy()
-        stock_scorp_arr = self.stock_scorp.to_numpy()
-        stock_soleprop_arr = self.stock_soleprop.to_numpy()
-        stock_partner_arr = self.stock_partner.to_numpy()
-        # Extract results by firm type
-        coc_ccorp = self.calc.results_coc[str(year)]['corp']
-        coc_scorp = self.calc.results_coc[str(year)]['scorp']
-        coc_soleprop = self.calc.results_coc[str(year)]['soleprop']
-        coc_partner = self.calc.results_coc[str(year)]['partner']
-        mtr_ccorp = self.calc.results_metr[str(year)]['corp']
-        mtr_scorp = self.calc.results_metr[str(year)]['scorp']
-        mtr_soleprop = self.calc.results_metr[str(year)]['soleprop']
-        mtr_partner = self.calc.results_metr[str(year)]['partner']
-        mettr_ccorp = self.calc.results_mettr[str(year)]['corp']
-        mettr_scorp = self.calc.results_mettr[str(year)]['scorp']
-        mettr_soleprop = self.calc.results_mettr[str(year)]['soleprop']
-        mettr_partner = self.calc.results_mettr[str(year)]['partner']
-        ucoc_ccorp = self.calc.results_ucoc[str(year)]['corp']
-        ucoc_scorp = self.calc.results_ucoc[str(year)]['scorp']
-        ucoc_soleprop = self.calc.results_ucoc[str(year)]['soleprop']
-        ucoc_partner = self.calc.results_ucoc[str(year)]['partner']
-        # Extract international results
-        eatr_d = self.calc.results_international[str(year)]['domestic']
-        eatr_f = self.calc.results_international[str(year)]['foreign']
-        # Compute and store averages by industry
-        coclist = ((coc_ccorp * stock_ccorp_arr
-                    + coc_scorp * stock_scorp_arr
-                    + coc_soleprop * stock_soleprop_arr
-                    + coc_partner * stock_partner_arr).sum(0)
-                   / (stock_ccorp_arr + stock_scorp_arr
-                      + stock_soleprop_arr + stock_partner_arr).sum(0))
-        mtrlist = ((mtr_ccorp * stock_ccorp_arr
-                    + mtr_scorp * stock_scorp_arr
-                    + mtr_soleprop * stock_soleprop_arr
-                    + mtr_partner * stock_partner_arr).sum(0)
-                   / (stock_ccorp_arr + stock_scorp_arr
-                      + stock_soleprop_arr + stock_partner_arr).sum(0))
-        mettrlist = ((mettr_ccorp * stock_ccorp_arr
-                      + mettr_scorp * stock_scorp_arr
-                      + mettr_soleprop * stock_soleprop_arr
-                      + mettr_partner * stock_partner_arr).sum(0)
-                     / (stock_ccorp_arr + stock_scorp_arr
-                        + stock_soleprop_arr + stock_partner_arr).sum(0))
-        ucoclist = ((ucoc_ccorp * stock_ccorp_arr
-                     + ucoc_scorp * stock_scorp_arr
-                     + ucoc_soleprop * stock_soleprop_arr
-                     + ucoc_partner * stock_partner_arr).sum(0)
-                    / (stock_ccorp_arr + stock_scorp_arr
-                       + stock_soleprop_arr + stock_partner_arr).sum(0))
-        eatrdlist = (eatr_d * stock_ccorp_arr).sum(0)/ stock_ccorp_arr.sum(0)
-        eatrflist = (eatr_f * stock_ccorp_arr).sum(0)/ stock_ccorp_arr.sum(0)
+        res = self.aggregate([year])[year]['industry']
         # Combine into dataframe and save
         indnames = pd.read_csv(INPUTPATH + 'industries.csv')
         data1 = pd.DataFrame({'Industry code': ind_codes,
                               'Industry': indnames['industry name'],
-                              'Cost of capital': coclist,
-                              'User cost of capital': ucoclist,
-                              'METR': mtrlist, 'METTR': mettrlist,
-                              'Domestic EATR': eatrdlist,
-                              'Foreign EATR': eatrflist})
+                              'Cost of capital': res[0],
+                              'User cost of capital': res[3],
+                              'METR': res[1], 'METTR': res[2],
+                              'Domestic EATR': res[4],
+                              'Foreign EATR': res[5]})
         data1.to_csv(OUTPUTPATH + 'raw/' + 'byIndustry_' + self.key + '_'
                      + str(year) + '.csv', index=False)
     
@@ -154,68 +253,16 @@ class OutputBuilder():
         Compute weighted averages of various measures by asset type
         for the given year.
         """
-        assert str(year) in list(self.calc.results_coc)
-        # Extract asset weights
-        stock_ccorp_arr = self.stock_ccorp.to_numpy()
-        stock_scorp_arr = self.stock_scorp.to_numpy()
-        stock_soleprop_arr = self.stock_soleprop.to_numpy()
-        stock_partner_arr = self.stock_partner.to_numpy()
-        # Extract results by firm type
-        coc_ccorp = self.calc.results_coc[str(year)]['corp']
-        coc_scorp = self.calc.results_coc[str(year)]['scorp']
-        coc_soleprop = self.calc.results_coc[str(year)]['soleprop']
-        coc_partner = self.calc.results_coc[str(year)]['partner']
-        mtr_ccorp = self.calc.results_metr[str(year)]['corp']
-        mtr_scorp = self.calc.results_metr[str(year)]['scorp']
-        mtr_soleprop = self.calc.results_metr[str(year)]['soleprop']
-        mtr_partner = self.calc.results_metr[str(year)]['partner']
-        mettr_ccorp = self.calc.results_mettr[str(year)]['corp']
-        mettr_scorp = self.calc.results_mettr[str(year)]['scorp']
-        mettr_soleprop = self.calc.results_mettr[str(year)]['soleprop']
-        mettr_partner = self.calc.results_mettr[str(year)]['partner']
-        ucoc_ccorp = self.calc.results_ucoc[str(year)]['corp']
-        ucoc_scorp = self.calc.results_ucoc[str(year)]['scorp']
-        ucoc_soleprop = self.calc.results_ucoc[str(year)]['soleprop']
-        ucoc_partner = self.calc.results_ucoc[str(year)]['partner']
-        # Extract international results
-        eatr_d = self.calc.results_international[str(year)]['domestic']
-        eatr_f = self.calc.results_international[str(year)]['foreign']
-        # Compute and store averages by asset type
-        coclist = ((coc_ccorp * stock_ccorp_arr
-                    + coc_scorp * stock_scorp_arr
-                    + coc_soleprop * stock_soleprop_arr
-                    + coc_partner * stock_partner_arr).sum(1)
-                   / (stock_ccorp_arr + stock_scorp_arr
-                      + stock_soleprop_arr + stock_partner_arr).sum(1))
-        mtrlist = ((mtr_ccorp * stock_ccorp_arr
-                    + mtr_scorp * stock_scorp_arr
-                    + mtr_soleprop * stock_soleprop_arr
-                    + mtr_partner * stock_partner_arr).sum(1)
-                   / (stock_ccorp_arr + stock_scorp_arr
-                      + stock_soleprop_arr + stock_partner_arr).sum(1))
-        mettrlist = ((mettr_ccorp * stock_ccorp_arr
-                      + mettr_scorp * stock_scorp_arr
-                      + mettr_soleprop * stock_soleprop_arr
-                      + mettr_partner * stock_partner_arr).sum(1)
-                     / (stock_ccorp_arr + stock_scorp_arr
-                        + stock_soleprop_arr + stock_partner_arr).sum(1))
-        ucoclist = ((ucoc_ccorp * stock_ccorp_arr
-                     + ucoc_scorp * stock_scorp_arr
-                     + ucoc_soleprop * stock_soleprop_arr
-                     + ucoc_partner * stock_partner_arr).sum(1)
-                    / (stock_ccorp_arr + stock_scorp_arr
-                       + stock_soleprop_arr + stock_partner_arr).sum(1))
-        eatrdlist = (eatr_d * stock_ccorp_arr).sum(1)/ stock_ccorp_arr.sum(1)
-        eatrflist = (eatr_f * stock_ccorp_arr).sum(1)/ stock_ccorp_arr.sum(1)
+        res = self.aggregate([year])[year]['asset']
         # Combine into dataframe and save
         astnames = pd.read_csv(INPUTPATH + 'assettypes.csv')
         data1 = pd.DataFrame({'Asset code': ast_codes,
                               'Asset': astnames['asset name'],
-                              'Cost of capital': coclist,
-                              'User cost of capital': ucoclist,
-                              'METR': mtrlist, 'METTR': mettrlist,
-                              'Domestic EATR': eatrdlist,
-                              'Foreign EATR': eatrflist})
+                              'Cost of capital': res[0],
+                              'User cost of capital': res[3],
+                              'METR': res[1], 'METTR': res[2],
+                              'Domestic EATR': res[4],
+                              'Foreign EATR': res[5]})
         data1.to_csv(OUTPUTPATH + 'raw/' + 'byAssetType_' + self.key + '_'
                      + str(year) + '.csv', index=False)
     
@@ -232,309 +279,31 @@ class OutputBuilder():
             Rental residential
             Intellectual property
         """
-        assert str(year) in list(self.calc.results_coc)
-        # Extract asset weights
-        stock_ccorp_arr = self.stock_ccorp.to_numpy()
-        stock_scorp_arr = self.stock_scorp.to_numpy()
-        stock_soleprop_arr = self.stock_soleprop.to_numpy()
-        stock_partner_arr = self.stock_partner.to_numpy()
-        # Extract results by firm type
-        coc_ccorp = self.calc.results_coc[str(year)]['corp']
-        coc_scorp = self.calc.results_coc[str(year)]['scorp']
-        coc_soleprop = self.calc.results_coc[str(year)]['soleprop']
-        coc_partner = self.calc.results_coc[str(year)]['partner']
-        mtr_ccorp = self.calc.results_metr[str(year)]['corp']
-        mtr_scorp = self.calc.results_metr[str(year)]['scorp']
-        mtr_soleprop = self.calc.results_metr[str(year)]['soleprop']
-        mtr_partner = self.calc.results_metr[str(year)]['partner']
-        mettr_ccorp = self.calc.results_mettr[str(year)]['corp']
-        mettr_scorp = self.calc.results_mettr[str(year)]['scorp']
-        mettr_soleprop = self.calc.results_mettr[str(year)]['soleprop']
-        mettr_partner = self.calc.results_mettr[str(year)]['partner']
-        ucoc_ccorp = self.calc.results_ucoc[str(year)]['corp']
-        ucoc_scorp = self.calc.results_ucoc[str(year)]['scorp']
-        ucoc_soleprop = self.calc.results_ucoc[str(year)]['soleprop']
-        ucoc_partner = self.calc.results_ucoc[str(year)]['partner']
-        # Extract international results
-        eatr_d = self.calc.results_international[str(year)]['domestic']
-        eatr_f = self.calc.results_international[str(year)]['foreign']
-        # Arrays for storing results
-        coclist = np.zeros(9)
-        mtrlist = np.zeros(9)
-        mettrlist = np.zeros(9)
-        ucoclist = np.zeros(9)
-        eatrdlist = np.zeros(9)
-        eatrflist = np.zeros(9)
-        # Store average results for cost of capital
-        coclist[0] = ((coc_ccorp * stock_ccorp_arr
-                       + coc_scorp * stock_scorp_arr
-                       + coc_soleprop * stock_soleprop_arr
-                       + coc_partner * stock_partner_arr).sum()
-                      / (stock_ccorp_arr + stock_scorp_arr
-                         + stock_soleprop_arr + stock_partner_arr).sum())
-        coclist[1] = ((coc_ccorp * stock_ccorp_arr).sum()
-                      / stock_ccorp_arr.sum())
-        coclist[2] = ((coc_scorp * stock_scorp_arr).sum()
-                      / stock_scorp_arr.sum())
-        coclist[3] = ((coc_soleprop * stock_soleprop_arr).sum()
-                      / stock_soleprop_arr.sum())
-        coclist[4] = ((coc_partner * stock_partner_arr).sum()
-                      / stock_partner_arr.sum())
-        coclist[5] = ((coc_ccorp[0:37,:] * stock_ccorp_arr[0:37,:]
-                       + coc_scorp[0:37,:] * stock_scorp_arr[0:37,:]
-                       + coc_soleprop[0:37,:] * stock_soleprop_arr[0:37,:]
-                       + coc_partner[0:37,:] * stock_partner_arr[0:37,:]).sum()
-                      / (stock_ccorp_arr[0:37,:] + stock_scorp_arr[0:37,:]
-                         + stock_soleprop_arr[0:37,:]
-                         + stock_partner_arr[0:37,:]).sum())
-        coclist[6] = ((coc_ccorp[37:68,:] * stock_ccorp_arr[37:68,:]
-                       + coc_scorp[37:68,:] * stock_scorp_arr[37:68,:]
-                       + coc_soleprop[37:68,:] * stock_soleprop_arr[37:68,:]
-                       + coc_partner[37:68,:] * stock_partner_arr[37:68,:]).sum()
-                      / (stock_ccorp_arr[37:68] + stock_scorp_arr[37:68,:]
-                         + stock_soleprop_arr[37:68,:]
-                         + stock_partner_arr[37:68,:]).sum())
-        coclist[7] = ((coc_ccorp[91,:] * stock_ccorp_arr[91,:]
-                       + coc_scorp[91,:] * stock_scorp_arr[91,:]
-                       + coc_soleprop[91,:] * stock_soleprop_arr[91,:]
-                       + coc_partner[91,:] * stock_partner_arr[91,:]).sum()
-                      / (stock_ccorp_arr[91,:] + stock_scorp_arr[91,:]
-                         + stock_soleprop_arr[91,:]
-                         + stock_partner_arr[91,:]).sum())
-        coclist[8] = ((coc_ccorp[68:91,:] * stock_ccorp_arr[68:91,:]
-                       + coc_scorp[68:91,:] * stock_scorp_arr[68:91,:]
-                       + coc_soleprop[68:91,:] * stock_soleprop_arr[68:91,:]
-                       + coc_partner[68:91,:] * stock_partner_arr[68:91,:]).sum()
-                      / (stock_ccorp_arr[68:91,:] + stock_scorp_arr[68:91,:]
-                         + stock_soleprop_arr[68:91,:]
-                         + stock_partner_arr[68:91,:]).sum())
-        # Store average results for METR
-        mtrlist[0] = ((mtr_ccorp * stock_ccorp_arr
-                       + mtr_scorp * stock_scorp_arr
-                       + mtr_soleprop * stock_soleprop_arr
-                       + mtr_partner * stock_partner_arr).sum()
-                      / (stock_ccorp_arr + stock_scorp_arr
-                         + stock_soleprop_arr + stock_partner_arr).sum())
-        mtrlist[1] = ((mtr_ccorp * stock_ccorp_arr).sum()
-                      / stock_ccorp_arr.sum())
-        mtrlist[2] = ((mtr_scorp * stock_scorp_arr).sum()
-                      / stock_scorp_arr.sum())
-        mtrlist[3] = ((mtr_soleprop * stock_soleprop_arr).sum()
-                      / stock_soleprop_arr.sum())
-        mtrlist[4] = ((mtr_partner * stock_partner_arr).sum()
-                      / stock_partner_arr.sum())
-        mtrlist[5] = ((mtr_ccorp[0:37,:] * stock_ccorp_arr[0:37,:]
-                       + mtr_scorp[0:37,:] * stock_scorp_arr[0:37,:]
-                       + mtr_soleprop[0:37,:] * stock_soleprop_arr[0:37,:]
-                       + mtr_partner[0:37,:] * stock_partner_arr[0:37,:]).sum()
-                      / (stock_ccorp_arr[0:37,:] + stock_scorp_arr[0:37,:]
-                         + stock_soleprop_arr[0:37,:]
-                         + stock_partner_arr[0:37,:]).sum())
-        mtrlist[6] = ((mtr_ccorp[37:68,:] * stock_ccorp_arr[37:68,:]
-                       + mtr_scorp[37:68,:] * stock_scorp_arr[37:68,:]
-                       + mtr_soleprop[37:68,:] * stock_soleprop_arr[37:68,:]
-                       + mtr_partner[37:68,:] * stock_partner_arr[37:68,:]).sum()
-                      / (stock_ccorp_arr[37:68] + stock_scorp_arr[37:68,:]
-                         + stock_soleprop_arr[37:68,:]
-                         + stock_partner_arr[37:68,:]).sum())
-        mtrlist[7] = ((mtr_ccorp[91,:] * stock_ccorp_arr[91,:]
-                       + mtr_scorp[91,:] * stock_scorp_arr[91,:]
-                       + mtr_soleprop[91,:] * stock_soleprop_arr[91,:]
-                       + mtr_partner[91,:] * stock_partner_arr[91,:]).sum()
-                      / (stock_ccorp_arr[91,:] + stock_scorp_arr[91,:]
-                         + stock_soleprop_arr[91,:]
-                         + stock_partner_arr[91,:]).sum())
-        mtrlist[8] = ((mtr_ccorp[68:91,:] * stock_ccorp_arr[68:91,:]
-                       + mtr_scorp[68:91,:] * stock_scorp_arr[68:91,:]
-                       + mtr_soleprop[68:91,:] * stock_soleprop_arr[68:91,:]
-                       + mtr_partner[68:91,:] * stock_partner_arr[68:91,:]).sum()
-                      / (stock_ccorp_arr[68:91,:] + stock_scorp_arr[68:91,:]
-                         + stock_soleprop_arr[68:91,:]
-                         + stock_partner_arr[68:91,:]).sum())
-        # Store average results for METTR
-        mettrlist[0] = ((mettr_ccorp * stock_ccorp_arr
-                         + mettr_scorp * stock_scorp_arr
-                         + mettr_soleprop * stock_soleprop_arr
-                         + mettr_partner * stock_partner_arr).sum()
-                        / (stock_ccorp_arr + stock_scorp_arr
-                         + stock_soleprop_arr + stock_partner_arr).sum())
-        mettrlist[1] = ((mettr_ccorp * stock_ccorp_arr).sum()
-                        / stock_ccorp_arr.sum())
-        mettrlist[2] = ((mettr_scorp * stock_scorp_arr).sum()
-                        / stock_scorp_arr.sum())
-        mettrlist[3] = ((mettr_soleprop * stock_soleprop_arr).sum()
-                        / stock_soleprop_arr.sum())
-        mettrlist[4] = ((mettr_partner * stock_partner_arr).sum()
-                        / stock_partner_arr.sum())
-        mettrlist[5] = ((mettr_ccorp[0:37,:] * stock_ccorp_arr[0:37,:]
-                         + mettr_scorp[0:37,:] * stock_scorp_arr[0:37,:]
-                         + mettr_soleprop[0:37,:] * stock_soleprop_arr[0:37,:]
-                         + mettr_partner[0:37,:] * stock_partner_arr[0:37,:]).sum()
-                        / (stock_ccorp_arr[0:37,:] + stock_scorp_arr[0:37,:]
-                           + stock_soleprop_arr[0:37,:]
-                           + stock_partner_arr[0:37,:]).sum())
-        mettrlist[6] = ((mettr_ccorp[37:68,:] * stock_ccorp_arr[37:68,:]
-                         + mettr_scorp[37:68,:] * stock_scorp_arr[37:68,:]
-                         + mettr_soleprop[37:68,:] * stock_soleprop_arr[37:68,:]
-                         + mettr_partner[37:68,:] * stock_partner_arr[37:68,:]).sum()
-                        / (stock_ccorp_arr[37:68] + stock_scorp_arr[37:68,:]
-                           + stock_soleprop_arr[37:68,:]
-                           + stock_partner_arr[37:68,:]).sum())
-        mettrlist[7] = ((mettr_ccorp[91,:] * stock_ccorp_arr[91,:]
-                         + mettr_scorp[91,:] * stock_scorp_arr[91,:]
-                         + mettr_soleprop[91,:] * stock_soleprop_arr[91,:]
-                         + mettr_partner[91,:] * stock_partner_arr[91,:]).sum()
-                        / (stock_ccorp_arr[91,:] + stock_scorp_arr[91,:]
-                           + stock_soleprop_arr[91,:]
-                           + stock_partner_arr[91,:]).sum())
-        mettrlist[8] = ((mettr_ccorp[68:91,:] * stock_ccorp_arr[68:91,:]
-                         + mettr_scorp[68:91,:] * stock_scorp_arr[68:91,:]
-                         + mettr_soleprop[68:91,:] * stock_soleprop_arr[68:91,:]
-                         + mettr_partner[68:91,:] * stock_partner_arr[68:91,:]).sum()
-                        / (stock_ccorp_arr[68:91,:] + stock_scorp_arr[68:91,:]
-                           + stock_soleprop_arr[68:91,:]
-                           + stock_partner_arr[68:91,:]).sum())
-        # Store average results for user cost of capital
-        ucoclist[0] = ((ucoc_ccorp * stock_ccorp_arr
-                        + ucoc_scorp * stock_scorp_arr
-                        + ucoc_soleprop * stock_soleprop_arr
-                        + ucoc_partner * stock_partner_arr).sum()
-                       / (stock_ccorp_arr + stock_scorp_arr
-                         + stock_soleprop_arr + stock_partner_arr).sum())
-        ucoclist[1] = ((ucoc_ccorp * stock_ccorp_arr).sum()
-                       / stock_ccorp_arr.sum())
-        ucoclist[2] = ((ucoc_scorp * stock_scorp_arr).sum()
-                       / stock_scorp_arr.sum())
-        ucoclist[3] = ((ucoc_soleprop * stock_soleprop_arr).sum()
-                       / stock_soleprop_arr.sum())
-        ucoclist[4] = ((ucoc_partner * stock_partner_arr).sum()
-                       / stock_partner_arr.sum())
-        ucoclist[5] = ((ucoc_ccorp[0:37,:] * stock_ccorp_arr[0:37,:]
-                        + ucoc_scorp[0:37,:] * stock_scorp_arr[0:37,:]
-                        + ucoc_soleprop[0:37,:] * stock_soleprop_arr[0:37,:]
-                        + ucoc_partner[0:37,:] * stock_partner_arr[0:37,:]).sum()
-                       / (stock_ccorp_arr[0:37,:] + stock_scorp_arr[0:37,:]
-                          + stock_soleprop_arr[0:37,:]
-                          + stock_partner_arr[0:37,:]).sum())
-        ucoclist[6] = ((ucoc_ccorp[37:68,:] * stock_ccorp_arr[37:68,:]
-                        + ucoc_scorp[37:68,:] * stock_scorp_arr[37:68,:]
-                        + ucoc_soleprop[37:68,:] * stock_soleprop_arr[37:68,:]
-                        + ucoc_partner[37:68,:] * stock_partner_arr[37:68,:]).sum()
-                       / (stock_ccorp_arr[37:68] + stock_scorp_arr[37:68,:]
-                          + stock_soleprop_arr[37:68,:]
-                          + stock_partner_arr[37:68,:]).sum())
-        ucoclist[7] = ((ucoc_ccorp[91,:] * stock_ccorp_arr[91,:]
-                        + ucoc_scorp[91,:] * stock_scorp_arr[91,:]
-                        + ucoc_soleprop[91,:] * stock_soleprop_arr[91,:]
-                        + ucoc_partner[91,:] * stock_partner_arr[91,:]).sum()
-                       / (stock_ccorp_arr[91,:] + stock_scorp_arr[91,:]
-                          + stock_soleprop_arr[91,:]
-                          + stock_partner_arr[91,:]).sum())
-        ucoclist[8] = ((ucoc_ccorp[68:91,:] * stock_ccorp_arr[68:91,:]
-                        + ucoc_scorp[68:91,:] * stock_scorp_arr[68:91,:]
-                        + ucoc_soleprop[68:91,:] * stock_soleprop_arr[68:91,:]
-                        + ucoc_partner[68:91,:] * stock_partner_arr[68:91,:]).sum()
-                       / (stock_ccorp_arr[68:91,:] + stock_scorp_arr[68:91,:]
-                          + stock_soleprop_arr[68:91,:]
-                          + stock_partner_arr[68:91,:]).sum())
-        # Store average results for EATRs
-        eatrdlist[0] = (eatr_d * stock_ccorp_arr).sum() / stock_ccorp_arr.sum()
-        eatrflist[0] = (eatr_f * stock_ccorp_arr).sum() / stock_ccorp_arr.sum()
-        eatrdlist[5] = ((eatr_d[0:37,:] * stock_ccorp_arr[0:37,:]).sum()
-                        / stock_ccorp_arr[0:37,:].sum())
-        eatrflist[5] = ((eatr_f[0:37,:] * stock_ccorp_arr[0:37,:]).sum()
-                        / stock_ccorp_arr[0:37,:].sum())
-        eatrdlist[6] = ((eatr_d[37:68,:] * stock_ccorp_arr[37:68,:]).sum()
-                        / stock_ccorp_arr[37:68,:].sum())
-        eatrflist[6] = ((eatr_f[37:68,:] * stock_ccorp_arr[37:68,:]).sum()
-                        / stock_ccorp_arr[37:68,:].sum())
-        eatrdlist[7] = ((eatr_d[91,:] * stock_ccorp_arr[91,:]).sum()
-                        / stock_ccorp_arr[91,:].sum())
-        eatrflist[7] = ((eatr_f[91,:] * stock_ccorp_arr[91,:]).sum()
-                        / stock_ccorp_arr[91,:].sum())
-        eatrdlist[8] = ((eatr_d[68:91,:] * stock_ccorp_arr[68:91,:]).sum()
-                        / stock_ccorp_arr[68:91,:].sum())
-        eatrflist[8] = ((eatr_f[68:91,:] * stock_ccorp_arr[68:91,:]).sum()
-                        / stock_ccorp_arr[68:91,:].sum())
-        # Save and return results
-        df1 = pd.DataFrame({'Category': catlist, 'CoC': coclist,
-                            'METR': mtrlist, 'UCoC': ucoclist,
-                            'EATRd': eatrdlist, 'EATRf': eatrflist,
-                            'METTR': mettrlist})
+        res = self.aggregate([year])[year]['main']
+        df1 = pd.DataFrame({'Category': catlist, 'CoC': res[0],
+                            'METR': res[1], 'UCoC': res[3],
+                            'EATRd': res[4], 'EATRf': res[5],
+                            'METTR': res[2]})
         return df1
     
     def tabulate_main_multiyear(self, yearlist):
         """
-        Run tabulate_main(year) for every year in yearlist, and
-        combine results. Export the combined results to CSVs.
+        Tabulate the main results (as in tabulate_main) for every year in
+        yearlist, and combine results. Export the combined results to CSVs.
         """
-        # Create empty DataFrames to store results
-        mtr_res = pd.DataFrame({'Category': catlist})
-        mettr_res = pd.DataFrame({'Category': catlist})
-        coc_res = pd.DataFrame({'Category': catlist})
-        ucoc_res = pd.DataFrame({'Category': catlist})
-        eatrd_res = pd.DataFrame({'Category': catlist})
-        eatrf_res = pd.DataFrame({'Category': catlist})
-        # Tabulate for each year and store results
-        for year in yearlist:
-            res1_all = self.tabulate_main(year)
-            mtr_res[str(year)] = res1_all['METR']
-            mettr_res[str(year)] = res1_all['METTR']
-            coc_res[str(year)] = res1_all['CoC']
-            ucoc_res[str(year)] = res1_all['UCoC']
-            eatrd_res[str(year)] = res1_all['EATRd']
-            eatrf_res[str(year)] = res1_all['EATRf']
+        aggs = self.aggregate(yearlist)
         # Save results to tables for combining later
-        coc_res.to_csv(OUTPUTPATH + 'main/' + 'coc_' + self.key + '.csv',
-                       index=False)
-        mtr_res.to_csv(OUTPUTPATH + 'main/' + 'mtr_' + self.key + '.csv',
-                       index=False)
-        mettr_res.to_csv(OUTPUTPATH + 'main/' + 'mettr_' + self.key + '.csv',
-                         index=False)
-        ucoc_res.to_csv(OUTPUTPATH + 'main/' + 'ucoc_' + self.key + '.csv',
+        for m, name in [(0, 'coc'), (1, 'mtr'), (2, 'mettr'), (3, 'ucoc'),
+                        (4, 'eatrd'), (5, 'eatrf')]:
+            res1 = pd.DataFrame({'Category': catlist})
+            for year in yearlist:
+                res1[str(year)] = aggs[year]['main'][m]
+            res1.to_csv(OUTPUTPATH + 'main/' + name + '_' + self.key + '.csv',
                         index=False)
-        eatrd_res.to_csv(OUTPUTPATH + 'main/' + 'eatrd_' + self.key + '.csv',
-                         index=False)
-        eatrf_res.to_csv(OUTPUTPATH + 'main/' + 'eatrf_' + self.key + '.csv',
-                         index=False)
-
         return None
     
     def cocVariation(self, year):
         """
         Compute standard deviation of the cost of capital.
-        Note: Must first run tabulate_main(year).
         """
-        # Get average CoC
-        df1 = self.tabulate_main(year)
-        df1.set_index('Category', inplace=True)
-        coc = df1.loc[catlist[0], 'CoC']
-        # Extract asset weights
-        stock_ccorp_arr = self.stock_ccorp.to_numpy()
-        stock_scorp_arr = self.stock_scorp.to_numpy()
-        stock_soleprop_arr = self.stock_soleprop.to_numpy()
-        stock_partner_arr = self.stock_partner.to_numpy()
-        wgtarray = np.zeros((ntype, nind, 4))
-        wgtarray[:,:,0] = stock_ccorp_arr
-        wgtarray[:,:,1] = stock_scorp_arr
-        wgtarray[:,:,2] = stock_soleprop_arr
-        wgtarray[:,:,3] = stock_partner_arr
-        # Extract results by firm type
-        coc_ccorp = self.calc.results_coc[str(year)]['corp']
-        coc_scorp = self.calc.results_coc[str(year)]['scorp']
-        coc_soleprop = self.calc.results_coc[str(year)]['soleprop']
-        coc_partner = self.calc.results_coc[str(year)]['partner']
-        # Build array of squared deviations
-        vararray = np.zeros((ntype, nind, 4))
-        vararray[:,:,0] = (coc_ccorp - coc)**2
-        vararray[:,:,1] = (coc_scorp - coc)**2
-        vararray[:,:,2] = (coc_soleprop - coc)**2
-        vararray[:,:,3] = (coc_partner - coc)**2
-        # Compute variance
-        vcoc = (vararray * wgtarray).sum() / wgtarray.sum()
-        sdcoc = vcoc**0.5
-        return sdcoc
-        
-        
-
-
+        return self.aggregate([year])[year]['sd']
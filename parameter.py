@@ -1,6 +1,7 @@
 import copy
 import pandas as pd
-from config import INPUTPATH
+import numpy as np
+from config import INPUTPATH, ast_codes, ind_codes
 
 
 class Parameter():
@@ -19,6 +20,7 @@ class Parameter():
         self.read_debt()
         self.read_sec179()
         self.read_foreign()
+        self.align_arrays()
     
     def set_chosen_parms(self):
         """
@@ -56,6 +58,11 @@ class Parameter():
         self.include_slt = True
         # Bool for whether equations are forward-looking
         self.forwardLooking = False
+        # Horizon (in years) for forward-looking equations, after which
+        # policy is held constant forever (None for no limit). Policy is
+        # constant after 2029 anyway, so only horizons shorter than the
+        # policy years left (at most 10, from 2020) have any effect.
+        self.horizon = None
     
     def update_parms(self, pdict):
         """
@@ -66,7 +73,7 @@ class Parameter():
         for parm in pdict:
             assert parm in ['rf', 'pi', 'premD', 'premE', 'rd', 're', 'p',
                             'shares', 'sltaxes',
-                            'include_slt', 'forwardLooking']
+                            'include_slt', 'forwardLooking', 'horizon']
         # Check values and update baseic economic parameters
         if 'rf' in pdict:
             assert pdict['rf'] > 0
@@ -97,6 +104,10 @@ class Parameter():
         if 'forwardLooking' in pdict:
             assert type(pdict['forwardLooking']) is bool
             self.forwardLooking = pdict['forwardLooking']
+        if 'horizon' in pdict:
+            assert pdict['horizon'] is None or (type(pdict['horizon']) is int
+                                                and pdict['horizon'] >= 2)
+            self.horizon = pdict['horizon']
         # Update dictionaries
         if 'shares' in pdict:
             assert type(pdict['shares']) is dict
@@ -157,5 +168,48 @@ class Parameter():
         ffile = pd.read_csv(INPUTPATH + 'BEA/international-by-industry.csv')
         ffile.set_index('indcode', inplace=True)
         self.foreign = copy.deepcopy(ffile)
-
-
+    
+    def align_arrays(self):
+        """
+        Store parameters by asset type and by industry as NumPy arrays,
+        aligned to ast_codes and ind_codes, for use in calculations.
+        Also store a tangibility mask: 0 for intangible assets (EN, RD and
+        AE codes), 1 otherwise.
+        """
+        # Check that every asset type and industry is present
+        for ast in ast_codes:
+            assert ast in self.deltas.index
+            assert ast in self.s179.index
+        for ind in ind_codes:
+            assert ind in self.Deltas.index
+            assert ind in self.foreign.index
+        # Asset type parameters
+        self.delta_arr = self.deltas.loc[ast_codes, 'delta'].to_numpy(float)
+        self.s179_c_arr = self.s179.loc[ast_codes, 'corp'].to_numpy(float)
+        self.s179_nc_arr = self.s179.loc[ast_codes, 'noncorp'].to_numpy(float)
+        self.tang = np.array([0 if ast[0:2] in ['EN', 'RD', 'AE'] else 1
+                              for ast in ast_codes])
+        # Industry parameters
+        self.Delta_c_arr = self.Deltas.loc[ind_codes, 'corp'].to_numpy(float)
+        self.Delta_nc_arr = self.Deltas.loc[ind_codes,
+                                            'noncorp'].to_numpy(float)
+        self.tauf_arr = self.foreign.loc[ind_codes, 'tauf'].to_numpy(float)
+        for arr in [self.delta_arr, self.s179_c_arr, self.s179_nc_arr,
+                    self.Delta_c_arr, self.Delta_nc_arr, self.tauf_arr,
+                    self.tang]:
+            assert not np.isnan(arr).any()
+            # Read-only, so that snapshots can share them
+            arr.flags.writeable = False
+    
+    def snapshot(self):
+        """
+        Return a copy of this Parameter object that shares its read-only
+        arrays instead of copying them. DataFrames are small, so they are
+        copied, and changes to either object do not affect the other.
+        """
+        snap = copy.copy(self)
+        snap.shares = copy.deepcopy(self.shares)
+        snap.sltaxes = copy.deepcopy(self.sltaxes)
+        for name in ['deltas', 'Deltas', 's179', 'foreign']:
+            setattr(snap, name, getattr(self, name).copy())
+        return snap
@@ -1,4 +1,13 @@
-import pandas as pd
+import copy
+import numpy as np
+from config import ntype, ast_codes, ccr_methods
+from filecache import read_csv_cached, read_excel_cached
+
+# Columns of the compiled CCR rules, with the method as an integer code
+ccr_dtype = np.dtype([('method', np.int64), ('itcrt', np.float64),
+                      ('itc_base', np.float64), ('itc_life', np.float64),
+                      ('bonus', np.float64), ('life', np.float64),
+                      ('acclrt', np.float64)])
 
 
 class Policy():
@@ -9,19 +18,63 @@ class Policy():
 	"""
 
     def __init__(self, POLFILE='policy_baseline.csv'):
-        self.policies = pd.read_csv(POLFILE)
+        # Parsed files are cached in binary form (see filecache.py)
+        self.policies = read_csv_cached(POLFILE)
         self.policies.set_index('year', inplace=True)
-        ccrfile = pd.ExcelFile('CCR_rules.xlsx')
+        sheetnames = set(self.policies['ccr_sheet']) | set(['foreign'])
+        ccrfile = read_excel_cached('CCR_rules.xlsx', sheetnames)
         ccrRules = dict()
         for year in range(2020, 2030):
             sheetname = self.policies.loc[year, 'ccr_sheet']
-            ccr1 = pd.read_excel(ccrfile, sheet_name=sheetname)
+            ccr1 = ccrfile[sheetname].copy()
             ccr1.rename({'Asset code': 'asset'}, axis=1, inplace=True)
             ccrRules[str(year)] = ccr1.set_index('asset')
-        ccr2 = pd.read_excel(ccrfile, sheet_name='foreign')
+        ccr2 = ccrfile['foreign'].copy()
         ccr2.rename({'Asset code': 'asset'}, axis=1, inplace=True)
         ccrRules['foreign'] = ccr1.set_index('asset')
         self.ccrRules = ccrRules
+        self.compile_ccr()
+    
+    def compile_ccr(self):
+        """
+        Compile the CCR rules for each year into structured NumPy arrays
+        aligned to ast_codes (see ccr_dtype), with the depreciation method
+        encoded as its position in ccr_methods. Checks that every asset
+        type is present and that every method is known.
+        """
+        ccrArrays = dict()
+        for key in self.ccrRules:
+            rules = self.ccrRules[key]
+            missing = [ast for ast in ast_codes if ast not in rules.index]
+            assert len(missing) == 0, ('CCR rules for ' + key +
+                                       ' missing asset codes ' + str(missing))
+            rules = rules.loc[ast_codes]
+            unknown = set(rules['method']) - set(ccr_methods)
+            assert len(unknown) == 0, ('CCR rules for ' + key +
+                                       ' have unknown methods ' +
+                                       str(unknown))
+            ccr = np.zeros(ntype, dtype=ccr_dtype)
+            ccr['method'] = [ccr_methods.index(m) for m in rules['method']]
+            for col in ccr_dtype.names[1:]:
+                ccr[col] = rules[col].to_numpy(dtype=float)
+            # Read-only, so that snapshots can share it
+            ccr.flags.writeable = False
+            ccrArrays[key] = ccr
+        self.ccrArrays = ccrArrays
+    
+    def snapshot(self):
+        """
+        Return a copy of this Policy object that shares its compiled CCR
+        rules, which are read-only, instead of copying them. DataFrames are
+        small, so they are copied, and changes to either object do not
+        affect the other.
+        """
+        snap = copy.copy(self)
+        snap.policies = self.policies.copy()
+        snap.ccrRules = {key: self.ccrRules[key].copy()
+                         for key in self.ccrRules}
+        snap.ccrArrays = dict(self.ccrArrays)
+        return snap
         
     def read_ccr(self, year):
         """
@@ -42,6 +95,26 @@ class Policy():
             else:
                 return self.ccrRules[str(year)]
     
+    def read_ccr_array(self, year):
+        """
+        Return compiled capital cost recovery rules for the given year, as a
+        structured array aligned to ast_codes (see compile_ccr).
+        """
+        if type(year) is not int:
+            if year == 'foreign':
+                return self.ccrArrays['foreign']
+            else:
+                print('Warning: year must be an integer!')
+                return None
+        else:
+            if year < 2020:
+                print('Warning: year must be >= 2020')
+                return None
+            elif year > 2029:
+                return self.ccrArrays['2029']
+            else:
+                return self.ccrArrays[str(year)]
+    
     def fetch(self, term, year):
         """
         Return the value of the policy parameter "term" in the given year.
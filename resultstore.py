@@ -0,0 +1,166 @@
+"""
+On-disk store for the results of many Calculators.
+
+save_results writes the results of a list of Calculators (one for each
+scenario) for a list of years to a directory, with one NumPy file for each
+measure and a JSON file describing the axes:
+    meta.json: names of the scenarios, years, firm types, asset types,
+               industries and measures, and any other information about
+               how the results were calculated
+    coc.npy, metr.npy, mettr.npy, ucoc.npy: arrays with axes (scenario,
+               year, firm, asset, industry)
+    eatr_dom.npy, eatr_for.npy: arrays with axes (scenario, year, asset,
+               industry)
+ResultStore reads these files as memory maps, so selecting part of the
+results (such as one asset type in every scenario) only reads that part
+from disk.
+"""
+import json
+import os
+import numpy as np
+from config import ast_codes, ind_codes
+from calculator import cast_results
+from outputBuilder import ftypes
+from sweep import LabeledArray
+
+# Measures in the store, and the axes of each
+store_dims = {'coc': ['scenario', 'year', 'firm', 'asset', 'industry'],
+              'metr': ['scenario', 'year', 'firm', 'asset', 'industry'],
+              'mettr': ['scenario', 'year', 'firm', 'asset', 'industry'],
+              'ucoc': ['scenario', 'year', 'firm', 'asset', 'industry'],
+              'eatr_dom': ['scenario', 'year', 'asset', 'industry'],
+              'eatr_for': ['scenario', 'year', 'asset', 'industry']}
+
+
+def result_arrays(calc, year):
+    """
+    Returns a dict of the results of the Calculator calc for the given year,
+    for each measure in the store, with the axes in store_dims after
+    scenario and year.
+    """
+    year = str(year)
+    res = dict()
+    for (name, results) in [('coc', calc.results_coc),
+                            ('metr', calc.results_metr),
+                            ('mettr', calc.results_mettr),
+                            ('ucoc', calc.results_ucoc)]:
+        res[name] = np.array([results[year][ftype] for ftype in ftypes])
+    eatr = calc.results_international[year]
+    res['eatr_dom'] = np.asarray(eatr['domestic'])
+    res['eatr_for'] = np.asarray(eatr['foreign'])
+    return res
+
+
+def save_results(path, calcs, names, yearlist, dtype=None, info=None):
+    """
+    Save the results of each Calculator in calcs for every year in yearlist
+    to the directory path, replacing any store already there. Results are
+    written one scenario at a time, so only one scenario's results need to
+    be in memory.
+        names: list of names of the scenarios, in the same order as calcs
+        dtype: dtype to save results in (see calculator.RESULT_DTYPES); by
+               default, the result dtype of the first Calculator
+        info: dict of other information to save in meta.json, such as the
+              code the results were calculated with
+    """
+    assert len(calcs) == len(names)
+    assert len(set(names)) == len(names)
+    if dtype is None:
+        dtype = calcs[0].dtype
+    os.makedirs(path, exist_ok=True)
+    # Remove the metadata first, so a partly written store cannot be read
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        os.remove(os.path.join(path, 'meta.json'))
+    coords = {'scenario': list(names),
+              'year': [int(year) for year in yearlist], 'firm': ftypes,
+              'asset': ast_codes, 'industry': ind_codes}
+    arrays = dict()
+    for measure in store_dims:
+        shape = tuple(len(coords[dim]) for dim in store_dims[measure])
+        arrays[measure] = np.lib.format.open_memmap(
+            os.path.join(path, measure + '.npy'), mode='w+',
+            dtype=dtype, shape=shape)
+    for k in range(len(calcs)):
+        for y in range(len(yearlist)):
+            res = result_arrays(calcs[k], yearlist[y])
+            for measure in res:
+                arrays[measure][k, y] = cast_results(res[measure], dtype)
+    for measure in arrays:
+        arrays[measure].flush()
+    del arrays
+    meta = {'coords': coords, 'dims': store_dims}
+    if info is not None:
+        meta['info'] = info
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+
+class ResultStore():
+    """
+    ResultStore class.
+
+    Reads results saved by save_results, with each measure as a read-only
+    memory-mapped array.
+    """
+
+    def __init__(self, path):
+        """
+            path: directory of the store
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.path = path
+        self.coords = meta['coords']
+        self.dims = meta['dims']
+        self.info = meta.get('info', dict())
+        self.measures = list(self.dims)
+        self.arrays = dict()
+
+    def __getitem__(self, measure):
+        """
+        Return the memory-mapped array for the given measure.
+        """
+        assert measure in self.dims, 'No measure named ' + measure
+        if measure not in self.arrays:
+            self.arrays[measure] = np.load(os.path.join(self.path,
+                                                        measure + '.npy'),
+                                           mmap_mode='r')
+        return self.arrays[measure]
+
+    def sel(self, measure, **labels):
+        """
+        Read the results for the given measure at the given labels for any
+        of its axes (scenario, year, firm, asset, industry), for example
+        sel('coc', asset='ENS3', firm='corp'). Each label may be a single
+        label, which drops that axis, or a list of labels. Only the values
+        selected are read from disk.
+        Returns a LabeledArray, or a single value if no axes are left.
+        """
+        values = self[measure]
+        dims = list()
+        coords = dict()
+        for dim in labels:
+            assert dim in self.dims[measure], 'No axis named ' + dim
+        # Select single labels first, as views of the memory map
+        index = list()
+        for dim in self.dims[measure]:
+            label = labels.get(dim)
+            if label is not None and type(label) is not list:
+                index.append(self.coords[dim].index(label))
+            else:
+                index.append(slice(None))
+                dims.append(dim)
+        values = values[tuple(index)]
+        # Then take lists of labels along each remaining axis
+        for k in range(len(dims)):
+            label = labels.get(dims[k])
+            if label is None:
+                coords[dims[k]] = self.coords[dims[k]]
+            else:
+                pos = [self.coords[dims[k]].index(lab) for lab in label]
+                values = np.take(values, pos, axis=k)
+                coords[dims[k]] = list(label)
+        values = np.array(values)
+        if len(dims) == 0:
+            return values[()]
+        return LabeledArray(values, dims, coords)
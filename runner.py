@@ -0,0 +1,128 @@
+"""
+Runs calculations for a grid of scenarios and years in parallel, using a
+pool of worker processes.
+
+Each scenario is a tuple (parmdict, polfile) of a dict of parameters to
+pass to Parameter and the name of a policy CSV file. Workers load the
+Parameter data and Policy files (including the CCR rules workbook) once,
+when they start, and return results as arrays rather than Calculator
+objects.
+
+Scripts using this must only call run_grid or run_scenarios under
+if __name__ == '__main__':, as worker processes may import the script.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from parameter import Parameter
+from policy import Policy
+from calculator import Calculator
+
+ftypes = ['corp', 'scorp', 'soleprop', 'partner']
+
+# Parameter and Policy objects, and Calculators, in each worker process
+_worker_parms = dict()
+_worker_pols = dict()
+_worker_calcs = dict()
+
+
+def _parmkey(parmdict):
+    """
+    Returns a hashable key for a dict of parameters.
+    """
+    return repr(sorted(parmdict.items()))
+
+
+def _init_worker(scenarios, engine, dtype='float64'):
+    """
+    Loads the Parameter and Policy objects for every scenario, once per
+    worker process, and sets up a Calculator for each scenario, storing
+    results in dtype.
+    """
+    for i in range(len(scenarios)):
+        (parmdict, polfile) = scenarios[i]
+        if _parmkey(parmdict) not in _worker_parms:
+            _worker_parms[_parmkey(parmdict)] = Parameter(parmdict)
+        if polfile not in _worker_pols:
+            _worker_pols[polfile] = Policy(polfile)
+        _worker_calcs[i] = Calculator(_worker_parms[_parmkey(parmdict)],
+                                      _worker_pols[polfile], engine, dtype,
+                                      verbose=False)
+
+
+def _run_task(i, year, metrics=None):
+    """
+    Calculates results for scenario i in the given year, in a worker
+    process, for the measures in metrics (see Calculator.calc_all).
+    Returns a dict of arrays for the measures calculated, with axes (firm
+    type, asset type, industry) for coc, metr, mettr and ucoc, and (asset
+    type, industry) for eatr_dom and eatr_for.
+    """
+    calc = _worker_calcs[i]
+    calc.calc_all(year, metrics)
+    # Remove results from the Calculator, so that workers stay small
+    res = dict()
+    for (key, results) in [('coc', calc.results_coc),
+                           ('metr', calc.results_metr),
+                           ('mettr', calc.results_mettr),
+                           ('ucoc', calc.results_ucoc)]:
+        if str(year) in results:
+            res1 = results.pop(str(year))
+            res[key] = [res1[ftype] for ftype in ftypes]
+    if str(year) in calc.results_international:
+        eatr = calc.results_international.pop(str(year))
+        res['eatr_dom'] = eatr['domestic']
+        res['eatr_for'] = eatr['foreign']
+    return (i, year, res)
+
+
+def run_grid(scenarios, yearlist, max_workers=None, engine='array',
+             metrics=None, dtype='float64'):
+    """
+    Calculates results for every scenario and every year in yearlist,
+    using a pool of max_workers processes (by default, one per CPU).
+        scenarios: list of (parmdict, polfile) tuples
+        yearlist: list of years
+        metrics: list of measures to calculate (see Calculator.calc_all)
+        dtype: dtype of the result arrays (see Calculator); float32 halves
+               the data returned by the workers
+    Returns a list with a dict for each scenario, mapping each year to a
+    dict of result arrays (see _run_task).
+    """
+    results = [dict() for scenario in scenarios]
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_init_worker,
+                             initargs=(scenarios, engine,
+                                       dtype)) as executor:
+        futures = [executor.submit(_run_task, i, year, metrics)
+                   for i in range(len(scenarios)) for year in yearlist]
+        for future in futures:
+            (i, year, res) = future.result()
+            results[i][year] = res
+    return results
+
+
+def run_scenarios(scenarios, yearlist, max_workers=None, engine='array',
+                  metrics=None, dtype='float64'):
+    """
+    Calculates results for every scenario and every year in yearlist in
+    parallel (see run_grid), and stores them in a Calculator for each
+    scenario, for use with OutputBuilder. Measures not in metrics are
+    calculated by the Calculator when first looked up.
+    Returns the list of Calculator objects, in the same order as scenarios.
+    """
+    results = run_grid(scenarios, yearlist, max_workers, engine, metrics,
+                       dtype)
+    parms = dict()
+    pols = dict()
+    calcs = list()
+    for i in range(len(scenarios)):
+        (parmdict, polfile) = scenarios[i]
+        if _parmkey(parmdict) not in parms:
+            parms[_parmkey(parmdict)] = Parameter(parmdict)
+        if polfile not in pols:
+            pols[polfile] = Policy(polfile)
+        calc = Calculator(parms[_parmkey(parmdict)], pols[polfile], engine,
+                          dtype)
+        for year in yearlist:
+            calc._store_results(year, **results[i][year])
+        calcs.append(calc)
+    return calcs
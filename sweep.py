@@ -0,0 +1,234 @@
+"""
+Evaluates results over a grid of policy settings, and solves for policy
+settings that hit targets.
+
+sweep_policy evaluates a Calculator's Policy with some policy parameters
+replaced by each combination of values in a grid, such as taxrt_ccorp from
+0 to 0.40 and bonus from 0 to 1. The values are passed to the array engine
+directly, so no new Policy objects or policy files are created. Results are
+returned as LabeledArray objects, with an axis for each policy parameter in
+the grid.
+
+solve_policy finds the value of a policy parameter at which a function of
+the results is zero, by bisection, for many targets at once (for example,
+the break-even bonus rate for each industry).
+"""
+import itertools
+import numpy as np
+import pandas as pd
+from config import ast_codes, ind_codes, catlist
+from calculator import BATCH_SIZE, cast_results
+from outputBuilder import OutputBuilder, stack_arrays, ftypes, measlist
+
+
+class LabeledArray():
+    """
+    LabeledArray class.
+
+    Stores an N-dimensional array with a name for each axis (dims) and
+    labels along each axis (coords).
+    """
+
+    def __init__(self, values, dims, coords):
+        """
+            values: NumPy array
+            dims: list of axis names
+            coords: dict of lists of labels for each axis
+        """
+        assert np.ndim(values) == len(dims)
+        for k in range(len(dims)):
+            assert len(coords[dims[k]]) == np.shape(values)[k]
+        self.values = values
+        self.dims = list(dims)
+        self.coords = {dim: list(coords[dim]) for dim in dims}
+
+    def sel(self, **labels):
+        """
+        Select the values at the given label for each named axis, for
+        example sel(taxrt_ccorp=0.21, firm='corp'). Returns a LabeledArray
+        without those axes, or a single value if no axes are left.
+        """
+        index = list()
+        dims = list()
+        for dim in self.dims:
+            if dim in labels:
+                index.append(self.coords[dim].index(labels[dim]))
+            else:
+                index.append(slice(None))
+                dims.append(dim)
+        for dim in labels:
+            assert dim in self.dims, 'No axis named ' + dim
+        values = self.values[tuple(index)]
+        if len(dims) == 0:
+            return values
+        return LabeledArray(values, dims, self.coords)
+
+    def to_series(self):
+        """
+        Return the values as a pandas Series, indexed by the labels of every
+        axis.
+        """
+        index = pd.MultiIndex.from_product([self.coords[dim]
+                                            for dim in self.dims],
+                                           names=self.dims)
+        return pd.Series(self.values.ravel(), index=index)
+
+
+def sweep_policy(calc, year, grid, weighting=None):
+    """
+    Calculates results for the given year for every combination of policy
+    values in grid, in place of those in the Calculator's Policy. Values of
+    parameters from the policy file apply to every year, and values of CCR
+    rules apply to every asset type.
+        calc: Calculator object, using the array engine
+        grid: dict of lists of values for policy parameters (columns of the
+              policy file or numeric columns of the CCR rules), in the
+              order of the axes of the results
+        weighting: None to return results for every cell, or 'stock' or
+                   'investment' to return weighted averages by category (as
+                   in OutputBuilder.tabulate_main)
+    If weighting is None, returns a dict of LabeledArray objects with the
+    grid axes and axes (firm, asset, industry) for coc, metr, mettr and
+    ucoc, and (asset, industry) for eatr_dom and eatr_for, in the
+    Calculator's result dtype. These use about 1.5 MB per grid point in
+    float64, and half that in float32. Otherwise, returns a LabeledArray
+    with the grid axes and axes (measure, category).
+    Raises a ValueError if calc does not use the array engine or grid is
+    empty. The results of calc are left unchanged.
+    """
+    if calc.engine != 'array':
+        raise ValueError('sweep_policy needs a Calculator with the array '
+                         'engine, not ' + calc.engine)
+    if len(grid) == 0:
+        raise ValueError('sweep_policy needs at least one policy parameter '
+                         'in grid')
+    dims = list(grid)
+    shape = tuple(len(grid[dim]) for dim in dims)
+    points = [dict(zip(dims, vals))
+              for vals in itertools.product(*[grid[dim] for dim in dims])]
+    if weighting is not None:
+        ob = OutputBuilder(calc, 'sweep', weighting)
+        main = np.zeros((len(points), len(measlist), len(catlist)))
+    else:
+        res = {name: np.zeros((len(points), 4, len(ast_codes),
+                               len(ind_codes)), dtype=calc.dtype)
+               for name in ['coc', 'metr', 'mettr', 'ucoc']}
+        for name in ['eatr_dom', 'eatr_for']:
+            res[name] = np.zeros((len(points), len(ast_codes),
+                                  len(ind_codes)), dtype=calc.dtype)
+    for i in range(0, len(points), BATCH_SIZE):
+        chunk = points[i:i+BATCH_SIZE]
+        [res1] = calc._calc_array_batch([(calc, year)] * len(chunk), chunk,
+                                        store=False)
+        if weighting is not None:
+            main[i:i+len(chunk)] = ob.aggregate_main(stack_arrays(res1))
+        else:
+            for name in res:
+                res[name][i:i+len(chunk)] = cast_results(res1[name],
+                                                         calc.dtype)
+    coords = dict(grid)
+    if weighting is not None:
+        coords['measure'] = measlist
+        coords['category'] = catlist
+        return LabeledArray(main.reshape(shape + main.shape[1:]),
+                            dims + ['measure', 'category'], coords)
+    coords['firm'] = ftypes
+    coords['asset'] = ast_codes
+    coords['industry'] = ind_codes
+    results = dict()
+    for name in res:
+        if name in ['eatr_dom', 'eatr_for']:
+            celldims = ['asset', 'industry']
+        else:
+            celldims = ['firm', 'asset', 'industry']
+        results[name] = LabeledArray(res[name].reshape(shape +
+                                                       res[name].shape[1:]),
+                                     dims + celldims, coords)
+    return results
+
+
+def solve_policy(calc, year, term, objective, ntargets, lo, hi,
+                 weighting='stock', tol=1e-6, maxiter=60):
+    """
+    Finds, for each of ntargets targets, the value of the policy parameter
+    term (as for sweep_policy) between lo and hi at which objective is zero,
+    by bisection. Every target has its own value, and all targets still
+    being solved are evaluated together in each step.
+        calc: Calculator object, using the array engine
+        objective: function objective(tables, idx) returning an array with
+                   the value of the objective for each target in idx, where
+                   tables is a dict of weighted averages for those targets
+                   (see OutputBuilder.aggregate_arrays), with keys main
+                   (target, measure, category), asset (target, measure,
+                   asset type) and industry (target, measure, industry),
+                   plus cells (target, measure, firm type, asset type,
+                   industry) with the results for every cell
+        lo, hi: bounds on the value, for all targets or for each target
+        weighting: 'stock' or 'investment', as for OutputBuilder
+        tol: stop when the bounds are less than tol apart
+    Returns an array of the values for each target, which is NaN where the
+    objective has the same sign at lo and hi, or is not finite at lo, hi or
+    any value tried between them. Raises a ValueError if calc does not use
+    the array engine. The results of calc are left unchanged.
+    For example, the break-even bonus rate at which the METR is zero in
+    each industry is found by
+        solve_policy(calc, year, 'bonus',
+                     lambda tables, idx: tables['industry'][
+                         np.arange(len(idx)), 1, idx],
+                     len(ind_codes), 0.0, 1.0)
+    """
+    if calc.engine != 'array':
+        raise ValueError('solve_policy needs a Calculator with the array '
+                         'engine, not ' + calc.engine)
+    ob = OutputBuilder(calc, 'solve', weighting)
+    def evaluate(x, idx):
+        # Objective for the targets in idx, with term set to x
+        vals = np.zeros(len(idx))
+        for i in range(0, len(idx), BATCH_SIZE):
+            chunk = idx[i:i+BATCH_SIZE]
+            [res1] = calc._calc_array_batch(
+                [(calc, year)] * len(chunk),
+                [{term: x[k]} for k in range(i, i + len(chunk))],
+                store=False)
+            cells = stack_arrays(res1)
+            tables = ob.aggregate_arrays(cells)
+            tables['cells'] = cells
+            vals[i:i+len(chunk)] = objective(tables, chunk)
+        return vals
+    lo = np.array(np.broadcast_to(lo, (ntargets,)), dtype=float)
+    hi = np.array(np.broadcast_to(hi, (ntargets,)), dtype=float)
+    idx = np.arange(ntargets)
+    flo = evaluate(lo, idx)
+    fhi = evaluate(hi, idx)
+    # Targets that are exactly at a bound are done
+    x = np.where(flo == 0, lo, np.where(fhi == 0, hi, np.nan))
+    solved = (np.isfinite(flo) & np.isfinite(fhi) &
+              (np.sign(flo) != np.sign(fhi))) | ~np.isnan(x)
+    if not solved.all():
+        print('Warning: no sign change between bounds for targets ' +
+              str([int(k) for k in idx[~solved]]))
+    active = solved & np.isnan(x)
+    for it in range(maxiter):
+        active = active & (hi - lo > tol)
+        if not active.any():
+            break
+        mid = 0.5 * (lo + hi)
+        fmid = evaluate(mid[active], idx[active])
+        # Targets with an objective that is not finite cannot be solved
+        bad = np.zeros(ntargets, dtype=bool)
+        bad[active] = ~np.isfinite(fmid)
+        if bad.any():
+            print('Warning: objective not finite for targets ' +
+                  str([int(k) for k in idx[bad]]))
+        # Keep the half with a sign change
+        lower = np.zeros(ntargets, dtype=bool)
+        lower[active] = np.isfinite(fmid) & (np.sign(fmid) ==
+                                             np.sign(flo[active]))
+        upper = active & ~lower & ~bad
+        lo = np.where(lower, mid, lo)
+        flo[lower] = fmid[lower[active]]
+        hi = np.where(upper, mid, hi)
+        solved = solved & ~bad
+        active = active & ~bad
+    x = np.where(np.isnan(x), np.where(solved, 0.5 * (lo + hi), np.nan), x)
+    return x
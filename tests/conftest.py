@@ -0,0 +1,13 @@
+"""
+Shared setup for the tests. Input and output paths in config.py are
+relative to the top folder, so the tests run from there.
+"""
+import os
+import pytest
+
+TOPDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def topdir(monkeypatch):
+    monkeypatch.chdir(TOPDIR)
@@ -0,0 +1,52 @@
+"""
+Tests of lazily calculated results and incremental updates in
+calculator.py.
+"""
+import numpy as np
+from parameter import Parameter
+from policy import Policy
+from calculator import Calculator
+
+
+def test_lazy_results():
+    calc = Calculator(Parameter(), Policy(), verbose=False)
+    calc.calc_all(2025, metrics=['coc'])
+    # Membership does not calculate anything
+    assert '2025' in calc.results_coc
+    assert '2025' not in calc.results_international
+    # get and integer keys calculate missing measures
+    eatr = calc.results_international.get(2025)
+    assert eatr is not None
+    assert '2025' in calc.results_international
+    assert calc.results_metr[2025] is calc.results_metr['2025']
+    assert calc.results_coc.get('not a year') is None
+    full = Calculator(Parameter(), Policy(), verbose=False)
+    full.calc_all(2025)
+    np.testing.assert_array_equal(eatr['domestic'],
+                                  full.results_international['2025']
+                                  ['domestic'])
+
+
+def test_update():
+    pol = Policy()
+    calc = Calculator(Parameter({'forwardLooking': True}), pol,
+                      verbose=False)
+    calc.calc_years([2022, 2025])
+    # Edits to the Policy do not affect the Calculator until update
+    pol.policies.loc[2024, 'intded_c'] = 0.5
+    pol.ccrRules['2022'].loc['SB31', 'life'] = 30
+    pol.compile_ccr()
+    assert calc.pol.policies.loc[2024, 'intded_c'] != 0.5
+    ncells = calc.update(pol=pol)
+    # The change to the interest deduction in 2024 affects every cell in
+    # 2022, whose policy lists include 2024, but not 2025
+    assert ncells['2022'] == calc.results_coc['2022']['corp'].size * 4
+    assert ncells['2025'] == 0
+    fresh = Calculator(Parameter({'forwardLooking': True}), pol,
+                       verbose=False)
+    fresh.calc_years([2022, 2025])
+    for year in ['2022', '2025']:
+        for ftype in ['corp', 'partner']:
+            np.testing.assert_allclose(calc.results_coc[year][ftype],
+                                       fresh.results_coc[year][ftype],
+                                       rtol=1e-12, atol=1e-15)
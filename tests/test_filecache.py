@@ -0,0 +1,46 @@
+"""
+Tests of the binary cache of parsed input files in filecache.py.
+"""
+import os
+import pandas as pd
+from filecache import read_csv_cached, read_excel_cached
+
+
+def test_csv_cache(tmp_path):
+    path = str(tmp_path / 'test.csv')
+    pd.DataFrame({'year': [2020, 2021], 'rate': [0.21, 0.25],
+                  'sheet': ['a', 'b']}).to_csv(path, index=False)
+    first = read_csv_cached(path)
+    assert os.path.exists(path + '.npz')
+    pd.testing.assert_frame_equal(first, pd.read_csv(path))
+    # A second read comes from the cache, with the same result
+    pd.testing.assert_frame_equal(read_csv_cached(path), first)
+    # Changing the file invalidates the cache
+    pd.DataFrame({'year': [2020, 2021], 'rate': [0.21, 0.3],
+                  'sheet': ['a', 'c']}).to_csv(path, index=False)
+    second = read_csv_cached(path)
+    pd.testing.assert_frame_equal(second, pd.read_csv(path))
+    assert second.loc[1, 'rate'] == 0.3
+    # A corrupt cache is rebuilt
+    with open(path + '.npz', 'wb') as f:
+        f.write(b'not a cache')
+    pd.testing.assert_frame_equal(read_csv_cached(path), second)
+
+
+def test_excel_cache(tmp_path):
+    path = str(tmp_path / 'test.xlsx')
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({'life': [5.0, 7.0]}).to_excel(writer, sheet_name='s1',
+                                                    index=False)
+        pd.DataFrame({'bonus': [0.5]}).to_excel(writer, sheet_name='s2',
+                                                index=False)
+    frames = read_excel_cached(path, ['s2'])
+    assert list(frames) == ['s2']
+    assert frames['s2'].loc[0, 'bonus'] == 0.5
+    # Later reads of other sheets use the cache of every sheet
+    frames = read_excel_cached(path)
+    assert sorted(frames) == ['s1', 's2']
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({'life': [9.0]}).to_excel(writer, sheet_name='s1',
+                                               index=False)
+    assert read_excel_cached(path, ['s1'])['s1'].loc[0, 'life'] == 9.0
@@ -0,0 +1,49 @@
+"""
+Tests of StreamingStats and the parameter draws in montecarlo.py.
+"""
+import numpy as np
+import pytest
+from parameter import Parameter
+from montecarlo import StreamingStats, draw_valid_parms
+
+
+def test_streaming_stats_merge():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(3000, 2, 3)) * [1.0, 10.0, 0.1]
+    weights = rng.uniform(0.5, 2.0, 3000)
+    # Summarize in uneven chunks, merged in two halves
+    halves = [StreamingStats((2, 3), size=200) for k in range(2)]
+    for (start, stop) in [(0, 700), (700, 1500), (1500, 1501),
+                          (1501, 3000)]:
+        halves[start >= 1500].add(values[start:stop], weights[start:stop])
+    stats = StreamingStats((2, 3), size=200)
+    stats.merge(halves[0])
+    stats.merge(halves[1])
+    assert stats.count == 3000
+    mean = np.average(values, axis=0, weights=weights)
+    np.testing.assert_allclose(stats.mean(), mean, rtol=1e-12)
+    var = np.average((values - mean)**2, axis=0, weights=weights)
+    np.testing.assert_allclose(stats.sd(), np.sqrt(var), rtol=1e-12)
+    # Quantiles are within about 1/size in probability
+    flat = values.reshape((3000, -1))
+    for q in [0.05, 0.5, 0.95]:
+        est = stats.quantile(q).ravel()
+        for k in range(flat.shape[1]):
+            lo = np.quantile(flat[:, k], max(q - 2.0 / stats.size, 0))
+            hi = np.quantile(flat[:, k], min(q + 2.0 / stats.size, 1))
+            assert lo <= est[k] <= hi
+
+
+def test_draw_valid_parms():
+    rng = np.random.default_rng(0)
+    dists = {'rf': ('normal', 0.0, 0.01),
+             'shares': {'divshr': ('uniform', -0.5, 1.5)}}
+    parms = draw_valid_parms(Parameter(), dists, 50, rng)
+    assert len(parms) == 50
+    for parm in parms:
+        assert parm.rf > 0
+        assert 0 <= parm.shares['divshr'] <= 1
+        assert parm.rd == parm.rf + parm.premD
+    with pytest.raises(ValueError):
+        draw_valid_parms(Parameter(), {'rf': ('uniform', -1.0, -0.5)}, 2,
+                         rng)
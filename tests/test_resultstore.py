@@ -0,0 +1,49 @@
+"""
+Tests of save_results and ResultStore in resultstore.py.
+"""
+import numpy as np
+from parameter import Parameter
+from policy import Policy
+from calculator import calc_scenarios
+from outputBuilder import ftypes
+from config import ast_codes, ind_codes
+from resultstore import save_results, ResultStore
+
+POLFILES = ['policy_baseline.csv', 'policy_biden.csv']
+YEARS = [2022, 2025]
+
+
+def test_round_trip(tmp_path):
+    calcs = calc_scenarios(Parameter(), [Policy(f) for f in POLFILES],
+                           YEARS, verbose=False)
+    save_results(str(tmp_path), calcs, POLFILES, YEARS,
+                 info={'note': 'test'})
+    store = ResultStore(str(tmp_path))
+    assert store.info == {'note': 'test'}
+    assert store.coords['scenario'] == POLFILES
+    assert store.coords['year'] == YEARS
+    assert store['coc'].shape == (2, 2, 4, len(ast_codes), len(ind_codes))
+    for k in range(len(calcs)):
+        for year in YEARS:
+            for ftype in ftypes:
+                np.testing.assert_array_equal(
+                    store.sel('mettr', scenario=POLFILES[k], year=year,
+                              firm=ftype).values,
+                    calcs[k].results_mettr[str(year)][ftype])
+            np.testing.assert_array_equal(
+                store.sel('eatr_for', scenario=POLFILES[k],
+                          year=year).values,
+                calcs[k].results_international[str(year)]['foreign'])
+    # Lists of labels keep their axes, in the order given
+    res = store.sel('coc', asset=['ENS3', ast_codes[0]], firm='corp',
+                    year=[2025])
+    assert res.dims == ['scenario', 'year', 'asset', 'industry']
+    assert res.coords['asset'] == ['ENS3', ast_codes[0]]
+    np.testing.assert_array_equal(
+        res.values[1, 0, 0],
+        calcs[1].results_coc['2025']['corp'][ast_codes.index('ENS3')])
+    # A single cell is a single value
+    value = store.sel('ucoc', scenario=POLFILES[0], year=2022,
+                      firm='scorp', asset=ast_codes[3],
+                      industry=ind_codes[5])
+    assert value == calcs[0].results_ucoc['2022']['scorp'][3, 5]
@@ -0,0 +1,45 @@
+"""
+Tests of solve_policy in sweep.py.
+"""
+import numpy as np
+from parameter import Parameter
+from policy import Policy
+from calculator import Calculator
+from sweep import solve_policy
+
+# Overall METTR (measure 2, category 0) to solve for; it lies between its
+# values for corporate rates of 0 and 0.4 in 2025
+TARGET = 0.125
+
+
+def mettr_gap(tables, idx):
+    return tables['main'][:, 2, 0] - TARGET
+
+
+def test_solve_policy():
+    calc = Calculator(Parameter(), Policy(), verbose=False)
+    x = solve_policy(calc, 2025, 'taxrt_ccorp', mettr_gap, 1, 0.0, 0.4)
+    assert 0.0 < x[0] < 0.4
+    # The METTR at the solution is the target
+    calc2 = Calculator(Parameter(), Policy(), verbose=False)
+    calc2.pol.policies['taxrt_ccorp'] = x[0]
+    res = solve_policy(calc2, 2025, 'taxrt_ccorp', mettr_gap, 1,
+                       x[0] - 1e-4, x[0] + 1e-4)
+    assert abs(res[0] - x[0]) < 1e-5
+    # The Calculator is left without results
+    assert len(dict.keys(calc.results_coc)) == 0
+
+
+def test_solve_policy_unsolvable():
+    calc = Calculator(Parameter(), Policy(), verbose=False)
+    def objective(tables, idx):
+        vals = mettr_gap(tables, idx)
+        # Target 0 is NaN everywhere, target 1 has no sign change, target
+        # 2 is NaN near the solution only, and target 3 is solvable
+        vals = np.where(idx == 0, np.nan, vals)
+        vals = np.where(idx == 1, 1.0, vals)
+        vals = np.where((idx == 2) & (np.abs(vals) < 2e-3), np.nan, vals)
+        return vals
+    x = solve_policy(calc, 2025, 'taxrt_ccorp', objective, 4, 0.0, 0.4)
+    assert np.isnan(x[:3]).all()
+    assert 0.0 < x[3] < 0.4